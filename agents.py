@@ -1,7 +1,19 @@
+import heapq
 import json
 import time
 from datetime import datetime, timedelta
-from typing import Dict, List, Any
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, List, Any, Optional
+
+import numpy as np
+
+from checkpoints import CheckpointStore
+from cpm import annotate_plan
+from montecarlo import schedule_risk
+from goal_cache import DecompositionCache, milestone_variant
+from leveling import level_resources, team_skills
+from llm import CachedClient, CircuitBreaker, MeteredClient, ResponseCache, set_call_label
+from schemas import RESPONSE_SCHEMAS, RESPONSE_VALIDATORS
 
 def validate_json_response(response_text: str) -> Dict[str, Any]:
     """Validate and parse JSON response from Gemini."""
@@ -23,7 +35,101 @@ def validate_json_response(response_text: str) -> Dict[str, Any]:
     except json.JSONDecodeError as e:
         raise ValueError(f"Invalid JSON response: {e}")
 
-def decomposition_agent(goal: str, start_date: str, deadline: str, hours_per_week: int, model: str, client) -> Dict[str, Any]:
+# Extra attempts an agent gets when its response does not parse or match its schema.
+STRUCTURED_OUTPUT_RETRIES = 1
+
+def _parse_response_json(text: Optional[str]) -> Dict[str, Any]:
+    """Parse a JSON-mode response, falling back to code-fence extraction."""
+    if not text:
+        raise ValueError("Empty response")
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return validate_json_response(text)
+
+def _notify_client(client, method: str, *args) -> None:
+    """Call an optional hook (record_event / invalidate) on wrapped clients that support it."""
+    hook = getattr(client, method, None)
+    if hook:
+        hook(*args)
+
+def generate_json(client, model: str, prompt: str, schema_name: str, structured: bool = True) -> Dict[str, Any]:
+    """
+    Call the model and return its JSON response, validated against RESPONSE_SCHEMAS[schema_name].
+
+    With `structured` the schema is sent through the GenAI JSON response mode.
+    A response that does not parse or validate is retried with the validation
+    errors appended, up to STRUCTURED_OUTPUT_RETRIES times; failures and retries
+    are reported to the client's `record_event` hook for the performance metrics.
+    """
+    config = {'response_mime_type': 'application/json', 'response_schema': RESPONSE_SCHEMAS[schema_name]} if structured else None
+    validate = RESPONSE_VALIDATORS[schema_name]
+    contents = prompt
+    problems: List[str] = []
+
+    for attempt in range(STRUCTURED_OUTPUT_RETRIES + 1):
+        if attempt:
+            _notify_client(client, 'record_event', 'retries')
+        response = client.models.generate_content(model=model, contents=contents, config=config)
+        try:
+            result = _parse_response_json(response.text)
+        except ValueError as e:
+            _notify_client(client, 'record_event', 'parse_failures')
+            problems = [str(e)]
+        else:
+            problems = validate(result)
+            if not problems:
+                return result
+            _notify_client(client, 'record_event', 'schema_failures')
+        # Never serve this response from the cache again
+        _notify_client(client, 'invalidate', model, contents, config)
+        contents = (f"{prompt}\n\nYour previous response was rejected: {'; '.join(problems[:5])}. "
+                    "Return only valid JSON with the required structure.")
+
+    raise ValueError(f"Invalid {schema_name} response: {'; '.join(problems[:5])}")
+
+# Task fields each agent actually reads. Everything else is left out of its
+# prompt; agents that only return new fields have them merged back locally.
+PROMPT_TASK_FIELDS: Dict[str, List[str]] = {
+    'prioritization': ['id', 'title', 'description', 'milestone', 'estimated_hours', 'dependencies'],
+    'scheduling': ['id', 'title', 'milestone', 'estimated_hours', 'dependencies', 'priority_score'],
+    'risk_analysis': ['id', 'title', 'milestone', 'estimated_hours', 'dependencies', 'priority_label'],
+    'optimization': ['id', 'title', 'milestone', 'estimated_hours', 'dependencies', 'priority_label'],
+}
+
+PRIORITY_FIELDS = ['impact_score', 'urgency_score', 'effort_score', 'priority_score', 'priority_label']
+
+def _table_cell(value: Any) -> str:
+    if isinstance(value, list):
+        value = ','.join(str(item) for item in value)
+    return str('' if value is None else value).replace('|', '/').replace('\n', ' ').strip()
+
+def encode_tasks_table(tasks: List[Dict[str, Any]], fields: List[str]) -> str:
+    """Encode tasks as a pipe-separated table with a header row; list cells are comma-joined."""
+    rows = ['|'.join(fields)]
+    rows.extend('|'.join(_table_cell(task.get(field)) for field in fields) for task in tasks)
+    return '\n'.join(rows)
+
+def encode_schedule_compact(schedule: List[Dict[str, Any]]) -> str:
+    """Encode a schedule as one line per week: `W<n> <week_start> <hours>h: task=hours, ...`."""
+    lines = []
+    for week in schedule:
+        assigned = ', '.join(f"{item.get('task_id')}={item.get('hours_assigned')}" for item in week.get('tasks', []))
+        lines.append(f"W{week.get('week_number')} {week.get('week_start')} {week.get('hours_planned')}h: {assigned}")
+    return '\n'.join(lines)
+
+def compact_json(value: Any) -> str:
+    """Minified JSON for prompt payloads."""
+    return json.dumps(value, separators=(',', ':'), ensure_ascii=False)
+
+def _skills_requirement(skills: Optional[List[str]]) -> str:
+    """Prompt line asking for task `skills` from a team's vocabulary, or nothing for a one-person plan."""
+    if not skills:
+        return ''
+    return f'\n- Tag each task with the skills it needs in "skills", using only: {", ".join(skills)} (an empty list means anyone can do it)'
+
+def decomposition_agent(goal: str, start_date: str, deadline: str, hours_per_week: int, model: str, client, structured: bool = True,
+                        skills: Optional[List[str]] = None) -> Dict[str, Any]:
     """
     Agent 1: Break down the goal into milestones, tasks, estimated hours, and dependencies.
     """
@@ -62,69 +168,147 @@ Requirements:
 - Include realistic time estimates (total should fit within the timeline)
 - Identify dependencies between tasks
 - Group tasks into logical milestones
-- Ensure tasks can be completed by one person working {hours_per_week} hours per week"""
+- Ensure tasks can be completed by one person working {hours_per_week} hours per week{_skills_requirement(skills)}"""
 
-    response = client.models.generate_content(model=model, contents=prompt)
-    return validate_json_response(response.text)
+    return generate_json(client, model, prompt, 'decomposition', structured)
 
-def prioritization_agent(tasks: List[Dict[str, Any]], model: str, client) -> List[Dict[str, Any]]:
+PRIORITY_LABELS = [(22, 'High'), (15, 'Medium'), (0, 'Low')]
+
+def _as_float(value: Any) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+def apply_priority_scores(tasks: List[Dict[str, Any]], scores: Optional[Dict[str, Dict[str, Any]]] = None) -> List[Dict[str, Any]]:
+    """
+    Compute priority_score = impact + urgency + (10 - effort) and priority_label locally.
+
+    `scores` maps task id to {'impact', 'urgency', 'effort'} ratings (as returned by
+    the prioritization agent); without it each task's own *_score fields are used.
+    Ratings are rounded and clamped to 1-10, and scores and labels are computed
+    for all tasks at once. Tasks missing any of the three ratings are returned unscored.
     """
-    Agent 2: Score each task based on impact, urgency, and effort. Assign priority labels.
+    if not tasks:
+        return []
+    if scores is not None:
+        rows = [[scores.get(task.get('id'), {}).get(key) for key in ('impact', 'urgency', 'effort')] for task in tasks]
+    else:
+        rows = [[task.get(key) for key in ('impact_score', 'urgency_score', 'effort_score')] for task in tasks]
+    with np.errstate(invalid='ignore'):
+        ratings = np.clip(np.round(np.array([[_as_float(value) for value in row] for row in rows])), 1, 10)
+    rated = ~np.isnan(ratings).any(axis=1)
+    totals = ratings[:, 0] + ratings[:, 1] + (10 - ratings[:, 2])
+    thresholds = [threshold for threshold, _ in reversed(PRIORITY_LABELS)]
+    labels = [name for _, name in reversed(PRIORITY_LABELS)]
+    levels = np.searchsorted(thresholds, np.nan_to_num(totals), side='right') - 1
+
+    scored = []
+    for task, ok, (impact, urgency, effort), total, level in zip(tasks, rated, ratings.tolist(), totals.tolist(), levels.tolist()):
+        if not ok:
+            scored.append(task)
+            continue
+        scored.append({**task, 'impact_score': int(impact), 'urgency_score': int(urgency), 'effort_score': int(effort),
+                       'priority_score': int(total), 'priority_label': labels[level]})
+    return scored
+
+def _spread(values: Dict[Any, float], reverse: bool = False) -> Dict[Any, int]:
+    """Map values onto 1-10 by rank (ties share a rating); `reverse` rates the smallest highest."""
+    keys = list(values)
+    distinct, rank = np.unique(np.array([values[key] for key in keys], dtype=float), return_inverse=True)
+    if len(distinct) < 2:
+        return {key: 5 for key in keys}
+    if reverse:
+        rank = len(distinct) - 1 - rank
+    ratings = 1 + np.round(9 * rank / (len(distinct) - 1))
+    return dict(zip(keys, ratings.astype(int).tolist()))
+
+def heuristic_priority_scores(tasks: List[Dict[str, Any]]) -> Dict[str, Dict[str, int]]:
     """
-    tasks_json = json.dumps(tasks, indent=2)
+    Rate tasks without the LLM.
+
+    Impact grows with how much work is blocked on a task (direct dependents plus
+    the longest chain of tasks after it), urgency with how early its milestone
+    comes and how few prerequisites it has, and effort with its estimated hours.
+    """
+    ids = [task.get('id') for task in tasks]
+    known = set(ids)
+    deps = {task.get('id'): [dep for dep in task.get('dependencies') or [] if dep in known] for task in tasks}
+    dependents: Dict[Any, List[Any]] = {task_id: [] for task_id in ids}
+    for task_id, task_deps in deps.items():
+        for dep in task_deps:
+            dependents[dep].append(task_id)
+
+    # Kahn order; tasks caught in cycles are appended as they are
+    indegree = {task_id: len(deps[task_id]) for task_id in ids}
+    order = [task_id for task_id in ids if indegree[task_id] == 0]
+    for task_id in order:
+        for child in dependents[task_id]:
+            indegree[child] -= 1
+            if indegree[child] == 0:
+                order.append(child)
+    ordered = set(order)
+    order.extend(task_id for task_id in ids if task_id not in ordered)
+
+    depth: Dict[Any, int] = {}
+    for task_id in order:
+        depth[task_id] = 1 + max((depth.get(dep, 0) for dep in deps[task_id]), default=0)
+    tail: Dict[Any, int] = {}
+    for task_id in reversed(order):
+        tail[task_id] = 1 + max((tail.get(child, 0) for child in dependents[task_id]), default=0)
+
+    milestones: Dict[Any, int] = {}
+    for task in tasks:
+        milestones.setdefault(task.get('milestone'), len(milestones))
+
+    impact = _spread({task_id: len(dependents[task_id]) + tail[task_id] for task_id in ids})
+    urgency = _spread({task.get('id'): milestones[task.get('milestone')] * len(tasks) + depth[task.get('id')] for task in tasks}, reverse=True)
+    effort = _spread({task.get('id'): _task_hours(task) for task in tasks})
+    return {task_id: {'impact': impact[task_id], 'urgency': urgency[task_id], 'effort': effort[task_id]} for task_id in ids}
+
+def local_prioritization_agent(tasks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """
+    Local Agent 2: Score tasks from heuristic ratings, for offline use or when the LLM is unavailable.
+    """
+    return apply_priority_scores(tasks, heuristic_priority_scores(tasks))
+
+def prioritization_agent(tasks: List[Dict[str, Any]], model: str, client, structured: bool = True) -> List[Dict[str, Any]]:
+    """
+    Agent 2: Rate each task's impact, urgency and effort; scores and labels are computed locally.
+    """
+    tasks_table = encode_tasks_table(tasks, PROMPT_TASK_FIELDS['prioritization'])
     
-    prompt = f"""You are a task prioritization expert. Analyze these tasks and assign priority scores.
+    prompt = f"""You are a task prioritization expert. Analyze these tasks and rate them.
 
-Tasks:
-{tasks_json}
+Tasks (one per row, columns separated by |, dependencies comma-separated):
+{tasks_table}
 
 For each task, evaluate:
 1. Impact (1-10): How much this task contributes to the overall goal
 2. Urgency (1-10): How time-sensitive this task is
 3. Effort (1-10): How much work this task requires (higher = more effort)
 
-Return the tasks with added priority fields:
+Return only the three ratings for every task, keyed by task id:
 {{
-  "tasks": [
-    {{
-      "id": "task_1",
-      "title": "Task name",
-      "description": "Task description",
-      "milestone": "Milestone name", 
-      "estimated_hours": 8,
-      "dependencies": [],
-      "deliverable": "What will be delivered",
-      "impact_score": 8,
-      "urgency_score": 7,
-      "effort_score": 6,
-      "priority_score": 21,
-      "priority_label": "High"
-    }}
+  "scores": [
+    {{"id": "task_1", "impact": 8, "urgency": 7, "effort": 6}}
   ]
-}}
-
-Priority Score = Impact + Urgency + (10 - Effort)
-Priority Labels:
-- High: Score 22-30
-- Medium: Score 15-21  
-- Low: Score 3-14
+}}"""
 
-Keep all original task fields and add the new priority fields."""
+    result = generate_json(client, model, prompt, 'prioritization', structured)
+    scores = {item.get('id'): item for item in result.get('scores', []) if isinstance(item, dict)}
+    return apply_priority_scores(tasks, scores)
 
-    response = client.models.generate_content(model=model, contents=prompt)
-    result = validate_json_response(response.text)
-    return result.get('tasks', [])
-
-def scheduling_agent(tasks: List[Dict[str, Any]], start_date: str, deadline: str, hours_per_week: int, model: str, client) -> List[Dict[str, Any]]:
+def scheduling_agent(tasks: List[Dict[str, Any]], start_date: str, deadline: str, hours_per_week: int, model: str, client, structured: bool = True) -> List[Dict[str, Any]]:
     """
     Agent 3: Create week-by-week schedule respecting available hours and dependencies.
     """
-    tasks_json = json.dumps(tasks, indent=2)
+    tasks_table = encode_tasks_table(tasks, PROMPT_TASK_FIELDS['scheduling'])
     
     prompt = f"""You are a project scheduling expert. Create a week-by-week schedule for these tasks.
 
-Tasks:
-{tasks_json}
+Tasks (one per row, columns separated by |, dependencies comma-separated):
+{tasks_table}
 Start Date: {start_date}
 Deadline: {deadline}
 Available Hours per Week: {hours_per_week}
@@ -161,23 +345,181 @@ Schedule Requirements:
 - Respect task dependencies (don't schedule dependent tasks before prerequisites)
 - Include week numbers and dates"""
 
-    response = client.models.generate_content(model=model, contents=prompt)
-    result = validate_json_response(response.text)
+    result = generate_json(client, model, prompt, 'scheduling', structured)
     return result.get('schedule', [])
 
-def risk_analysis_agent(tasks: List[Dict[str, Any]], schedule: List[Dict[str, Any]], model: str, client) -> List[Dict[str, Any]]:
+def _task_hours(task: Dict[str, Any]) -> float:
+    """Read a task's estimated hours, treating missing or malformed values as zero."""
+    try:
+        return max(0.0, float(task.get('estimated_hours', 0) or 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+def _round_hours(hours: float):
+    """Keep whole hours as ints so local schedules look like the LLM ones."""
+    rounded = round(hours, 2)
+    return int(rounded) if rounded == int(rounded) else rounded
+
+def find_dependency_cycles(tasks: List[Dict[str, Any]]) -> List[List[str]]:
+    """
+    Return every dependency cycle among the tasks as a list of task ids.
+
+    Uses an iterative Tarjan strongly-connected-components pass, so it runs in
+    O(V+E) and does not hit the recursion limit on large plans.
+    """
+    ids = [task.get('id') for task in tasks]
+    known = set(ids)
+    edges = {task.get('id'): [dep for dep in task.get('dependencies', []) or [] if dep in known] for task in tasks}
+
+    index: Dict[str, int] = {}
+    lowlink: Dict[str, int] = {}
+    on_stack: set = set()
+    stack: List[str] = []
+    cycles: List[List[str]] = []
+    counter = 0
+
+    for root in ids:
+        if root in index:
+            continue
+        work = [(root, 0)]
+        while work:
+            node, edge_pos = work.pop()
+            if edge_pos == 0:
+                index[node] = lowlink[node] = counter
+                counter += 1
+                stack.append(node)
+                on_stack.add(node)
+            neighbours = edges[node]
+            if edge_pos < len(neighbours):
+                work.append((node, edge_pos + 1))
+                child = neighbours[edge_pos]
+                if child not in index:
+                    work.append((child, 0))
+                elif child in on_stack:
+                    lowlink[node] = min(lowlink[node], index[child])
+                continue
+            if lowlink[node] == index[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component.append(member)
+                    if member == node:
+                        break
+                if len(component) > 1 or node in edges[node]:
+                    cycles.append(list(reversed(component)))
+            if work:
+                parent = work[-1][0]
+                lowlink[parent] = min(lowlink[parent], lowlink[node])
+
+    return cycles
+
+def local_scheduling_agent(tasks: List[Dict[str, Any]], start_date: str, deadline: str, hours_per_week) -> Dict[str, Any]:
+    """
+    Agent 3 (local): Build the week-by-week schedule without an LLM call.
+
+    Tasks are taken in topological order, always picking the ready task with the
+    highest priority score, and packed into weeks of `hours_per_week` hours; a
+    task that does not fit is split across weeks. Dependency cycles are reported
+    and their tasks are scheduled by priority once nothing else is ready.
+    Returns {'schedule': [...], 'dependency_cycles': [...]}.
+    """
+    capacity = float(hours_per_week)
+    if capacity <= 0:
+        raise ValueError("hours_per_week must be positive")
+    try:
+        week_zero = datetime.fromisoformat(start_date)
+    except (TypeError, ValueError):
+        week_zero = datetime.now()
+
+    by_id = {task.get('id'): task for task in tasks}
+    position = {task_id: i for i, task_id in enumerate(by_id)}
+    waiting_on = {task_id: 0 for task_id in by_id}
+    dependents: Dict[str, List[str]] = {task_id: [] for task_id in by_id}
+    for task_id, task in by_id.items():
+        for dep in set(task.get('dependencies', []) or []):
+            if dep in by_id and dep != task_id:
+                waiting_on[task_id] += 1
+                dependents[dep].append(task_id)
+
+    def rank(task_id: str):
+        score = by_id[task_id].get('priority_score', 0)
+        try:
+            score = float(score)
+        except (TypeError, ValueError):
+            score = 0.0
+        return (-score, position[task_id], task_id)
+
+    ready = [rank(task_id) for task_id, count in waiting_on.items() if count == 0]
+    heapq.heapify(ready)
+    remaining = set(by_id)
+    cycles = find_dependency_cycles(tasks)
+    # Priority order of every task, used to break cycles without rescanning.
+    fallback = sorted(rank(task_id) for task_id in by_id) if cycles else []
+    fallback_pos = 0
+
+    schedule: List[Dict[str, Any]] = []
+    week: Optional[Dict[str, Any]] = None
+    free = 0.0
+
+    while remaining:
+        if not ready:
+            # Only tasks blocked by a cycle are left: release the best-ranked one.
+            while fallback[fallback_pos][2] not in remaining:
+                fallback_pos += 1
+            heapq.heappush(ready, fallback[fallback_pos])
+        task_id = heapq.heappop(ready)[2]
+        if task_id not in remaining:
+            continue
+        remaining.discard(task_id)
+        task = by_id[task_id]
+        left = _task_hours(task)
+
+        while left > 1e-9:
+            if week is None or free <= 1e-9:
+                week = {
+                    'week_start': (week_zero + timedelta(weeks=len(schedule))).date().isoformat(),
+                    'week_number': len(schedule) + 1,
+                    'hours_planned': 0.0,
+                    'tasks': []
+                }
+                schedule.append(week)
+                free = capacity
+            chunk = min(left, free)
+            week['tasks'].append({
+                'task_id': task_id,
+                'task_title': task.get('title', ''),
+                'hours_assigned': _round_hours(chunk),
+                'milestone': task.get('milestone', '')
+            })
+            week['hours_planned'] += chunk
+            free -= chunk
+            left -= chunk
+
+        for child in dependents[task_id]:
+            waiting_on[child] -= 1
+            if waiting_on[child] == 0 and child in remaining:
+                heapq.heappush(ready, rank(child))
+
+    for entry in schedule:
+        entry['hours_planned'] = _round_hours(entry['hours_planned'])
+
+    return {'schedule': schedule, 'dependency_cycles': cycles}
+
+def risk_analysis_agent(tasks: List[Dict[str, Any]], schedule: Optional[List[Dict[str, Any]]], model: str, client, structured: bool = True) -> List[Dict[str, Any]]:
     """
     Agent 4: Identify top risks with severity levels and mitigation strategies.
+
+    The schedule is optional so risk analysis can run from the prioritized
+    tasks alone, concurrently with the scheduling agent.
     """
-    tasks_json = json.dumps(tasks, indent=2)
-    schedule_json = json.dumps(schedule, indent=2)
+    tasks_table = encode_tasks_table(tasks, PROMPT_TASK_FIELDS['risk_analysis'])
+    schedule_section = f"\nSchedule (week, start, hours: task=hours):\n{encode_schedule_compact(schedule)}" if schedule else ""
     
     prompt = f"""You are a risk analysis expert. Identify potential risks for this project.
 
-Tasks:
-{tasks_json}
-Schedule:
-{schedule_json}
+Tasks (one per row, columns separated by |, dependencies comma-separated):
+{tasks_table}{schedule_section}
 
 Identify 5-8 specific risks that could impact this project. For each risk, provide:
 - Risk description
@@ -202,24 +544,25 @@ Return a JSON object:
 
 Focus on realistic, specific risks that could actually occur during project execution."""
 
-    response = client.models.generate_content(model=model, contents=prompt)
-    result = validate_json_response(response.text)
+    result = generate_json(client, model, prompt, 'risk_analysis', structured)
     return result.get('risks', [])
 
-def optimization_agent(tasks: List[Dict[str, Any]], schedule: List[Dict[str, Any]], risks: List[Dict[str, Any]], model: str, client) -> List[Dict[str, Any]]:
+def optimization_agent(tasks: List[Dict[str, Any]], schedule: List[Dict[str, Any]], risks: List[Dict[str, Any]], model: str, client, structured: bool = True) -> List[Dict[str, Any]]:
     """
     Agent 5: Suggest optimizations for scope, timeline, and task organization.
     """
-    tasks_json = json.dumps(tasks, indent=2)
-    schedule_json = json.dumps(schedule, indent=2)
-    risks_json = json.dumps(risks, indent=2)
+    tasks_table = encode_tasks_table(tasks, PROMPT_TASK_FIELDS['optimization'])
+    schedule_lines = encode_schedule_compact(schedule)
+    risks_json = compact_json([
+        {key: risk.get(key) for key in ('description', 'severity', 'mitigation')} for risk in risks
+    ])
     
     prompt = f"""You are a project optimization expert. Analyze this project and suggest improvements.
 
-Tasks:
-{tasks_json}
-Schedule:
-{schedule_json}
+Tasks (one per row, columns separated by |, dependencies comma-separated):
+{tasks_table}
+Schedule (week, start, hours: task=hours):
+{schedule_lines}
 Risks:
 {risks_json}
 
@@ -245,53 +588,814 @@ Return a JSON object:
 
 Provide 8-12 specific optimizations that would meaningfully improve the project plan."""
 
-    response = client.models.generate_content(model=model, contents=prompt)
-    result = validate_json_response(response.text)
+    result = generate_json(client, model, prompt, 'optimization', structured)
     return result.get('optimizations', [])
 
-def run_planning_pipeline(goal: str, start_date: str, deadline: str, hours_per_week: int, model: str, client, progress_callback=None) -> Dict[str, Any]:
+def decompose_and_prioritize_agent(goal: str, start_date: str, deadline: str, hours_per_week: int, model: str, client, structured: bool = True,
+                                   skills: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Fused Agents 1+2: Decompose the goal and score every task in a single call.
+    """
+    prompt = f"""You are a project planning expert. Break down the following goal into a structured, prioritized project plan.
+
+Goal: {goal}
+Start Date: {start_date}
+Deadline: {deadline}
+Available Hours per Week: {hours_per_week}
+
+Return a JSON object with this exact structure:
+{{
+  "tasks": [
+    {{
+      "id": "task_1",
+      "title": "Task name",
+      "description": "Detailed description",
+      "milestone": "Milestone name",
+      "estimated_hours": 8,
+      "dependencies": [],
+      "deliverable": "What will be delivered",
+      "impact_score": 8,
+      "urgency_score": 7,
+      "effort_score": 6
+    }}
+  ],
+  "milestones": [
+    {{
+      "name": "Milestone name",
+      "description": "Milestone description",
+      "target_date": "YYYY-MM-DD"
+    }}
+  ]
+}}
+
+Requirements:
+- Create 8-15 tasks that comprehensively cover the goal
+- Each task should be specific and actionable
+- Include realistic time estimates (total should fit within the timeline)
+- Identify dependencies between tasks
+- Group tasks into logical milestones
+- Ensure tasks can be completed by one person working {hours_per_week} hours per week{_skills_requirement(skills)}
+- Score Impact, Urgency and Effort from 1-10 (higher effort = more work)"""
+
+    return generate_json(client, model, prompt, 'plan', structured)
+
+def risk_and_optimization_agent(tasks: List[Dict[str, Any]], schedule: List[Dict[str, Any]], model: str, client, structured: bool = True) -> Dict[str, Any]:
+    """
+    Fused Agents 4+5: Identify risks and suggest optimizations in a single call.
+    """
+    tasks_table = encode_tasks_table(tasks, PROMPT_TASK_FIELDS['optimization'])
+    schedule_lines = encode_schedule_compact(schedule)
+    
+    prompt = f"""You are a project risk and optimization expert. Review this project plan.
+
+Tasks (one per row, columns separated by |, dependencies comma-separated):
+{tasks_table}
+Schedule (week, start, hours: task=hours):
+{schedule_lines}
+
+1. Identify 5-8 specific, realistic risks. Rate Probability, Impact and Severity as High/Medium/Low and give a mitigation strategy.
+2. Provide 8-12 specific, actionable optimizations in these categories: Scope Reduction, Timeline Adjustment, Task Reordering, Task Compression, Resource Optimization. Take the identified risks into account.
+
+Return a JSON object:
+{{
+  "risks": [
+    {{
+      "id": "risk_1",
+      "description": "Technical complexity may cause delays",
+      "probability": "Medium",
+      "impact": "High",
+      "severity": "High",
+      "mitigation": "Break down complex tasks earlier, allocate buffer time"
+    }}
+  ],
+  "optimizations": [
+    {{
+      "category": "Scope Reduction",
+      "title": "Simplify authentication system",
+      "description": "Instead of building custom auth, use a third-party service",
+      "impact": "Saves 16 hours, reduces risk",
+      "priority": "High"
+    }}
+  ]
+}}"""
+
+    return generate_json(client, model, prompt, 'review', structured)
+
+def single_call_planning_agent(goal: str, start_date: str, deadline: str, hours_per_week: int, model: str, client, structured: bool = True,
+                               skills: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Fused Agents 1+2+4+5: Prioritized tasks, risks and optimizations from one call.
+    Scheduling is left to the scheduling stage.
+    """
+    prompt = f"""You are a project planning expert. Produce a complete, prioritized project plan for the following goal.
+
+Goal: {goal}
+Start Date: {start_date}
+Deadline: {deadline}
+Available Hours per Week: {hours_per_week}
+
+Return a JSON object with this exact structure:
+{{
+  "tasks": [
+    {{
+      "id": "task_1",
+      "title": "Task name",
+      "description": "Detailed description",
+      "milestone": "Milestone name",
+      "estimated_hours": 8,
+      "dependencies": [],
+      "deliverable": "What will be delivered",
+      "impact_score": 8,
+      "urgency_score": 7,
+      "effort_score": 6
+    }}
+  ],
+  "risks": [
+    {{
+      "id": "risk_1",
+      "description": "Technical complexity may cause delays",
+      "probability": "Medium",
+      "impact": "High",
+      "severity": "High",
+      "mitigation": "Break down complex tasks earlier, allocate buffer time"
+    }}
+  ],
+  "optimizations": [
+    {{
+      "category": "Scope Reduction",
+      "title": "Simplify authentication system",
+      "description": "Instead of building custom auth, use a third-party service",
+      "impact": "Saves 16 hours, reduces risk",
+      "priority": "High"
+    }}
+  ]
+}}
+
+Requirements:
+- Create 8-15 specific, actionable tasks with realistic hour estimates, dependencies and milestones
+- Ensure tasks can be completed by one person working {hours_per_week} hours per week{_skills_requirement(skills)}
+- Score Impact, Urgency and Effort from 1-10 (higher effort = more work)
+- Identify 5-8 realistic risks with mitigation strategies
+- Provide 8-12 optimizations (Scope Reduction, Timeline Adjustment, Task Reordering, Task Compression, Resource Optimization)"""
+
+    return generate_json(client, model, prompt, 'single_call', structured)
+
+def milestone_agent(goal: str, start_date: str, deadline: str, hours_per_week: int, model: str, client, structured: bool = True) -> List[Dict[str, Any]]:
+    """
+    Hierarchical Agent 1a: Split the goal into milestones with hour budgets and ordering.
+    """
+    prompt = f"""You are a project decomposition expert. Split the following goal into milestones.
+
+Goal: {goal}
+Start Date: {start_date}
+Deadline: {deadline}
+Available Hours per Week: {hours_per_week}
+
+Return a JSON object with this exact structure:
+{{
+  "milestones": [
+    {{
+      "name": "Milestone name",
+      "description": "What this milestone achieves",
+      "target_date": "YYYY-MM-DD",
+      "estimated_hours": 120,
+      "depends_on": []
+    }}
+  ]
+}}
+
+Requirements:
+- Create 3-12 milestones in the order they should be worked on
+- Milestone names must be unique
+- `estimated_hours` is the milestone's share of the total effort (the total should fit within the timeline)
+- `depends_on` lists the names of earlier milestones that must be finished first; leave it empty to follow the previous milestone"""
+
+    return generate_json(client, model, prompt, 'milestones', structured).get('milestones', [])
+
+def milestone_tasks_agent(goal: str, milestone: Dict[str, Any], milestones: List[Dict[str, Any]], hours_per_week: int,
+                          model: str, client, structured: bool = True, skills: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+    """
+    Hierarchical Agent 1b: Break one milestone down into tasks.
+    """
+    outline = "\n".join(f"- {m.get('name', '')} ({m.get('estimated_hours', '?')}h)" for m in milestones)
+    prompt = f"""You are a project decomposition expert. Break down one milestone of a larger project into tasks.
+
+Goal: {goal}
+All milestones:
+{outline}
+
+Milestone to break down: {milestone.get('name', '')}
+Description: {milestone.get('description', '')}
+Target Date: {milestone.get('target_date', '')}
+Hour budget: {milestone.get('estimated_hours', '')}
+
+Return a JSON object with this exact structure:
+{{
+  "tasks": [
+    {{
+      "id": "task_1",
+      "title": "Task name",
+      "description": "Detailed description",
+      "milestone": "{milestone.get('name', '')}",
+      "estimated_hours": 8,
+      "dependencies": [],
+      "deliverable": "What will be delivered"
+    }}
+  ]
+}}
+
+Requirements:
+- Cover only this milestone; other milestones are planned separately
+- Each task should be specific and actionable, roughly 2-20 hours
+- Task hours should add up to about the milestone's hour budget
+- Dependencies may only reference other tasks of this milestone
+- Ensure tasks can be completed by one person working {hours_per_week} hours per week{_skills_requirement(skills)}"""
+
+    return generate_json(client, model, prompt, 'milestone_tasks', structured).get('tasks', [])
+
+def merge_milestone_tasks(milestones: List[Dict[str, Any]], task_lists: List[List[Dict[str, Any]]]) -> List[Dict[str, Any]]:
+    """
+    Stitch per-milestone task lists into one plan.
+
+    Task ids are prefixed with the milestone number (`m2_task_3`) so they stay
+    unique, dependencies are remapped within each milestone, and the entry tasks
+    of a milestone (those with no dependencies) are made to depend on the exit
+    tasks (those nothing depends on) of every earlier milestone in its
+    `depends_on`, or of the previous milestone when it names none.
+    """
+    names = {m.get('name'): index for index, m in enumerate(milestones)}
+    merged: List[Dict[str, Any]] = []
+    entries: List[List[Dict[str, Any]]] = []
+    exits: List[List[str]] = []
+
+    for index, (milestone, tasks) in enumerate(zip(milestones, task_lists)):
+        prefix = f"m{index + 1}_"
+        local_ids = {str(task.get('id')) for task in tasks}
+        renamed = []
+        for task in tasks:
+            task = dict(task)
+            task['id'] = prefix + str(task.get('id'))
+            task['milestone'] = milestone.get('name', task.get('milestone', ''))
+            task['dependencies'] = [prefix + str(dep) for dep in task.get('dependencies') or [] if str(dep) in local_ids]
+            renamed.append(task)
+        required = {dep for task in renamed for dep in task['dependencies']}
+        entries.append([task for task in renamed if not task['dependencies']])
+        exits.append([task['id'] for task in renamed if task['id'] not in required])
+        merged.extend(renamed)
+
+    for index, milestone in enumerate(milestones):
+        upstream = [names[name] for name in milestone.get('depends_on') or [] if names.get(name, index) < index]
+        if not upstream and index > 0:
+            # Milestones are sequential unless they name earlier ones to follow
+            upstream = [index - 1]
+        for task in entries[index]:
+            task['dependencies'] = [dep for up in upstream for dep in exits[up]]
+    return merged
+
+MILESTONE_WORKERS = 8
+
+def _goal_cached(ctx: Dict[str, Any], kind: str, produce: Callable[[], Dict[str, Any]], variant: str = '') -> Dict[str, Any]:
+    """Serve a decomposition result from the normalized-goal cache, or produce and store it."""
+    cache = ctx.get('goal_cache')
+    if cache is None:
+        return produce()
+    timeline = (ctx['start_date'], ctx['deadline'], ctx['hours_per_week'])
+    if not ctx.get('cache_bypass'):
+        value = cache.get(kind, ctx['goal'], *timeline, variant=variant, max_age=ctx.get('goal_cache_max_age'))
+        if value is not None:
+            ctx['goal_cache_status'][kind] = 'hit'
+            return value
+    value = produce()
+    cache.put(kind, ctx['goal'], *timeline, value, variant=variant)
+    ctx['goal_cache_status'][kind] = 'bypassed' if ctx.get('cache_bypass') else 'miss'
+    return value
+
+def _skills_variant(ctx: Dict[str, Any]) -> str:
+    # Tasks tagged from one team's skills are not reused for a team with different ones
+    return f"|skills:{','.join(ctx['team_skills'])}" if ctx['team_skills'] else ''
+
+def _milestones_stage(ctx: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return _goal_cached(ctx, 'milestones', lambda: {'milestones': milestone_agent(
+        ctx['goal'], ctx['start_date'], ctx['deadline'], ctx['hours_per_week'], ctx['model'], ctx['client'], ctx['structured_output']
+    )})['milestones']
+
+def _milestone_decomposition_stage(ctx: Dict[str, Any]) -> List[Dict[str, Any]]:
+    milestones = ctx['milestones']
+    if not milestones:
+        return []
+    return _goal_cached(ctx, 'milestone_tasks', lambda: {'tasks': _decompose_milestones(ctx, milestones)},
+                        variant=milestone_variant(milestones) + _skills_variant(ctx))['tasks']
+
+def _decompose_milestones(ctx: Dict[str, Any], milestones: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+
+    def decompose(milestone):
+        set_call_label('decomposition')
+        try:
+            return milestone_tasks_agent(ctx['goal'], milestone, milestones, ctx['hours_per_week'], ctx['model'], ctx['client'],
+                                         ctx['structured_output'], skills=ctx['team_skills'])
+        finally:
+            set_call_label(None)
+
+    with ThreadPoolExecutor(max_workers=min(MILESTONE_WORKERS, len(milestones))) as executor:
+        task_lists = list(executor.map(decompose, milestones))
+    return merge_milestone_tasks(milestones, task_lists)
+
+def _decomposition_stage(ctx: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return _goal_cached(ctx, 'tasks', lambda: {'tasks': decomposition_agent(
+        ctx['goal'], ctx['start_date'], ctx['deadline'], ctx['hours_per_week'], ctx['model'], ctx['client'], ctx['structured_output'],
+        skills=ctx['team_skills']
+    ).get('tasks', [])}, variant=_skills_variant(ctx))['tasks']
+
+def _prioritization_stage(ctx: Dict[str, Any]) -> List[Dict[str, Any]]:
+    if not _uses_llm_prioritizer(ctx):
+        return local_prioritization_agent(ctx['decomposition'])
+    return prioritization_agent(ctx['decomposition'], ctx['model'], ctx['client'], ctx['structured_output'])
+
+def _uses_llm_prioritizer(ctx: Dict[str, Any]) -> bool:
+    return ctx.get('prioritizer', 'llm') == 'llm'
+
+def _scheduling_stage(ctx: Dict[str, Any]) -> List[Dict[str, Any]]:
+    if ctx.get('resources'):
+        return _leveled_schedule(ctx)
+    if _uses_llm_scheduler(ctx):
+        return scheduling_agent(ctx['prioritization'], ctx['start_date'], ctx['deadline'], ctx['hours_per_week'], ctx['model'], ctx['client'], ctx['structured_output'])
+    return local_scheduling_agent(ctx['prioritization'], ctx['start_date'], ctx['deadline'], ctx['hours_per_week'])['schedule']
+
+def _uses_llm_scheduler(ctx: Dict[str, Any]) -> bool:
+    # Team plans are always leveled locally; the scheduling prompt assumes one person
+    return ctx.get('scheduler', 'local') == 'llm' and not ctx.get('resources')
+
+def _leveled_schedule(ctx: Dict[str, Any]) -> List[Dict[str, Any]]:
+    leveled = level_resources(ctx['prioritization'], ctx['resources'], ctx['start_date'])
+    ctx['resource_plan'] = {key: leveled[key] for key in ('resources', 'makespan_weeks', 'method', 'optimal', 'skill_gaps')}
+    return leveled['schedule']
+
+def _local_prioritization_fallback(ctx: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return local_prioritization_agent(ctx['decomposition'])
+
+def _local_schedule_fallback(ctx: Dict[str, Any]) -> List[Dict[str, Any]]:
+    if ctx.get('resources'):
+        return _leveled_schedule(ctx)
+    return local_scheduling_agent(ctx['prioritization'], ctx['start_date'], ctx['deadline'], ctx['hours_per_week'])['schedule']
+
+def _risk_analysis_stage(ctx: Dict[str, Any]) -> List[Dict[str, Any]]:
+    # Never the schedule: it is not a dependency, so whether it is in the context
+    # yet depends on timing, and the prompt (and its cache key) must not
+    return risk_analysis_agent(ctx['prioritization'], None, ctx['model'], ctx['client'], ctx['structured_output'])
+
+def _optimization_stage(ctx: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return optimization_agent(ctx['prioritization'], ctx['scheduling'], ctx['risk_analysis'], ctx['model'], ctx['client'], ctx['structured_output'])
+
+# The planning pipeline as a dependency graph. Each stage reads its inputs
+# from the shared context and its output is stored back under its name;
+# `inputs` lists the request parameters it reads besides upstream outputs,
+# `fallback` gives a degraded local result used when the stage runs out of
+# time, and `llm` says whether it calls the model (default True).
+# Risk analysis works from the prioritized tasks alone, so it overlaps with scheduling.
+PIPELINE_STAGES: List[Dict[str, Any]] = [
+    {'name': 'decomposition', 'deps': [], 'run': _decomposition_stage, 'inputs': ['goal'],
+     'message': "🧠 Decomposition Agent: Breaking down your goal...", 'progress': 10},
+    {'name': 'prioritization', 'deps': ['decomposition'], 'run': _prioritization_stage, 'inputs': [],
+     'llm': _uses_llm_prioritizer, 'fallback': _local_prioritization_fallback,
+     'message': "⚡ Prioritization Agent: Scoring tasks by impact and urgency...", 'progress': 30},
+    {'name': 'scheduling', 'deps': ['prioritization'], 'run': _scheduling_stage,
+     'inputs': ['start_date', 'deadline', 'hours_per_week'], 'llm': _uses_llm_scheduler, 'fallback': _local_schedule_fallback,
+     'message': "📅 Scheduling Agent: Creating your optimal timeline...", 'progress': 50},
+    {'name': 'risk_analysis', 'deps': ['prioritization'], 'run': _risk_analysis_stage,
+     'inputs': ['start_date', 'deadline', 'hours_per_week'], 'fallback': lambda ctx: [],
+     'message': "⚠️ Risk Analysis Agent: Identifying potential challenges...", 'progress': 70},
+    {'name': 'optimization', 'deps': ['scheduling', 'risk_analysis'], 'run': _optimization_stage,
+     'inputs': ['start_date', 'deadline', 'hours_per_week'], 'fallback': lambda ctx: [],
+     'message': "🔧 Optimization Agent: Finding improvements...", 'progress': 90},
+]
+
+def _plan_stage(ctx: Dict[str, Any]) -> Dict[str, Any]:
+    tasks = decompose_and_prioritize_agent(ctx['goal'], ctx['start_date'], ctx['deadline'], ctx['hours_per_week'], ctx['model'], ctx['client'],
+                                           ctx['structured_output'], skills=ctx['team_skills']).get('tasks', [])
+    tasks = apply_priority_scores(tasks)
+    return {'decomposition': tasks, 'prioritization': tasks}
+
+def _review_stage(ctx: Dict[str, Any]) -> Dict[str, Any]:
+    result = risk_and_optimization_agent(ctx['prioritization'], ctx['scheduling'], ctx['model'], ctx['client'], ctx['structured_output'])
+    return {'risk_analysis': result.get('risks', []), 'optimization': result.get('optimizations', [])}
+
+def _single_call_stage(ctx: Dict[str, Any]) -> Dict[str, Any]:
+    result = single_call_planning_agent(ctx['goal'], ctx['start_date'], ctx['deadline'], ctx['hours_per_week'], ctx['model'], ctx['client'],
+                                        ctx['structured_output'], skills=ctx['team_skills'])
+    tasks = apply_priority_scores(result.get('tasks', []))
+    return {
+        'decomposition': tasks,
+        'prioritization': tasks,
+        'risk_analysis': result.get('risks', []),
+        'optimization': result.get('optimizations', [])
+    }
+
+# Fused variants of the pipeline. A stage with `provides` returns a dict holding
+# several of the five standard outputs, so the final plan has the same shape.
+FUSED_PIPELINE_STAGES: List[Dict[str, Any]] = [
+    {'name': 'plan', 'deps': [], 'run': _plan_stage, 'provides': ['decomposition', 'prioritization'], 'inputs': ['goal'],
+     'message': "🧠 Planning Agent: Breaking down and prioritizing your goal...", 'progress': 10},
+    {'name': 'scheduling', 'deps': ['plan'], 'run': _scheduling_stage,
+     'inputs': ['start_date', 'deadline', 'hours_per_week'], 'llm': _uses_llm_scheduler, 'fallback': _local_schedule_fallback,
+     'message': "📅 Scheduling Agent: Creating your optimal timeline...", 'progress': 50},
+    {'name': 'review', 'deps': ['scheduling'], 'run': _review_stage, 'provides': ['risk_analysis', 'optimization'],
+     'inputs': ['start_date', 'deadline', 'hours_per_week'], 'fallback': lambda ctx: {'risk_analysis': [], 'optimization': []},
+     'message': "⚠️ Review Agent: Analyzing risks and finding improvements...", 'progress': 70},
+]
+
+SINGLE_CALL_PIPELINE_STAGES: List[Dict[str, Any]] = [
+    {'name': 'plan', 'deps': [], 'run': _single_call_stage,
+     'provides': ['decomposition', 'prioritization', 'risk_analysis', 'optimization'],
+     'inputs': ['goal', 'start_date', 'deadline', 'hours_per_week'],
+     'message': "🧠 Planning Agent: Building your complete plan...", 'progress': 10},
+    {'name': 'scheduling', 'deps': ['plan'], 'run': _scheduling_stage,
+     'inputs': ['start_date', 'deadline', 'hours_per_week'], 'llm': _uses_llm_scheduler, 'fallback': _local_schedule_fallback,
+     'message': "📅 Scheduling Agent: Creating your optimal timeline...", 'progress': 70},
+]
+
+# Map-reduce decomposition for large goals: one call plans the milestones, then
+# each milestone is broken into tasks in parallel and the results are merged.
+HIERARCHICAL_PIPELINE_STAGES: List[Dict[str, Any]] = [
+    {'name': 'milestones', 'deps': [], 'run': _milestones_stage,
+     'inputs': ['goal', 'start_date', 'deadline', 'hours_per_week'],
+     'message': "🗺️ Milestone Agent: Outlining your milestones...", 'progress': 5},
+    {'name': 'decomposition', 'deps': ['milestones'], 'run': _milestone_decomposition_stage,
+     'inputs': ['goal', 'hours_per_week'],
+     'message': "🧠 Decomposition Agent: Breaking down each milestone...", 'progress': 15},
+] + PIPELINE_STAGES[1:]
+
+PIPELINE_MODES = {
+    'staged': PIPELINE_STAGES,
+    'fused': FUSED_PIPELINE_STAGES,
+    'single': SINGLE_CALL_PIPELINE_STAGES,
+    'hierarchical': HIERARCHICAL_PIPELINE_STAGES,
+}
+
+# Plan field each stage's output fills in, used when streaming partial results.
+STAGE_RESULT_KEYS = {
+    'decomposition': 'tasks',
+    'prioritization': 'tasks',
+    'scheduling': 'schedule',
+    'risk_analysis': 'risks',
+    'optimization': 'optimizations',
+}
+
+def _validate_stage_graph(stages: List[Dict[str, Any]]) -> None:
+    """Reject stage graphs with unknown dependencies or cycles."""
+    names = {stage['name'] for stage in stages}
+    for stage in stages:
+        missing = [dep for dep in stage['deps'] if dep not in names]
+        if missing:
+            raise ValueError(f"Stage '{stage['name']}' depends on unknown stages: {missing}")
+
+    visited: Dict[str, int] = {}
+    deps_by_name = {stage['name']: stage['deps'] for stage in stages}
+
+    def visit(name: str) -> None:
+        if visited.get(name) == 1:
+            raise ValueError(f"Pipeline stages contain a cycle through '{name}'")
+        if visited.get(name) == 2:
+            return
+        visited[name] = 1
+        for dep in deps_by_name[name]:
+            visit(dep)
+        visited[name] = 2
+
+    for name in deps_by_name:
+        visit(name)
+
+def stage_output_keys(stage: Dict[str, Any]) -> List[str]:
+    """Context keys a stage fills in."""
+    return stage.get('provides', [stage['name']])
+
+def reusable_stages(stages: List[Dict[str, Any]], available: Dict[str, Any]) -> List[str]:
+    """
+    Names of stages whose outputs are all in `available` and whose upstream stages
+    are reusable too; everything else (and everything downstream of it) must run.
+    """
+    by_name = {stage['name']: stage for stage in stages}
+    memo: Dict[str, bool] = {}
+
+    def reusable(name: str) -> bool:
+        if name not in memo:
+            stage = by_name[name]
+            memo[name] = all(key in available for key in stage_output_keys(stage)) and all(reusable(dep) for dep in stage['deps'])
+        return memo[name]
+
+    return [stage['name'] for stage in stages if reusable(stage['name'])]
+
+def _stage_uses_llm(stage: Dict[str, Any], context: Dict[str, Any]) -> bool:
+    uses_llm = stage.get('llm', True)
+    return uses_llm(context) if callable(uses_llm) else bool(uses_llm)
+
+# Share of the remaining time budget that stages without a fallback leave for later stages that have one
+FALLBACK_BUDGET_RESERVE = 0.1
+
+def execute_stage_graph(stages: List[Dict[str, Any]], context: Dict[str, Any], progress_callback: Optional[Callable] = None,
+                        max_workers: Optional[int] = None, stage_callback: Optional[Callable] = None,
+                        skip: Optional[List[str]] = None, time_budget: Optional[float] = None,
+                        breaker: Optional[CircuitBreaker] = None,
+                        llm_calls: Optional[Callable[[str], int]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Run pipeline stages on a thread pool, starting each one as soon as its dependencies finish.
+
+    Stage outputs are written into `context` under the stage name, or, for stages
+    that declare `provides`, under each of those keys. Returns per-stage
+    timings: `wall` (the stage's own duration) and `critical_path` (the longest chain
+    of dependent stage durations ending with this stage). `stage_callback(name, output,
+    timing)` is called from the coordinating thread for each output as its stage completes.
+    Stages named in `skip` are not run; their outputs must already be in `context`.
+
+    With a `time_budget` (seconds for the whole graph) each stage is started with a
+    timeout, splitting the remaining budget by expected cost: LLM stages weigh 1
+    and local stages nothing. A stage with a fallback gets its share of the
+    heaviest chain of stages left from it. A stage without one gets its share of
+    the chain of such stages, out of all but FALLBACK_BUDGET_RESERVE of the
+    remaining budget (the reserve is left for later stages that can fall back).
+    A stage that overruns is abandoned and replaced by its `fallback(context)`
+    output, marked with `degraded: 'timeout'` in its timing; stages without a
+    fallback fail the run. While `breaker` is open, LLM stages
+    that have a fallback use it straight away (`degraded: 'circuit_open'`).
+    Only those stages report to the breaker: a timeout or error counts as a
+    failure, and a success counts only if `llm_calls(name)` (calls the stage
+    made that reached the LLM rather than a cache) is positive.
+    """
+    _validate_stage_graph(stages)
+    skip = set(skip or [])
+
+    pending = {stage['name']: stage for stage in stages}
+    done: set = set()
+    timings: Dict[str, Dict[str, Any]] = {}
+    running = {}
+    started_at: Dict[Any, float] = {}
+    expires_at: Dict[Any, Optional[float]] = {}
+    admitted: Dict[Any, str] = {}
+    budget_ends = time.time() + time_budget if time_budget is not None else None
+
+    by_name = {stage['name']: stage for stage in stages}
+    children: Dict[str, List[str]] = {stage['name']: [] for stage in stages}
+    for stage in stages:
+        for dep in stage['deps']:
+            children[dep].append(stage['name'])
+    chain_memo: Dict[Any, float] = {}
+
+    def cost(stage: Dict[str, Any], required_only: bool) -> float:
+        if required_only and 'fallback' in stage:
+            return 0.0
+        return 1.0 if _stage_uses_llm(stage, context) else 0.0
+
+    def chain_cost(name: str, required_only: bool) -> float:
+        # Expected cost of the heaviest chain of stages starting at `name`
+        if (name, required_only) not in chain_memo:
+            chain_memo[name, required_only] = cost(by_name[name], required_only) + max(
+                (chain_cost(child, required_only) for child in children[name]), default=0.0
+            )
+        return chain_memo[name, required_only]
+
+    def stage_budget(stage: Dict[str, Any], remaining: float) -> float:
+        required_only = 'fallback' not in stage
+        share, chain = cost(stage, required_only), chain_cost(stage['name'], required_only)
+        if not share:
+            # Local stages take milliseconds; only the overall budget bounds them
+            return remaining
+        if required_only and chain_cost(stage['name'], False) > chain:
+            remaining *= 1 - FALLBACK_BUDGET_RESERVE
+        return remaining * share / chain
+
+    def timed(stage: Dict[str, Any]):
+        set_call_label(stage['name'])
+        started = time.time()
+        try:
+            output = stage['run'](context)
+        finally:
+            set_call_label(None)
+        return output, started, time.time()
+
+    def complete(stage: Dict[str, Any], output: Any, wall: float, degraded: Optional[str] = None) -> None:
+        outputs = {key: output[key] for key in stage['provides']} if 'provides' in stage else {stage['name']: output}
+        context.update(outputs)
+        upstream = max((timings[dep]['critical_path'] for dep in stage['deps']), default=0.0)
+        timings[stage['name']] = {'wall': wall, 'critical_path': upstream + wall}
+        if degraded:
+            timings[stage['name']]['degraded'] = degraded
+        done.add(stage['name'])
+        if stage_callback:
+            for key, value in outputs.items():
+                stage_callback(key, value, timings[stage['name']])
+
+    executor = ThreadPoolExecutor(max_workers=max_workers or len(stages) or 1)
+    try:
+        while pending or running:
+            ready = [stage for stage in pending.values() if all(dep in done for dep in stage['deps'])]
+            for stage in ready:
+                del pending[stage['name']]
+                if stage['name'] in skip:
+                    upstream = max((timings[dep]['critical_path'] for dep in stage['deps']), default=0.0)
+                    timings[stage['name']] = {'wall': 0.0, 'critical_path': upstream}
+                    done.add(stage['name'])
+                    if stage_callback:
+                        for key in stage_output_keys(stage):
+                            stage_callback(key, context[key], timings[stage['name']])
+                    continue
+                status = None
+                if breaker is not None and 'fallback' in stage and _stage_uses_llm(stage, context):
+                    status = breaker.admit()
+                    if status is None:
+                        complete(stage, stage['fallback'](context), 0.0, degraded='circuit_open')
+                        continue
+                if progress_callback:
+                    progress_callback(stage['message'], stage['progress'])
+                future = executor.submit(timed, stage)
+                if status is not None:
+                    admitted[future] = status
+                running[future] = stage
+                started_at[future] = time.time()
+                expires_at[future] = None
+                if budget_ends is not None:
+                    expires_at[future] = started_at[future] + stage_budget(stage, max(0.0, budget_ends - started_at[future]))
+
+            if not running:
+                continue
+            deadlines = [expires_at[future] for future in running if expires_at[future] is not None]
+            wait_for = max(0.0, min(deadlines) - time.time()) if deadlines else None
+            finished, _ = wait(running, timeout=wait_for, return_when=FIRST_COMPLETED)
+            for future in finished:
+                stage = running.pop(future)
+                status = admitted.pop(future, None)
+                try:
+                    output, started, ended = future.result()
+                except Exception as e:
+                    if status is not None:
+                        breaker.record_failure(trial=status == 'trial')
+                    for other in running:
+                        other.cancel()
+                    raise RuntimeError(f"{stage['name']} stage failed: {e}") from e
+                if status is not None:
+                    if llm_calls is None or llm_calls(stage['name']):
+                        breaker.record_success(trial=status == 'trial')
+                    elif status == 'trial':
+                        breaker.release_trial()
+                complete(stage, output, ended - started)
+
+            now = time.time()
+            for future, stage in list(running.items()):
+                if expires_at[future] is None or now < expires_at[future]:
+                    continue
+                # Overran its budget: abandon the call (the thread finishes in the background)
+                running.pop(future)
+                future.cancel()
+                status = admitted.pop(future, None)
+                if status is not None:
+                    breaker.record_failure(trial=status == 'trial')
+                if 'fallback' not in stage:
+                    raise TimeoutError(f"{stage['name']} stage exceeded its {expires_at[future] - started_at[future]:.1f}s budget")
+                complete(stage, stage['fallback'](context), now - started_at[future], degraded='timeout')
+    finally:
+        # Stages abandoned when the run failed never reported their trial
+        if 'trial' in admitted.values():
+            breaker.release_trial()
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return timings
+
+SCHEDULERS = ('local', 'llm')
+PRIORITIZERS = ('llm', 'local')
+
+class PipelineError(ValueError):
+    """A failed planning run; `run_id` names its checkpoint when one was kept."""
+
+    def __init__(self, message: str, run_id: Optional[str] = None):
+        super().__init__(message)
+        self.run_id = run_id
+
+def _is_json_response(text: str) -> bool:
+    """True if the response parses as agent JSON, i.e. is worth caching."""
+    try:
+        validate_json_response(text)
+        return True
+    except ValueError:
+        return False
+
+def run_planning_pipeline(goal: str, start_date: str, deadline: str, hours_per_week: int, model: str, client, progress_callback=None,
+                          scheduler: str = 'local', cache: Optional[ResponseCache] = None, cache_bypass: bool = False,
+                          stage_callback: Optional[Callable] = None, pipeline_mode: str = 'staged',
+                          structured_output: bool = True, checkpoints: Optional[CheckpointStore] = None,
+                          run_id: Optional[str] = None, reuse_outputs: Optional[Dict[str, Any]] = None,
+                          time_budget: Optional[float] = None, breaker: Optional[CircuitBreaker] = None,
+                          goal_cache: Optional[DecompositionCache] = None, goal_cache_max_age: Optional[float] = None,
+                          prioritizer: str = 'llm', resources: Optional[List[Dict[str, Any]]] = None,
+                          replan: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
     """
     Run the complete 5-agent planning pipeline with timing and progress tracking.
+
+    Stages are executed from PIPELINE_STAGES, so independent agents run concurrently.
+    `scheduler` selects the deterministic local scheduler (default) or the LLM
+    scheduling agent ('llm'), and `prioritizer` the LLM prioritization agent (default)
+    or the heuristic local scorer ('local'). With `resources` (people with their
+    own `hours_per_week` and `skills`) tasks are leveled across the team locally
+    (see leveling.level_resources) and the plan gains a `resource_plan` and keeps the team as `resources`. When a `cache` is given, LLM responses are served
+    from it unless `cache_bypass` is set. `stage_callback(name, output, timing)`
+    receives each stage's result as soon as it is available. `pipeline_mode` picks
+    the five-stage graph ('staged'), the two-LLM-call graph ('fused'), the
+    one-LLM-call graph ('single') or, for large goals, the staged graph with
+    milestone-by-milestone decomposition ('hierarchical', which also returns
+    `milestones`); all return the same plan shape. With
+    `structured_output` agents request schema-constrained JSON responses.
+
+    With a `checkpoints` store every completed stage output is saved under `run_id`.
+    Calling again with the same `run_id` reuses the saved outputs and only runs the
+    stages that failed or had not run yet, plus everything downstream of them.
+    `reuse_outputs` supplies stage outputs the caller already has (keyed like
+    STAGE_RESULT_KEYS); stages fully covered by them are not run either, and are
+    saved to the checkpoint so a resume reuses them too. `replan` (see
+    replan_project) is recorded with the run's inputs.
+
+    `time_budget` caps the whole run in seconds and `breaker` skips the LLM after
+    repeated timeouts; stages that run out of time return degraded local results
+    (see execute_stage_graph), listed in performance_metrics.degraded_stages.
+
+    A `goal_cache` serves decomposition results for goals that normalize to the
+    same signature, re-dated to this timeline; entries older than
+    `goal_cache_max_age` seconds are ignored and `cache_bypass` skips reads.
+
+    Every task carries its critical path timing (see cpm.annotate_plan) and the
+    plan a `critical_path` summary and a Monte Carlo `schedule_risk` forecast.
     """
+    if scheduler not in SCHEDULERS:
+        raise ValueError(f"Unknown scheduler '{scheduler}', expected one of {SCHEDULERS}")
+    if prioritizer not in PRIORITIZERS:
+        raise ValueError(f"Unknown prioritizer '{prioritizer}', expected one of {PRIORITIZERS}")
+    if pipeline_mode not in PIPELINE_MODES:
+        raise ValueError(f"Unknown pipeline mode '{pipeline_mode}', expected one of {tuple(PIPELINE_MODES)}")
+    metered_client = MeteredClient(client)
+    client = metered_client
+    if cache is not None:
+        client = CachedClient(client, cache, bypass=cache_bypass, should_cache=_is_json_response)
+
+    stages = PIPELINE_MODES[pipeline_mode]
+    saved_outputs = dict(reuse_outputs or {})
+    on_stage = stage_callback
+    if checkpoints is not None:
+        run_id = run_id or checkpoints.new_run_id()
+        checkpoint = checkpoints.start(run_id, {
+            'goal': goal,
+            'start_date': start_date,
+            'deadline': deadline,
+            'hours_per_week': hours_per_week,
+            'scheduler': scheduler,
+            'prioritizer': prioritizer,
+            'resources': resources,
+            'pipeline_mode': pipeline_mode,
+            'structured_output': structured_output,
+            'replan': replan,
+        })
+        saved_outputs.update(checkpoint['outputs'])
+    reused = reusable_stages(stages, saved_outputs)
+    if checkpoints is not None:
+        # Caller-supplied outputs exist nowhere else, so a resume needs them from the checkpoint
+        seeded = {key: saved_outputs[key] for stage in stages if stage['name'] in reused
+                  for key in stage_output_keys(stage) if key not in checkpoint['outputs']}
+        if seeded:
+            checkpoints.seed_outputs(run_id, seeded)
+        stage_names = {key: stage['name'] for stage in stages for key in stage_output_keys(stage)}
+
+        def on_stage(key, output, timing):
+            # Degraded outputs are not checkpointed, so a resume retries them
+            if stage_names[key] not in reused and not timing.get('degraded'):
+                checkpoints.save_output(run_id, key, output, stage_names[key], timing['wall'])
+            if stage_callback:
+                stage_callback(key, output, timing)
+
     try:
-        agent_times = {}
         total_start_time = time.time()
+        context = {
+            'goal': goal,
+            'start_date': start_date,
+            'deadline': deadline,
+            'hours_per_week': hours_per_week,
+            'model': model,
+            'client': client,
+            'scheduler': scheduler,
+            'prioritizer': prioritizer,
+            'resources': resources,
+            'team_skills': team_skills(resources) if resources else [],
+            'structured_output': structured_output,
+            'goal_cache': goal_cache,
+            'goal_cache_max_age': goal_cache_max_age,
+            'goal_cache_status': {},
+            'cache_bypass': cache_bypass,
+        }
+        if reused:
+            context.update({key: saved_outputs[key] for stage in stages if stage['name'] in reused for key in stage_output_keys(stage)})
         
-        # Agent 1: Decomposition
-        if progress_callback:
-            progress_callback("🧠 Decomposition Agent: Breaking down your goal...", 10)
-        start_time = time.time()
-        decomposition_result = decomposition_agent(goal, start_date, deadline, hours_per_week, model, client)
-        tasks = decomposition_result.get('tasks', [])
-        agent_times['decomposition'] = time.time() - start_time
-        
-        # Agent 2: Prioritization
-        if progress_callback:
-            progress_callback("⚡ Prioritization Agent: Scoring tasks by impact and urgency...", 30)
-        start_time = time.time()
-        prioritized_tasks = prioritization_agent(tasks, model, client)
-        agent_times['prioritization'] = time.time() - start_time
-        
-        # Agent 3: Scheduling
-        if progress_callback:
-            progress_callback("📅 Scheduling Agent: Creating your optimal timeline...", 50)
-        start_time = time.time()
-        schedule = scheduling_agent(prioritized_tasks, start_date, deadline, hours_per_week, model, client)
-        agent_times['scheduling'] = time.time() - start_time
-        
-        # Agent 4: Risk Analysis
-        if progress_callback:
-            progress_callback("⚠️ Risk Analysis Agent: Identifying potential challenges...", 70)
-        start_time = time.time()
-        risks = risk_analysis_agent(prioritized_tasks, schedule, model, client)
-        agent_times['risk_analysis'] = time.time() - start_time
+        timings = execute_stage_graph(stages, context, progress_callback, stage_callback=on_stage, skip=reused,
+                                      time_budget=time_budget, breaker=breaker, llm_calls=metered_client.calls)
+        degraded = {name: t['degraded'] for name, t in timings.items() if t.get('degraded')}
         
-        # Agent 5: Optimization
-        if progress_callback:
-            progress_callback("🔧 Optimization Agent: Finding improvements...", 90)
-        start_time = time.time()
-        optimizations = optimization_agent(prioritized_tasks, schedule, risks, model, client)
-        agent_times['optimization'] = time.time() - start_time
+        prioritized_tasks = context['prioritization']
+        schedule = context['scheduling']
+        risks = context['risk_analysis']
+        optimizations = context['optimization']
         
         total_time = time.time() - total_start_time
         
@@ -305,18 +1409,186 @@ def run_planning_pipeline(goal: str, start_date: str, deadline: str, hours_per_w
             'schedule': schedule,
             'risks': risks,
             'optimizations': optimizations,
+            'dependency_cycles': find_dependency_cycles(prioritized_tasks),
+            'degraded': bool(degraded),
             'generated_at': datetime.now().isoformat(),
             'performance_metrics': {
                 'total_time': round(total_time, 2),
-                'agent_times': {k: round(v, 2) for k, v in agent_times.items()},
+                'scheduler': scheduler,
+                'prioritizer': prioritizer,
+                'pipeline_mode': pipeline_mode,
+                'llm_usage': metered_client.usage(),
+                'prompt_sizes': metered_client.usage_by_label(),
+                'response_checks': metered_client.events_by_label(),
+                'structured_output': structured_output,
+                'agent_times': {name: round(t['wall'], 2) for name, t in timings.items()},
+                'agent_critical_path_times': {name: round(t['critical_path'], 2) for name, t in timings.items()},
+                'critical_path_time': round(max((t['critical_path'] for t in timings.values()), default=0.0), 2),
                 'total_tasks': len(prioritized_tasks),
                 'total_schedule_weeks': len(schedule),
                 'total_risks': len(risks),
-                'total_optimizations': len(optimizations)
+                'total_optimizations': len(optimizations),
+                'time_budget': time_budget,
+                'degraded_stages': degraded
             }
         }
+        if 'milestones' in context:
+            result['milestones'] = context['milestones']
+        if resources:
+            # The team as requested, so a replan can tell whether it changed
+            result['resources'] = resources
+            # Recomputed when the schedule was reused from a checkpoint
+            result['resource_plan'] = context.get('resource_plan') or {
+                key: value for key, value in level_resources(prioritized_tasks, resources, start_date).items() if key != 'schedule'
+            }
+        if goal_cache is not None:
+            result['performance_metrics']['decomposition_cache'] = context['goal_cache_status']
+        if isinstance(client, CachedClient):
+            result['performance_metrics']['llm_cache'] = dict(client.stats)
+        result['performance_metrics']['reused_stages'] = reused
+        cpm_start_time = time.time()
+        result = annotate_plan(result)
+        result['performance_metrics']['cpm_time'] = round(time.time() - cpm_start_time, 3)
+        simulation_start_time = time.time()
+        result['schedule_risk'] = schedule_risk(result)
+        result['performance_metrics']['simulation_time'] = round(time.time() - simulation_start_time, 3)
+        if checkpoints is not None:
+            result['run_id'] = run_id
+            checkpoints.finish(run_id)
         
         return result
     
     except Exception as e:
-        raise ValueError(f"Planning pipeline failed: {str(e)}")
\ No newline at end of file
+        if checkpoints is not None:
+            checkpoints.finish(run_id, error=str(e))
+        raise PipelineError(f"Planning pipeline failed: {str(e)}", run_id=run_id if checkpoints is not None else None)
+
+REPLAN_INPUTS = ('goal', 'start_date', 'deadline', 'hours_per_week')
+
+def validate_replan(project: Any, changes: Any) -> Optional[str]:
+    """Return an error message for a project or change set replan_project cannot use, or None."""
+    if not isinstance(project, dict):
+        return 'project_data must be an object'
+    tasks = project.get('tasks', [])
+    if not isinstance(tasks, list) or not all(isinstance(task, dict) for task in tasks):
+        return 'project tasks must be a list of objects'
+    if not isinstance(changes, dict):
+        return 'changes must be an object'
+    edits = changes.get('tasks') or {}
+    if not isinstance(edits, dict) or not all(isinstance(edit, dict) for edit in edits.values()):
+        return 'changes.tasks must map task ids to field changes'
+    if not isinstance(changes.get('remove_tasks') or [], list):
+        return 'changes.remove_tasks must be a list of task ids'
+    added = changes.get('add_tasks') or []
+    if not isinstance(added, list) or not all(isinstance(task, dict) for task in added):
+        return 'changes.add_tasks must be a list of task objects'
+    return None
+
+def apply_task_changes(tasks: List[Dict[str, Any]], changes: Dict[str, Any]):
+    """
+    Apply a change set's task edits to a copy of `tasks`.
+
+    `changes` may hold `tasks` ({task_id: {field: value}}), `remove_tasks` (ids,
+    also dropped from other tasks' dependencies) and `add_tasks` (new task dicts).
+    Returns (tasks, changed, priority_only) where `priority_only` means every edit
+    touched only priority fields.
+    """
+    edits = changes.get('tasks') or {}
+    removed = set(changes.get('remove_tasks') or [])
+    added = changes.get('add_tasks') or []
+    edited_fields = {field for fields in edits.values() for field in fields}
+
+    updated = []
+    for task in tasks:
+        if task.get('id') in removed:
+            continue
+        task = {**task, **edits.get(task.get('id'), {})}
+        if removed and set(task.get('dependencies') or []) & removed:
+            task['dependencies'] = [dep for dep in task['dependencies'] if dep not in removed]
+        updated.append(task)
+    updated.extend(dict(task) for task in added)
+
+    changed = bool(edits or removed or added)
+    priority_only = changed and not removed and not added and edited_fields <= set(PRIORITY_FIELDS)
+    if priority_only and edited_fields & {'impact_score', 'urgency_score', 'effort_score'}:
+        # Keep scores and labels consistent with the edited ratings
+        updated = apply_priority_scores(updated)
+    return updated, changed, priority_only
+
+def replan_project(project: Dict[str, Any], changes: Dict[str, Any], model: str, client, **pipeline_options) -> Dict[str, Any]:
+    """
+    Recompute a saved plan after a change set, rerunning only the affected stages.
+
+    Changed request parameters invalidate the stages that declare them in
+    `inputs` (e.g. hours_per_week reruns scheduling, risk analysis and
+    optimization, not decomposition). Task edits keep the edited tasks as the
+    decomposition and rerun prioritization (unless only priority fields changed)
+    and scheduling, plus risk analysis when a priority label changed, since its
+    prompt lists them. A different `scheduler` or team (`resources`) than the
+    saved plan's reruns scheduling and everything after it, and a different
+    `prioritizer` reruns prioritization. Always uses the staged pipeline, the
+    only one whose stages can be rerun individually. Extra options are passed to
+    run_planning_pipeline.
+    """
+    inputs = {key: changes.get(key, project.get(key)) for key in REPLAN_INPUTS}
+    changed_inputs = [key for key in REPLAN_INPUTS if key in changes and changes[key] != project.get(key)]
+    metrics = project.get('performance_metrics') or {}
+    # A leveled plan saved without its team (see run_planning_pipeline) matches no team
+    team = pipeline_options.get('resources') or None
+    if team != (project.get('resources') or None) or (team is None and project.get('resource_plan')):
+        changed_inputs.append('resources')
+    for option, default in (('scheduler', 'local'), ('prioritizer', 'llm')):
+        if pipeline_options.get(option, default) != metrics.get(option, default):
+            changed_inputs.append(option)
+    tasks, tasks_changed, priority_only = apply_task_changes(project.get('tasks', []), changes)
+
+    available = {
+        'decomposition': tasks,
+        'prioritization': tasks,
+        'scheduling': project.get('schedule'),
+        'risk_analysis': project.get('risks'),
+        'optimization': project.get('optimizations'),
+    }
+    for stage in PIPELINE_STAGES:
+        if set(stage.get('inputs', [])) & set(changed_inputs):
+            for key in stage_output_keys(stage):
+                available.pop(key, None)
+    # Stages downstream of these rerun too (see reusable_stages)
+    if 'resources' in changed_inputs or 'scheduler' in changed_inputs:
+        available.pop('scheduling', None)
+    if 'prioritizer' in changed_inputs:
+        available.pop('prioritization', None)
+    if tasks_changed:
+        available.pop('scheduling', None)
+        if not priority_only:
+            available.pop('prioritization', None)
+        else:
+            labels = {task.get('id'): task.get('priority_label') for task in project.get('tasks', [])}
+            if any(task.get('priority_label') != labels.get(task.get('id')) for task in tasks):
+                available.pop('risk_analysis', None)
+    available = {key: value for key, value in available.items() if value is not None}
+
+    replan = {'changes': changed_inputs + (['tasks'] if tasks_changed else []), 'project_name': project.get('project_name')}
+    pipeline_options['pipeline_mode'] = 'staged'
+    result = run_planning_pipeline(
+        goal=inputs['goal'],
+        start_date=inputs['start_date'],
+        deadline=inputs['deadline'],
+        hours_per_week=inputs['hours_per_week'],
+        model=model,
+        client=client,
+        reuse_outputs=available,
+        replan=replan,
+        **pipeline_options
+    )
+    return mark_replan(result, replan)
+
+def mark_replan(result: Dict[str, Any], replan: Dict[str, Any]) -> Dict[str, Any]:
+    """Add a replan's changes, source project and rerun stages to its plan (also used when it is resumed)."""
+    reused = result['performance_metrics']['reused_stages']
+    result['performance_metrics']['rerun_stages'] = [stage['name'] for stage in PIPELINE_STAGES if stage['name'] not in reused]
+    result['replan_changes'] = replan['changes']
+    if replan.get('project_name'):
+        result['project_name'] = replan['project_name']
+        result['replanned_from'] = replan['project_name']
+    return result
@@ -1,7 +1,11 @@
 import os
 import json
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from flask import Flask, request, jsonify, render_template, send_from_directory
+from flask import Flask, Response, request, jsonify, render_template, send_from_directory, stream_with_context
 import base64
 from flask_cors import CORS
 try:
@@ -9,8 +13,17 @@ try:
 except Exception:
     genai = None
 from dotenv import load_dotenv
-from utils import save_project_to_file, load_project_from_file, generate_csv, generate_pdf, generate_ics
-from agents import run_planning_pipeline
+from utils import save_project_to_file, load_project_from_file, set_project_store, ProjectCache, generate_csv, generate_pdf, generate_ics
+from project_store import create_project_store, LIST_ORDERS
+from agents import run_planning_pipeline, replan_project, validate_replan, mark_replan, PipelineError, SCHEDULERS, PRIORITIZERS, PIPELINE_MODES, STAGE_RESULT_KEYS
+from checkpoints import CheckpointStore, DEFAULT_CHECKPOINT_DIR
+from cpm import annotate_plan
+from montecarlo import schedule_risk
+from goal_cache import DecompositionCache, DEFAULT_GOAL_CACHE_DIR
+from leveling import validate_resources
+from whatif import WhatIfModel, DEFAULT_RISK_ITERATIONS
+from llm import CircuitBreaker, ClientPool, GovernedClient, RateGovernor, ResilientClient, ResponseCache, DEFAULT_CACHE_DIR
+from jobs import JobQueue, SingleFlight, DEFAULT_JOBS_DIR
 
 # Load environment variables
 load_dotenv()
@@ -18,17 +31,52 @@ load_dotenv()
 app = Flask(__name__)
 CORS(app)
 
-# Configure Gemini API
+# Configure Gemini API: GEMINI_API_KEYS (comma-separated) spreads load over several keys
+gemini_api_keys = [key.strip() for key in os.getenv('GEMINI_API_KEYS', '').split(',') if key.strip()]
 gemini_api_key = os.getenv('GEMINI_API_KEY')
+if not gemini_api_keys and gemini_api_key:
+    gemini_api_keys = [gemini_api_key]
 
-# Initialize the new Google GenAI client when available
-if gemini_api_key and genai is not None:
+# Initialize the new Google GenAI clients when available, pooled across keys
+client_pool = None
+if gemini_api_keys and genai is not None:
     try:
-        client = genai.Client(api_key=gemini_api_key)
+        client_pool = ClientPool(
+            {f"key-{i + 1}": genai.Client(api_key=key) for i, key in enumerate(gemini_api_keys)},
+            failure_threshold=int(os.getenv('LLM_POOL_FAILURE_THRESHOLD', '3')),
+            cooldown_seconds=float(os.getenv('LLM_POOL_COOLDOWN_SECONDS', '30'))
+        )
     except Exception:
-        client = None
+        client_pool = None
+client = client_pool
+
+# Shared admission control for the GenAI API: request/token budgets per minute and a
+# cap on calls in flight, with chat served ahead of planning
+llm_governor = RateGovernor(
+    requests_per_minute=float(os.getenv('LLM_REQUESTS_PER_MINUTE', '60')),
+    tokens_per_minute=float(os.getenv('LLM_TOKENS_PER_MINUTE', '250000')),
+    max_in_flight=int(os.getenv('LLM_MAX_IN_FLIGHT', '8')),
+    priorities=('chat', 'planning')
+)
+
+def _build_client(raw_client, priority):
+    """Governed client for one priority class that retries failed calls with backoff and
+    hedges slow ones (LLM_HEDGE_PERCENTILE=0 disables hedging). Latency and hedge delays
+    count from admission, and a call that waits out LLM_QUEUE_TIMEOUT_SECONDS is not retried."""
+    return ResilientClient(
+        GovernedClient(raw_client, llm_governor, priority,
+                       acquire_timeout=float(os.getenv('LLM_QUEUE_TIMEOUT_SECONDS', '60'))),
+        retries=int(os.getenv('LLM_RETRIES', '2')),
+        base_delay=float(os.getenv('LLM_RETRY_BASE_DELAY', '0.5')),
+        hedge_percentile=float(os.getenv('LLM_HEDGE_PERCENTILE', '95')) or None,
+        hedge_budget=float(os.getenv('LLM_HEDGE_BUDGET', '0.1'))
+    )
+
+if client is not None:
+    chat_client = _build_client(client, 'chat')
+    client = _build_client(client, 'planning')
 else:
-    client = None
+    chat_client = None
 
 # Model id (kept even if client is None so callers can see the intended model)
 model = "gemini-2.5-flash"
@@ -36,6 +84,28 @@ model = "gemini-2.5-flash"
 # Ensure storage directory exists
 os.makedirs('storage', exist_ok=True)
 
+# Shared cache of LLM responses, keyed on (model, prompt)
+llm_cache = ResponseCache(
+    directory=os.getenv('LLM_CACHE_DIR', DEFAULT_CACHE_DIR),
+    max_entries=int(os.getenv('LLM_CACHE_MAX_ENTRIES', '512')),
+    max_disk_bytes=int(os.getenv('LLM_CACHE_MAX_DISK_MB', '50')) * 1024 * 1024,
+    ttl_seconds=float(os.getenv('LLM_CACHE_TTL_SECONDS', str(7 * 24 * 3600)))
+)
+
+# Decomposition results shared by goals that differ only in wording or stated duration
+goal_cache = DecompositionCache(
+    directory=os.getenv('GOAL_CACHE_DIR', DEFAULT_GOAL_CACHE_DIR),
+    max_entries=int(os.getenv('GOAL_CACHE_MAX_ENTRIES', '256')),
+    ttl_seconds=float(os.getenv('GOAL_CACHE_TTL_SECONDS', str(30 * 24 * 3600)))
+)
+
+def _goal_cache_max_age(data):
+    """Optional per-request staleness bound (`goal_cache_max_age`, seconds)."""
+    try:
+        return float(data['goal_cache_max_age'])
+    except (KeyError, TypeError, ValueError):
+        return None
+
 @app.route('/')
 def homepage():
     """Render the beautiful homepage."""
@@ -75,110 +145,667 @@ def settings():
 def serve_image(filename):
     return send_from_directory('image', filename)
 
+def _validate_plan_request(data):
+    """Return an error message for an invalid plan request, or None."""
+    if not isinstance(data, dict):
+        return 'Missing request body'
+    
+    # Validate required fields
+    required_fields = ['goal', 'start_date', 'deadline', 'hours_per_week']
+    for field in required_fields:
+        if field not in data:
+            return f'Missing required field: {field}'
+    
+    try:
+        hours_per_week = float(data['hours_per_week'])
+    except (TypeError, ValueError):
+        return 'hours_per_week must be a number'
+    if not 0 < hours_per_week < float('inf'):
+        return 'hours_per_week must be positive'
+    
+    scheduler = data.get('scheduler', 'local')
+    if scheduler not in SCHEDULERS:
+        return f'Invalid scheduler: {scheduler}'
+    
+    prioritizer = data.get('prioritizer', 'llm')
+    if prioritizer not in PRIORITIZERS:
+        return f'Invalid prioritizer: {prioritizer}'
+    
+    if data.get('resources') is not None:
+        error = validate_resources(data['resources'])
+        if error:
+            return error
+    
+    pipeline_mode = data.get('pipeline_mode', 'staged')
+    if pipeline_mode not in PIPELINE_MODES:
+        return f'Invalid pipeline_mode: {pipeline_mode}'
+    
+    return None
+
+def _build_demo_plan(data):
+    """Create a simple mock plan so the UI can be tested without an API key."""
+    try:
+        sd = datetime.fromisoformat(data['start_date'])
+        ed = datetime.fromisoformat(data['deadline'])
+    except Exception:
+        sd = datetime.now()
+        ed = sd + timedelta(weeks=4)
+
+    days = max(1, (ed - sd).days)
+    weeks = max(1, (days // 7) + 1)
+    # Validated as a positive number, not necessarily an integer
+    hours_per_week = float(data['hours_per_week'])
+
+    tasks = []
+    for i in range(1, 7):
+        tasks.append({
+            'id': f'task_{i}',
+            'title': f'Sample Task {i}',
+            'description': 'This is a demo task generated in offline/demo mode.',
+            'milestone': f'Milestone {((i-1)//2)+1}',
+            'estimated_hours': max(1, int(hours_per_week // 3)),
+            'dependencies': [],
+            'deliverable': 'Demo deliverable',
+            'impact_score': 6,
+            'urgency_score': 5,
+            'effort_score': 5,
+            'priority_score': 16,
+            'priority_label': 'Medium'
+        })
+
+    schedule = []
+    for w in range(weeks):
+        schedule.append({
+            'week_start': (sd + timedelta(weeks=w)).date().isoformat(),
+            'week_number': w + 1,
+            'hours_planned': hours_per_week,
+            'tasks': [
+                {
+                    'task_id': tasks[(w) % len(tasks)]['id'],
+                    'task_title': tasks[(w) % len(tasks)]['title'],
+                    'hours_assigned': hours_per_week / 2,
+                    'milestone': tasks[(w) % len(tasks)]['milestone']
+                }
+            ]
+        })
+
+    return {
+        'goal': data['goal'],
+        'start_date': data['start_date'],
+        'deadline': data['deadline'],
+        'hours_per_week': data['hours_per_week'],
+        'tasks': tasks,
+        'schedule': schedule,
+        'risks': [
+            {'id': 'risk_1', 'description': 'Demo risk: scope creep', 'probability': 'Medium', 'impact': 'Medium', 'severity': 'Medium', 'mitigation': 'Keep scope small'}
+        ],
+        'optimizations': [
+            {'category': 'Scope Reduction', 'title': 'Demo: Use library', 'description': 'Use existing libraries to save time', 'impact': 'Saves time', 'priority': 'Medium'}
+        ],
+        'generated_at': datetime.now().isoformat(),
+        'performance_metrics': {
+            'total_time': 0.0,
+            'agent_times': {},
+            'total_tasks': len(tasks),
+            'total_schedule_weeks': len(schedule),
+            'total_risks': 1,
+            'total_optimizations': 1
+        }
+    }
+
+# Overall latency budget per plan; stages that overrun it fall back to degraded local results
+plan_time_budget = float(os.getenv('PLAN_TIME_BUDGET_SECONDS', '90'))
+
+# Skips LLM calls for a cooldown period after repeated stage timeouts
+llm_breaker = CircuitBreaker(
+    failure_threshold=int(os.getenv('LLM_BREAKER_THRESHOLD', '3')),
+    cooldown_seconds=float(os.getenv('LLM_BREAKER_COOLDOWN_SECONDS', '60')),
+    window_seconds=float(os.getenv('LLM_BREAKER_WINDOW_SECONDS', '300'))
+)
+
+# Saved projects: 'json' (one file each under storage/) or 'sqlite' (one WAL-mode database);
+# `python project_store.py` migrates existing JSON files into SQLite
+project_store = create_project_store(os.getenv('PROJECT_STORE', 'json'), os.getenv('PROJECT_STORE_PATH') or None)
+project_cache = ProjectCache(
+    max_bytes=int(os.getenv('PROJECT_CACHE_MAX_MB', '64')) * 1024 * 1024,
+    max_entries=int(os.getenv('PROJECT_CACHE_MAX_ENTRIES', '256'))
+)
+set_project_store(project_store, project_cache)
+
+# Per-stage checkpoints so failed plans can be resumed
+plan_checkpoints = CheckpointStore(os.getenv('PLAN_CHECKPOINT_DIR', DEFAULT_CHECKPOINT_DIR))
+
+def _plan_time_budget(data):
+    """Seconds allowed for a plan: the request's `time_budget`, capped by the server budget."""
+    try:
+        requested = float(data.get('time_budget', plan_time_budget))
+    except (TypeError, ValueError):
+        requested = plan_time_budget
+    return max(1.0, min(requested, plan_time_budget))
+
+def _analyze_plan(plan):
+    """Attach the local critical path and Monte Carlo finish-date analyses to a plan."""
+    plan = annotate_plan(plan)
+    plan['schedule_risk'] = schedule_risk(plan)
+    return plan
+
+def _run_plan(data, progress_callback=None, stage_callback=None, run_id=None):
+    """Produce a plan for a validated request, falling back to demo mode without a GenAI client."""
+    # If the GenAI client is not configured, return a lightweight demo plan
+    if client is None:
+        return _analyze_plan(_build_demo_plan(data))
+    
+    # Run the multi-agent planning pipeline
+    return run_planning_pipeline(
+        goal=data['goal'],
+        start_date=data['start_date'],
+        deadline=data['deadline'],
+        hours_per_week=data['hours_per_week'],
+        model=model,
+        client=client,
+        progress_callback=progress_callback,
+        scheduler=data.get('scheduler', 'local'),
+        prioritizer=data.get('prioritizer', 'llm'),
+        resources=data.get('resources'),
+        cache=llm_cache,
+        cache_bypass=data.get('cache') == 'bypass',
+        stage_callback=stage_callback,
+        pipeline_mode=data.get('pipeline_mode', 'staged'),
+        structured_output=data.get('structured_output', True) is not False,
+        checkpoints=plan_checkpoints,
+        run_id=run_id,
+        time_budget=_plan_time_budget(data),
+        breaker=llm_breaker,
+        goal_cache=goal_cache,
+        goal_cache_max_age=_goal_cache_max_age(data)
+    )
+
+# Identical plan requests that arrive while one is computing share its result
+plan_flights = SingleFlight()
+
+def _plan_request_key(data):
+    """Key identifying plan requests that must produce the same plan."""
+    return json.dumps([
+        str(data['goal']).strip(),
+        str(data['start_date']),
+        str(data['deadline']),
+        str(data['hours_per_week']),
+        data.get('scheduler', 'local'),
+        data.get('prioritizer', 'llm'),
+        data.get('resources'),
+        data.get('pipeline_mode', 'staged'),
+        data.get('structured_output', True) is not False,
+        _plan_time_budget(data),
+        _goal_cache_max_age(data),
+        data.get('cache')
+    ])
+
+def _run_plan_coalesced(data, progress_callback=None, stage_callback=None, on_join=None):
+    """
+    Run a plan request, sharing one pipeline run with identical requests in flight.
+
+    Callbacks only see the run this request leads; a request that joins another
+    one gets `on_join()` and then the shared result. Returns a copy annotated with
+    how many requests were coalesced.
+    """
+    plan_result, flight = plan_flights.do(
+        _plan_request_key(data),
+        lambda: _run_plan(data, progress_callback=progress_callback, stage_callback=stage_callback),
+        on_join=on_join
+    )
+    if flight['leader']:
+        _log_plan_metrics(plan_result)
+        if flight['coalesced']:
+            app.logger.info(f"Coalesced {flight['coalesced']} identical plan request(s) into one pipeline run")
+    
+    # Copy before annotating: coalesced requests share the same result object
+    plan_result = dict(plan_result)
+    plan_result['performance_metrics'] = dict(
+        plan_result.get('performance_metrics', {}),
+        coalesced_requests=flight['coalesced'],
+        coalesced=not flight['leader']
+    )
+    return plan_result
+
+def _log_plan_metrics(plan_result):
+    """Log performance metrics of a finished plan."""
+    if 'performance_metrics' in plan_result:
+        metrics = plan_result['performance_metrics']
+        app.logger.info(f"Planning completed in {metrics['total_time']}s")
+        app.logger.info(f"Agent times: {metrics['agent_times']}")
+
+def _sse_event(event, payload):
+    """Format one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+def _run_plan_job(data, progress_callback):
+    """Job queue runner: build the plan for a queued request."""
+    plan_result = _run_plan(data, progress_callback=progress_callback)
+    _log_plan_metrics(plan_result)
+    return plan_result
+
+# Background plan jobs, persisted under storage/jobs so they survive a restart
+plan_jobs = JobQueue(
+    _run_plan_job,
+    directory=os.getenv('PLAN_JOBS_DIR', DEFAULT_JOBS_DIR),
+    workers=int(os.getenv('PLAN_JOB_WORKERS', '2')),
+    on_error=lambda job_id, e: app.logger.error(f"Plan job {job_id} failed: {str(e)}")
+)
+plan_jobs.start()
+
+# Plans from /api/plan_batch run at most this many at a time, across all batches
+plan_batch_concurrency = int(os.getenv('PLAN_BATCH_CONCURRENCY', '4'))
+plan_batch_slots = threading.BoundedSemaphore(plan_batch_concurrency)
+plan_batch_max_goals = int(os.getenv('PLAN_BATCH_MAX_GOALS', '50'))
+
+def _validate_plan_batch(data):
+    """Return (goal specs, error message) for a batch request; `defaults` fill in each spec."""
+    if not isinstance(data, dict) or not isinstance(data.get('goals'), list) or not data['goals']:
+        return None, 'Missing goals'
+    if len(data['goals']) > plan_batch_max_goals:
+        return None, f'Too many goals (max {plan_batch_max_goals})'
+    defaults = data.get('defaults') or {}
+    if not isinstance(defaults, dict):
+        return None, 'defaults must be an object'
+    specs = []
+    for index, goal in enumerate(data['goals']):
+        spec = dict(defaults, **goal) if isinstance(goal, dict) else None
+        error = _validate_plan_request(spec)
+        if error:
+            return None, f'goals[{index}]: {error}'
+        spec.pop('async', None)
+        specs.append(spec)
+    return specs, None
+
+def _run_plan_batch(specs, on_result):
+    """
+    Plan every goal spec concurrently under the shared batch limit.
+
+    `on_result(item)` is called as each goal finishes, with its index, status,
+    timing and plan (or error). Returns the aggregate throughput summary.
+    """
+    started = time.time()
+    goal_times = []
+    counts = {'completed': 0, 'failed': 0}
+    lock = threading.Lock()
+
+    def plan_one(index, spec):
+        queued_at = time.time()
+        with plan_batch_slots:
+            began = time.time()
+            item = {'index': index, 'goal': spec['goal'], 'queued_time': round(began - queued_at, 2)}
+            try:
+                plan_result, _ = plan_flights.do(_plan_request_key(spec), lambda: _run_plan(spec))
+                item.update(status='completed', plan=plan_result)
+            except Exception as e:
+                app.logger.error(f"Error planning batch goal {index}: {str(e)}")
+                item.update(status='failed', error='Failed to generate plan', run_id=getattr(e, 'run_id', None))
+            item['time'] = round(time.time() - began, 2)
+        with lock:
+            counts[item['status']] += 1
+            goal_times.append(item['time'])
+        on_result(item)
+
+    with ThreadPoolExecutor(max_workers=min(len(specs), plan_batch_concurrency)) as executor:
+        for future in [executor.submit(plan_one, index, spec) for index, spec in enumerate(specs)]:
+            future.result()
+
+    total_time = time.time() - started
+    return {
+        'goals': len(specs),
+        'completed': counts['completed'],
+        'failed': counts['failed'],
+        'concurrency': plan_batch_concurrency,
+        'total_time': round(total_time, 2),
+        'throughput_per_minute': round(len(specs) * 60 / total_time, 2) if total_time else None,
+        'avg_goal_time': round(sum(goal_times) / len(goal_times), 2) if goal_times else 0.0,
+        'max_goal_time': round(max(goal_times), 2) if goal_times else 0.0
+    }
+
+def _run_plan_batch_job(data, progress_callback):
+    """Job queue runner for a batch: results so far are published as the job's partial result."""
+    results = []
+    lock = threading.Lock()
+
+    def on_result(item):
+        with lock:
+            results.append(item)
+            done = len(results)
+            snapshot = sorted(results, key=lambda r: r['index'])
+        progress_callback(f"{done}/{len(data['goals'])} goals planned", int(done * 100 / len(data['goals'])), {'results': snapshot})
+
+    summary = _run_plan_batch(data['goals'], on_result)
+    app.logger.info(f"Plan batch: {summary['completed']}/{summary['goals']} goals in {summary['total_time']}s")
+    return {'results': sorted(results, key=lambda r: r['index']), 'summary': summary}
+
+# Background batch jobs; each one fans its goals out under plan_batch_slots
+plan_batch_jobs = JobQueue(
+    _run_plan_batch_job,
+    directory=os.path.join(os.getenv('PLAN_JOBS_DIR', DEFAULT_JOBS_DIR), 'batches'),
+    workers=int(os.getenv('PLAN_BATCH_JOB_WORKERS', '1')),
+    on_error=lambda job_id, e: app.logger.error(f"Plan batch job {job_id} failed: {str(e)}")
+)
+plan_batch_jobs.start()
+
 @app.route('/api/plan', methods=['POST'])
 def generate_plan():
-    """Generate a comprehensive project plan using the multi-agent pipeline."""
+    """
+    Generate a comprehensive project plan using the multi-agent pipeline.
+
+    With `"async": true` the request is queued instead and a job id is returned
+    (202); poll GET /api/plan/<job_id> for progress and the result.
+    """
     try:
         data = request.get_json()
         
-        # Validate required fields
-        required_fields = ['goal', 'start_date', 'deadline', 'hours_per_week']
-        for field in required_fields:
-            if field not in data:
-                return jsonify({'error': f'Missing required field: {field}'}), 400
+        error = _validate_plan_request(data)
+        if error:
+            return jsonify({'error': error}), 400
         
-        # If the GenAI client is not configured, return a lightweight demo plan
-        if client is None:
-            # Create a simple mock plan so the UI can be tested without an API key
-            try:
-                sd = datetime.fromisoformat(data['start_date'])
-                ed = datetime.fromisoformat(data['deadline'])
-            except Exception:
-                sd = datetime.now()
-                ed = sd + timedelta(weeks=4)
-
-            days = max(1, (ed - sd).days)
-            weeks = max(1, (days // 7) + 1)
-
-            tasks = []
-            for i in range(1, 7):
-                tasks.append({
-                    'id': f'task_{i}',
-                    'title': f'Sample Task {i}',
-                    'description': 'This is a demo task generated in offline/demo mode.',
-                    'milestone': f'Milestone {((i-1)//2)+1}',
-                    'estimated_hours': max(1, int(data['hours_per_week']) // 3),
-                    'dependencies': [],
-                    'deliverable': 'Demo deliverable',
-                    'impact_score': 6,
-                    'urgency_score': 5,
-                    'effort_score': 5,
-                    'priority_score': 16,
-                    'priority_label': 'Medium'
-                })
-
-            schedule = []
-            for w in range(weeks):
-                schedule.append({
-                    'week_start': (sd + timedelta(weeks=w)).date().isoformat(),
-                    'week_number': w + 1,
-                    'hours_planned': int(data['hours_per_week']),
-                    'tasks': [
-                        {
-                            'task_id': tasks[(w) % len(tasks)]['id'],
-                            'task_title': tasks[(w) % len(tasks)]['title'],
-                            'hours_assigned': int(data['hours_per_week']) // 2,
-                            'milestone': tasks[(w) % len(tasks)]['milestone']
-                        }
-                    ]
-                })
-
-            plan_result = {
-                'goal': data['goal'],
-                'start_date': data['start_date'],
-                'deadline': data['deadline'],
-                'hours_per_week': data['hours_per_week'],
-                'tasks': tasks,
-                'schedule': schedule,
-                'risks': [
-                    {'id': 'risk_1', 'description': 'Demo risk: scope creep', 'probability': 'Medium', 'impact': 'Medium', 'severity': 'Medium', 'mitigation': 'Keep scope small'}
-                ],
-                'optimizations': [
-                    {'category': 'Scope Reduction', 'title': 'Demo: Use library', 'description': 'Use existing libraries to save time', 'impact': 'Saves time', 'priority': 'Medium'}
-                ],
-                'generated_at': datetime.now().isoformat(),
-                'performance_metrics': {
-                    'total_time': 0.0,
-                    'agent_times': {},
-                    'total_tasks': len(tasks),
-                    'total_schedule_weeks': len(schedule),
-                    'total_risks': 1,
-                    'total_optimizations': 1
-                }
-            }
-        else:
-            # Run the multi-agent planning pipeline
-            plan_result = run_planning_pipeline(
-                goal=data['goal'],
-                start_date=data['start_date'],
-                deadline=data['deadline'],
-                hours_per_week=data['hours_per_week'],
-                model=model,
-                client=client
-            )
+        if data.get('async'):
+            job = plan_jobs.submit(data)
+            job['status_url'] = f"/api/plan/{job['job_id']}"
+            return jsonify(job), 202
         
-        # Log performance metrics
-        if 'performance_metrics' in plan_result:
-            metrics = plan_result['performance_metrics']
-            app.logger.info(f"Planning completed in {metrics['total_time']}s")
-            app.logger.info(f"Agent times: {metrics['agent_times']}")
+        plan_result = _run_plan_coalesced(data)
         
         return jsonify(plan_result)
     
+    except PipelineError as e:
+        app.logger.error(f"Error generating plan: {str(e)}")
+        return jsonify({'error': 'Failed to generate plan', 'run_id': e.run_id}), 500
+    
     except Exception as e:
         app.logger.error(f"Error generating plan: {str(e)}")
         return jsonify({'error': 'Failed to generate plan'}), 500
 
+@app.route('/api/plan/resume/<run_id>', methods=['POST'])
+def resume_plan(run_id):
+    """Resume a failed planning run, re-running only the stages that did not complete."""
+    try:
+        checkpoint = plan_checkpoints.load(run_id)
+        if checkpoint is None:
+            return jsonify({'error': 'Run not found'}), 404
+        if checkpoint.get('status') == 'running':
+            return jsonify({'error': 'Run is still in progress'}), 409
+        if client is None:
+            return jsonify({'error': 'AI client is not configured'}), 503
+        
+        data = dict(checkpoint['inputs'])
+        data['cache'] = (request.get_json(silent=True) or {}).get('cache')
+        plan_result = _run_plan(data, run_id=run_id)
+        if data.get('replan'):
+            plan_result = mark_replan(plan_result, data['replan'])
+        _log_plan_metrics(plan_result)
+        
+        return jsonify(plan_result)
+    
+    except PipelineError as e:
+        app.logger.error(f"Error resuming plan: {str(e)}")
+        return jsonify({'error': 'Failed to generate plan', 'run_id': e.run_id}), 500
+    
+    except Exception as e:
+        app.logger.error(f"Error resuming plan: {str(e)}")
+        return jsonify({'error': 'Failed to resume plan'}), 500
+
+@app.route('/api/replan', methods=['POST'])
+def replan():
+    """
+    Update an existing plan from a change set, rerunning only the affected agents.
+
+    Body: `project_name` (a saved project) or `project_data`, and `changes`, e.g.
+    {"hours_per_week": 15, "tasks": {"task_3": {"estimated_hours": 12}}}.
+    """
+    try:
+        data = request.get_json()
+        if not isinstance(data, dict) or not isinstance(data.get('changes'), dict):
+            return jsonify({'error': 'Missing changes'}), 400
+        
+        if 'project_data' in data:
+            project = data['project_data']
+        elif 'project_name' in data:
+            project = load_project_from_file(data['project_name'])
+            if not project:
+                return jsonify({'error': 'Project not found'}), 404
+        else:
+            return jsonify({'error': 'Missing project_name or project_data'}), 400
+        replan_error = validate_replan(project, data['changes'])
+        if replan_error:
+            return jsonify({'error': replan_error}), 400
+        
+        scheduler = data.get('scheduler', 'local')
+        if scheduler not in SCHEDULERS:
+            return jsonify({'error': f'Invalid scheduler: {scheduler}'}), 400
+        prioritizer = data.get('prioritizer', 'llm')
+        if prioritizer not in PRIORITIZERS:
+            return jsonify({'error': f'Invalid prioritizer: {prioritizer}'}), 400
+        resource_error = validate_resources(data['resources']) if data.get('resources') is not None else None
+        if resource_error:
+            return jsonify({'error': resource_error}), 400
+        if client is None:
+            return jsonify({'error': 'AI client is not configured'}), 503
+        
+        plan_result = replan_project(
+            project,
+            data['changes'],
+            model=model,
+            client=client,
+            scheduler=scheduler,
+            prioritizer=prioritizer,
+            resources=data.get('resources'),
+            cache=llm_cache,
+            cache_bypass=data.get('cache') == 'bypass',
+            structured_output=data.get('structured_output', True) is not False,
+            checkpoints=plan_checkpoints,
+            time_budget=_plan_time_budget(data),
+            breaker=llm_breaker,
+            goal_cache=goal_cache,
+            goal_cache_max_age=_goal_cache_max_age(data)
+        )
+        _log_plan_metrics(plan_result)
+        app.logger.info(f"Replan reused stages: {plan_result['performance_metrics']['reused_stages']}")
+        
+        return jsonify(plan_result)
+    
+    except PipelineError as e:
+        app.logger.error(f"Error replanning: {str(e)}")
+        return jsonify({'error': 'Failed to replan', 'run_id': e.run_id}), 500
+    
+    except Exception as e:
+        app.logger.error(f"Error replanning: {str(e)}")
+        return jsonify({'error': 'Failed to replan'}), 500
+
+@app.route('/api/whatif', methods=['POST'])
+def whatif():
+    """
+    Re-evaluate a saved plan under hypothetical parameters, locally and without LLM calls.
+
+    Body: `project_name` (a saved project) or `project_data`, then either the
+    scenario fields themselves (`hours_per_week`, `start_date`, `deadline`,
+    `remove_tasks`, `tasks`, `resources`) or `scenarios`, a list of them for
+    charting. `include_schedule` defaults to true for one scenario and false for
+    a batch; `risk_iterations` sizes the deadline probability simulation (0 skips it).
+    """
+    try:
+        started = time.perf_counter()
+        data = request.get_json()
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Missing request body'}), 400
+        
+        if 'project_data' in data:
+            project = data['project_data']
+        elif 'project_name' in data:
+            project = load_project_from_file(data['project_name'])
+            if not project:
+                return jsonify({'error': 'Project not found'}), 404
+        else:
+            return jsonify({'error': 'Missing project_name or project_data'}), 400
+        if not isinstance(project, dict):
+            return jsonify({'error': 'Invalid project_data'}), 400
+        
+        try:
+            risk_iterations = int(data.get('risk_iterations', DEFAULT_RISK_ITERATIONS))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'risk_iterations must be an integer'}), 400
+        
+        simulator = WhatIfModel(project)
+        try:
+            baseline = simulator.evaluate({}, include_schedule=False, risk_iterations=risk_iterations)
+            if 'scenarios' in data:
+                if not isinstance(data['scenarios'], list):
+                    return jsonify({'error': 'scenarios must be a list'}), 400
+                result = {'baseline': baseline, 'scenarios': simulator.evaluate_many(
+                    data['scenarios'], include_schedule=data.get('include_schedule') is True, risk_iterations=risk_iterations
+                )}
+            else:
+                scenario = {key: value for key, value in data.items()
+                            if key not in ('project_name', 'project_data', 'include_schedule', 'risk_iterations')}
+                result = {'baseline': baseline, 'scenario': simulator.evaluate(
+                    scenario, include_schedule=data.get('include_schedule', True) is not False, risk_iterations=risk_iterations
+                )}
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        
+        result['performance_metrics'] = {'whatif_time': round(time.perf_counter() - started, 4)}
+        return jsonify(result)
+    
+    except Exception as e:
+        app.logger.error(f"Error running what-if: {str(e)}")
+        return jsonify({'error': 'Failed to run what-if'}), 500
+
+@app.route('/api/plan/<job_id>', methods=['GET'])
+def plan_job_status(job_id):
+    """Return the status, progress and (when finished) result of a queued plan job."""
+    job = plan_jobs.status(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+@app.route('/api/plan_batch', methods=['POST'])
+def plan_batch():
+    """
+    Plan many goals concurrently under a shared limit.
+
+    Body: `goals` (a list of plan request specs) and optional `defaults` merged
+    into each. With `"stream": true` results are streamed as Server-Sent Events
+    (`result` per goal as it finishes, then `complete` with the summary);
+    otherwise a job id is returned (202) and GET /api/plan_batch/<job_id> shows
+    the results so far.
+    """
+    data = request.get_json(silent=True)
+    specs, error = _validate_plan_batch(data)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    if not data.get('stream'):
+        job = plan_batch_jobs.submit({'goals': specs})
+        job['status_url'] = f"/api/plan_batch/{job['job_id']}"
+        return jsonify(job), 202
+    
+    events = queue.Queue()
+    
+    def worker():
+        try:
+            summary = _run_plan_batch(specs, lambda item: events.put(('result', item)))
+            events.put(('complete', summary))
+        except Exception as e:
+            app.logger.error(f"Error streaming plan batch: {str(e)}")
+            events.put(('error', {'error': 'Failed to run plan batch'}))
+        finally:
+            events.put(None)
+    
+    threading.Thread(target=worker, daemon=True).start()
+    
+    def generate():
+        while True:
+            item = events.get()
+            if item is None:
+                break
+            yield _sse_event(*item)
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/api/plan_batch/<job_id>', methods=['GET'])
+def plan_batch_status(job_id):
+    """Return the progress, results so far and (when finished) summary of a batch job."""
+    job = plan_batch_jobs.status(job_id)
+    if job is None:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job)
+
+@app.route('/api/jobs/metrics', methods=['GET'])
+def plan_job_metrics():
+    """Expose plan and plan batch job queue depth and wait-time metrics."""
+    return jsonify(dict(plan_jobs.metrics(), batches=plan_batch_jobs.metrics()))
+
+@app.route('/api/llm/metrics', methods=['GET'])
+def llm_metrics():
+    """Expose LLM response cache counters, rate governor state and retry/hedge statistics."""
+    return jsonify({
+        'cache': llm_cache.stats(),
+        'decomposition_cache': goal_cache.stats(),
+        'governor': llm_governor.stats(),
+        'pool': client_pool.stats() if client_pool is not None else None,
+        'client': {
+            'planning': client.stats(),
+            'chat': chat_client.stats()
+        } if client is not None else None
+    })
+
+@app.route('/api/plan/stream', methods=['POST'])
+def stream_plan():
+    """
+    Generate a plan and stream it as Server-Sent Events.
+
+    Emits `progress` events as agents start, a `stage` event with each agent's
+    partial result as it finishes, then `complete` with the full plan (or `error`).
+    A request identical to one already running (e.g. from another tab) joins it:
+    it gets a single `progress` event saying so, then the shared `complete`.
+    """
+    data = request.get_json(silent=True)
+    error = _validate_plan_request(data)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    events = queue.Queue()
+    
+    def on_progress(message, percent):
+        events.put(('progress', {'message': message, 'progress': percent}))
+    
+    def on_stage(name, output, timing):
+        events.put(('stage', {
+            'stage': name,
+            'field': STAGE_RESULT_KEYS.get(name, name),
+            'result': output,
+            'time': round(timing['wall'], 2)
+        }))
+    
+    def on_join():
+        on_progress('⏳ An identical plan is already being generated; waiting for it...', 10)
+    
+    def worker():
+        try:
+            plan_result = _run_plan_coalesced(data, progress_callback=on_progress, stage_callback=on_stage, on_join=on_join)
+            events.put(('complete', plan_result))
+        except Exception as e:
+            app.logger.error(f"Error streaming plan: {str(e)}")
+            events.put(('error', {'error': 'Failed to generate plan', 'run_id': getattr(e, 'run_id', None)}))
+        finally:
+            events.put(None)
+    
+    threading.Thread(target=worker, daemon=True).start()
+    
+    def generate():
+        while True:
+            item = events.get()
+            if item is None:
+                break
+            yield _sse_event(*item)
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.route('/api/save_project', methods=['POST'])
 def save_project():
     """Save a project to the storage system."""
@@ -214,7 +841,8 @@ def load_project(project_name):
         project_data = load_project_from_file(project_name)
         
         if project_data:
-            return jsonify(project_data)
+            # Computed on load so projects saved earlier (or edited by hand) are covered
+            return jsonify(_analyze_plan(project_data))
         else:
             return jsonify({'error': 'Project not found'}), 404
     
@@ -224,23 +852,37 @@ def load_project(project_name):
 
 @app.route('/api/list_projects', methods=['GET'])
 def list_projects():
-    """List all saved projects."""
+    """
+    List all saved projects.
+
+    With `?details=1` also returns each project's metadata (goal, dates, task
+    counts), ordered by `order` (name, saved_at or deadline), filtered by a
+    `goal` substring and paged with `limit` / `offset`.
+    """
     try:
-        projects = []
-        storage_dir = 'storage'
-        
-        if os.path.exists(storage_dir):
-            for filename in os.listdir(storage_dir):
-                if filename.endswith('.json'):
-                    project_name = filename[:-5]  # Remove .json extension
-                    projects.append(project_name)
+        if request.args.get('details') not in ('1', 'true'):
+            return jsonify({'projects': project_store.names()})
         
-        return jsonify({'projects': projects})
+        order = request.args.get('order', 'name')
+        if order not in LIST_ORDERS:
+            return jsonify({'error': f'Invalid order: {order}'}), 400
+        try:
+            limit = int(request.args['limit']) if 'limit' in request.args else None
+            offset = int(request.args.get('offset', 0))
+        except ValueError:
+            return jsonify({'error': 'limit and offset must be integers'}), 400
+        details = project_store.list(order=order, goal=request.args.get('goal'), limit=limit, offset=max(0, offset))
+        return jsonify({'projects': [project['name'] for project in details], 'details': details})
     
     except Exception as e:
         app.logger.error(f"Error listing projects: {str(e)}")
         return jsonify({'error': 'Failed to list projects'}), 500
 
+@app.route('/api/projects/metrics', methods=['GET'])
+def project_metrics():
+    """Return the project store backend and the parsed-project cache statistics."""
+    return jsonify({'store': project_store.backend, 'cache': project_cache.stats()})
+
 @app.route('/api/export_csv', methods=['POST'])
 def export_csv():
     """Export project schedule to CSV format."""
@@ -329,7 +971,7 @@ User Question: {message}
 
 Please provide a helpful, concise response focused on project planning, task management, and productivity."""
         
-        if client is None:
+        if chat_client is None:
             # Return a friendly demo-mode response when AI client is not configured
             demo_reply = (
                 "You're running Plannerium in demo mode. "
@@ -338,7 +980,7 @@ Please provide a helpful, concise response focused on project planning, task man
             )
             return jsonify({'response': demo_reply, 'timestamp': datetime.now().isoformat()})
 
-        response = client.models.generate_content(model=model, contents=prompt)
+        response = chat_client.models.generate_content(model=model, contents=prompt)
 
         return jsonify({
             'response': response.text,
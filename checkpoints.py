@@ -0,0 +1,111 @@
+import json
+import os
+import threading
+import time
+import uuid
+from typing import Any, Dict, Optional
+
+DEFAULT_CHECKPOINT_DIR = os.path.join('storage', 'checkpoints')
+
+class CheckpointStore:
+    """
+    Stores each planning run's inputs and completed stage outputs under a run id.
+
+    A run is one JSON file, `<directory>/<run_id>.json`, rewritten atomically after
+    every completed stage, so a failed run can be resumed from its last good stage.
+    Runs not updated for `retention_seconds` are deleted when a new run starts.
+    """
+
+    def __init__(self, directory: str = DEFAULT_CHECKPOINT_DIR, retention_seconds: float = 24 * 3600):
+        self.directory = directory
+        self.retention_seconds = retention_seconds
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def new_run_id() -> str:
+        return uuid.uuid4().hex
+
+    def _path(self, run_id: str) -> str:
+        if not run_id or not all(c.isalnum() or c in '-_' for c in run_id):
+            raise ValueError(f"Invalid run id: {run_id!r}")
+        return os.path.join(self.directory, f"{run_id}.json")
+
+    def load(self, run_id: str) -> Optional[Dict[str, Any]]:
+        """Return the checkpoint for a run, or None if there is none."""
+        try:
+            path = self._path(run_id)
+        except ValueError:
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def start(self, run_id: str, inputs: Dict[str, Any]) -> Dict[str, Any]:
+        """Open a run, keeping the outputs of an existing checkpoint with the same id."""
+        self._purge_expired()
+        with self._lock:
+            checkpoint = self.load(run_id) or {
+                'run_id': run_id,
+                'inputs': inputs,
+                'outputs': {},
+                'stage_times': {},
+                'created_at': time.time()
+            }
+            checkpoint['status'] = 'running'
+            checkpoint['error'] = None
+            self._write(checkpoint)
+        return checkpoint
+
+    def save_output(self, run_id: str, key: str, value: Any, stage: str, seconds: float) -> None:
+        """Record one completed stage output."""
+        with self._lock:
+            checkpoint = self.load(run_id)
+            if checkpoint is None:
+                return
+            checkpoint['outputs'][key] = value
+            checkpoint['stage_times'][stage] = round(seconds, 2)
+            self._write(checkpoint)
+
+    def seed_outputs(self, run_id: str, outputs: Dict[str, Any]) -> None:
+        """Record outputs a run took from its caller (e.g. a replan's edited tasks), keeping any already saved."""
+        with self._lock:
+            checkpoint = self.load(run_id)
+            if checkpoint is None:
+                return
+            for key, value in outputs.items():
+                checkpoint['outputs'].setdefault(key, value)
+            self._write(checkpoint)
+
+    def finish(self, run_id: str, error: Optional[str] = None) -> None:
+        """Mark a run completed, or failed with `error`."""
+        with self._lock:
+            checkpoint = self.load(run_id)
+            if checkpoint is None:
+                return
+            checkpoint['status'] = 'failed' if error else 'completed'
+            checkpoint['error'] = error
+            self._write(checkpoint)
+
+    def _write(self, checkpoint: Dict[str, Any]) -> None:
+        # Caller holds the lock.
+        checkpoint['updated_at'] = time.time()
+        path = self._path(checkpoint['run_id'])
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(checkpoint, f, ensure_ascii=False, default=str)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error writing checkpoint {checkpoint['run_id']}: {e}")
+
+    def _purge_expired(self) -> None:
+        cutoff = time.time() - self.retention_seconds
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.json') and entry.stat().st_mtime < cutoff:
+                try:
+                    os.remove(entry.path)
+                except OSError:
+                    pass
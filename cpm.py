@@ -0,0 +1,257 @@
+import heapq
+from typing import Any, Dict, List, Optional, Tuple
+
+# Per-task fields added by annotate_plan; all times are in hours of work from the project start.
+CPM_FIELDS = ['earliest_start', 'earliest_finish', 'latest_start', 'latest_finish', 'total_float', 'is_critical']
+
+def _hours(task: Dict[str, Any]) -> float:
+    try:
+        return max(0.0, float(task.get('estimated_hours', 0) or 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+def _round(value: float):
+    rounded = round(value, 2)
+    return int(rounded) if rounded == int(rounded) else rounded
+
+def _rate(value: Any) -> Optional[float]:
+    try:
+        rate = float(value)
+    except (TypeError, ValueError):
+        return None
+    return rate if rate > 0 else None
+
+def resource_assignment(task_ids: List[Any], hours_per_week: Any = None,
+                        resources: Optional[List[Dict[str, Any]]] = None) -> Optional[List[Tuple[float, List[Any]]]]:
+    """
+    Group tasks by who works on them, as (hours per week, task ids) pairs.
+
+    Without `resources` everything goes to one person at `hours_per_week`. With
+    a leveled team (resource_plan['resources'], each with `hours_per_week` and
+    `task_ids`) each resource gets its tasks; tasks nobody was assigned go to an
+    extra worker at `hours_per_week`, or the fastest resource's rate. Returns
+    None when no usable rate is known.
+    """
+    fallback = _rate(hours_per_week)
+    if not resources:
+        return [(fallback, list(task_ids))] if fallback else None
+    known = set(task_ids)
+    groups, assigned = [], set()
+    for resource in resources:
+        rate = _rate(resource.get('hours_per_week'))
+        if rate is None:
+            continue
+        mine = [task_id for task_id in resource.get('task_ids') or [] if task_id in known and task_id not in assigned]
+        assigned.update(mine)
+        groups.append((rate, mine))
+    if not groups:
+        return [(fallback, list(task_ids))] if fallback else None
+    rest = [task_id for task_id in task_ids if task_id not in assigned]
+    if rest:
+        groups.append((fallback or max(rate for rate, _ in groups), rest))
+    return groups
+
+class CriticalPathAnalysis:
+    """
+    Critical path method over a task dependency graph, in O(V + E).
+
+    A forward pass in topological order gives each task's earliest start and
+    finish; a backward pass from the project end gives its latest start and
+    finish. Total float is how long a task can slip without delaying the
+    project; tasks with zero float form the critical path. Dependencies on
+    unknown ids are ignored, and tasks caught in a dependency cycle are left out
+    of the analysis (listed in `cyclic`).
+
+    `update_hours(task_id, hours)` re-times a single task incrementally, only
+    revisiting the tasks whose dates actually move; `retimed(tasks)` applies
+    that to a copy for a task list that differs only in hours.
+    """
+
+    def __init__(self, tasks: List[Dict[str, Any]]):
+        self.hours: Dict[Any, float] = {}
+        self.deps: Dict[Any, List[Any]] = {}
+        for task in tasks:
+            self.hours[task.get('id')] = _hours(task)
+        for task in tasks:
+            self.deps[task.get('id')] = list(dict.fromkeys(dep for dep in task.get('dependencies') or [] if dep in self.hours))
+        self.dependents: Dict[Any, List[Any]] = {task_id: [] for task_id in self.hours}
+        for task_id, deps in self.deps.items():
+            for dep in deps:
+                self.dependents[dep].append(task_id)
+
+        indegree = {task_id: len(deps) for task_id, deps in self.deps.items()}
+        self.order = [task_id for task_id in self.hours if indegree[task_id] == 0]
+        for task_id in self.order:
+            for child in self.dependents[task_id]:
+                indegree[child] -= 1
+                if indegree[child] == 0:
+                    self.order.append(child)
+        self.position = {task_id: i for i, task_id in enumerate(self.order)}
+        self.cyclic = [task_id for task_id in self.hours if task_id not in self.position]
+
+        self.earliest_start: Dict[Any, float] = {}
+        self.latest_finish: Dict[Any, float] = {}
+        self._forward(self.order)
+        self.duration = self._project_duration()
+        self._backward(reversed(self.order))
+
+    def _forward(self, task_ids) -> None:
+        for task_id in task_ids:
+            self.earliest_start[task_id] = max(
+                (self.earliest_start[dep] + self.hours[dep] for dep in self.deps[task_id] if dep in self.position), default=0.0
+            )
+
+    def _backward(self, task_ids) -> None:
+        for task_id in task_ids:
+            self.latest_finish[task_id] = min(
+                (self.latest_finish[child] - self.hours[child] for child in self.dependents[task_id] if child in self.position),
+                default=self.duration
+            )
+
+    def _project_duration(self) -> float:
+        return max((self.earliest_start[task_id] + self.hours[task_id] for task_id in self.order), default=0.0)
+
+    def update_hours(self, task_id: Any, hours: float) -> List[Any]:
+        """Change one task's hours and re-time the plan; returns the ids whose dates changed."""
+        if task_id not in self.position:
+            self.hours[task_id] = max(0.0, float(hours))
+            return []
+        self.hours[task_id] = max(0.0, float(hours))
+        changed = {task_id}
+
+        # Forward: push later earliest starts along dependents, in topological order
+        queue = [(self.position[child], child) for child in self.dependents[task_id] if child in self.position]
+        heapq.heapify(queue)
+        seen = set()
+        while queue:
+            _, current = heapq.heappop(queue)
+            if current in seen:
+                continue
+            seen.add(current)
+            start = max((self.earliest_start[dep] + self.hours[dep] for dep in self.deps[current] if dep in self.position), default=0.0)
+            if start != self.earliest_start[current]:
+                self.earliest_start[current] = start
+                changed.add(current)
+                for child in self.dependents[current]:
+                    if child in self.position and child not in seen:
+                        heapq.heappush(queue, (self.position[child], child))
+
+        duration = self._project_duration()
+        if duration != self.duration:
+            # The project end moved, so every latest date moves with it
+            self.duration = duration
+            self._backward(reversed(self.order))
+            return list(self.position)
+
+        # Backward: pull earlier latest finishes along prerequisites, in reverse topological order
+        queue = [(-self.position[dep], dep) for dep in self.deps[task_id] if dep in self.position]
+        heapq.heapify(queue)
+        seen = set()
+        while queue:
+            _, current = heapq.heappop(queue)
+            if current in seen:
+                continue
+            seen.add(current)
+            finish = min((self.latest_finish[child] - self.hours[child] for child in self.dependents[current] if child in self.position),
+                         default=self.duration)
+            if finish != self.latest_finish[current]:
+                self.latest_finish[current] = finish
+                changed.add(current)
+                for dep in self.deps[current]:
+                    if dep in self.position and dep not in seen:
+                        heapq.heappush(queue, (-self.position[dep], dep))
+        return list(changed)
+
+    def retimed(self, tasks: List[Dict[str, Any]]) -> 'CriticalPathAnalysis':
+        """
+        A copy for `tasks`, which must have the same ids and dependencies, re-timed with update_hours.
+
+        The dependency graph is shared with this analysis; only tasks whose
+        hours differ are updated, so editing a few estimates skips the full
+        forward and backward passes.
+        """
+        copy = object.__new__(CriticalPathAnalysis)
+        copy.__dict__.update(self.__dict__)
+        copy.hours = dict(self.hours)
+        copy.earliest_start = dict(self.earliest_start)
+        copy.latest_finish = dict(self.latest_finish)
+        for task in tasks:
+            hours = _hours(task)
+            if hours != copy.hours.get(task.get('id')):
+                copy.update_hours(task.get('id'), hours)
+        return copy
+
+    def task_times(self, task_id: Any) -> Optional[Dict[str, Any]]:
+        """CPM fields for one task, or None if it is part of a cycle."""
+        if task_id not in self.position:
+            return None
+        start = self.earliest_start[task_id]
+        finish = self.latest_finish[task_id]
+        slack = finish - self.hours[task_id] - start
+        return {
+            'earliest_start': _round(start),
+            'earliest_finish': _round(start + self.hours[task_id]),
+            'latest_start': _round(finish - self.hours[task_id]),
+            'latest_finish': _round(finish),
+            'total_float': _round(slack),
+            'is_critical': abs(slack) < 1e-9
+        }
+
+    def critical_path(self) -> List[Any]:
+        """One chain of zero-float tasks from the project start to its end."""
+        path = []
+        current = next((task_id for task_id in self.order if not self.deps[task_id] and self._is_critical(task_id)), None)
+        while current is not None:
+            path.append(current)
+            finish = self.earliest_start[current] + self.hours[current]
+            current = next((child for child in self.dependents[current]
+                            if child in self.position and self._is_critical(child) and abs(self.earliest_start[child] - finish) < 1e-9), None)
+        return path
+
+    def _is_critical(self, task_id: Any) -> bool:
+        return abs(self.latest_finish[task_id] - self.hours[task_id] - self.earliest_start[task_id]) < 1e-9
+
+    def summary(self, hours_per_week: Any = None, resources: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        """
+        The critical path and its length, in hours and (given a rate) in weeks.
+
+        `duration_weeks` is the dependency chain alone, each task at the weekly
+        hours of whoever does it (see resource_assignment); `capacity_weeks` is the
+        work bound, the busiest person's hours over their weekly hours. A plan
+        takes at least the larger of the two.
+        """
+        path = self.critical_path()
+        summary = {
+            'tasks': path,
+            'duration_hours': _round(self.duration),
+            'critical_tasks': sum(1 for task_id in self.order if self._is_critical(task_id)),
+            'cyclic_tasks': self.cyclic
+        }
+        groups = resource_assignment(list(self.hours), hours_per_week, resources)
+        if groups:
+            rate = {task_id: hours for hours, task_ids in groups for task_id in task_ids}
+            finish: Dict[Any, float] = {}
+            for task_id in self.order:
+                start = max((finish[dep] for dep in self.deps[task_id] if dep in finish), default=0.0)
+                finish[task_id] = start + self.hours[task_id] / rate[task_id]
+            summary['duration_weeks'] = _round(max(finish.values(), default=0.0))
+            summary['capacity_weeks'] = _round(max(sum(self.hours[task_id] for task_id in task_ids) / hours
+                                                   for hours, task_ids in groups))
+        return summary
+
+def annotate_plan(plan: Dict[str, Any], analysis: Optional[CriticalPathAnalysis] = None) -> Dict[str, Any]:
+    """
+    Return a copy of `plan` with CPM fields on every task and a `critical_path` summary.
+
+    Tasks in dependency cycles get None for each field. Week figures use the
+    plan's `resource_plan` when it was leveled across a team. Pass an existing
+    `analysis` (e.g. after update_hours) to skip recomputing it.
+    """
+    tasks = plan.get('tasks') or []
+    analysis = analysis or CriticalPathAnalysis(tasks)
+    annotated = []
+    for task in tasks:
+        times = analysis.task_times(task.get('id')) or dict.fromkeys(CPM_FIELDS)
+        annotated.append({**task, **times})
+    resources = (plan.get('resource_plan') or {}).get('resources')
+    return {**plan, 'tasks': annotated, 'critical_path': analysis.summary(plan.get('hours_per_week'), resources)}
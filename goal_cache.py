@@ -0,0 +1,211 @@
+import copy
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+DEFAULT_GOAL_CACHE_DIR = os.path.join('storage', 'goal_cache')
+
+STOP_WORDS = {
+    'a', 'an', 'the', 'and', 'or', 'to', 'of', 'for', 'in', 'on', 'at', 'by', 'with', 'within', 'over', 'into',
+    'my', 'our', 'your', 'me', 'i', 'we', 'want', 'would', 'like', 'need', 'how', 'be', 'able', 'get', 'some',
+    'please', 'about', 'from', 'next', 'this', 'that', 'fully', 'really', 'properly'
+}
+
+_NUMBER_WORDS = r'(?:\d+(?:\.\d+)?|a|an|one|two|three|four|five|six|seven|eight|nine|ten|eleven|twelve|few|couple of|several)'
+_UNITS = r'(?:hours?|hrs?|days?|weeks?|wks?|months?|mos?|years?|yrs?)'
+# Only timeline phrases at the end of the goal are dropped ("... in 3 months"); a number
+# modifying a noun ("a 2 week trip", "a 5 year plan") or a cadence ("for an hour a day")
+# is part of the goal's scope and stays.
+_TRAILING_TIMELINE = re.compile(
+    rf'\s+(?:in|within|over|by|during|under)\s+(?:the\s+)?(?:next\s+)?{_NUMBER_WORDS}[\s-]*{_UNITS}$'
+    r'|\s+(?:by|before|until)\s+(?:the\s+)?(?:end\s+of\s+)?(?:next|this)\s+(?:week|month|year|summer|winter|spring|fall)$'
+)
+
+def goal_signature(goal: str) -> str:
+    """
+    Normalize a goal so near-identical wordings share a cache entry.
+
+    Folds case, punctuation and whitespace, drops trailing timeline phrases ("in
+    3 months", "by next year" - the request's dates carry the timeline) and stop
+    words, e.g. "Learn React in 3 months!" -> "learn react". Durations inside
+    the goal ("Plan a 2 week trip") are kept, since they change what is planned.
+    """
+    text, previous = str(goal).lower(), None
+    while text != previous:
+        # Repeat for goals ending in several phrases ("... within six weeks, by next summer")
+        previous = text
+        text = _TRAILING_TIMELINE.sub('', re.sub(r'[\s.!?,;:]+$', '', text))
+    words = re.findall(r'[a-z0-9+#]+', text)
+    return ' '.join(word for word in words if word not in STOP_WORDS)
+
+def _parse_date(value: str) -> datetime:
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d')
+
+def _capacity(start_date: str, deadline: str, hours_per_week: Any) -> float:
+    days = max(1, (_parse_date(deadline) - _parse_date(start_date)).days)
+    return days / 7 * float(hours_per_week)
+
+def redate(entry: Dict[str, Any], start_date: str, deadline: str, hours_per_week: Any,
+           max_scale: float = 2.0) -> Dict[str, Any]:
+    """
+    Fit a cached decomposition to a new timeline.
+
+    Task hours are scaled by the ratio of the new to the original capacity (weeks
+    times hours per week), limited to `max_scale` either way so a cached plan is
+    not stretched beyond recognition; milestone target dates keep their relative
+    position between the new start date and deadline.
+    """
+    value = copy.deepcopy(entry['value'])
+    try:
+        scale = _capacity(start_date, deadline, hours_per_week) / _capacity(entry['start_date'], entry['deadline'], entry['hours_per_week'])
+        old_start, old_end = _parse_date(entry['start_date']), _parse_date(entry['deadline'])
+        new_start, new_end = _parse_date(start_date), _parse_date(deadline)
+    except (KeyError, TypeError, ValueError, ZeroDivisionError):
+        return value
+    scale = min(max_scale, max(1 / max_scale, scale))
+    old_span = max(1, (old_end - old_start).days)
+
+    for task in value.get('tasks', []):
+        try:
+            hours = float(task.get('estimated_hours', 0) or 0) * scale
+        except (TypeError, ValueError):
+            continue
+        hours = max(1.0, round(hours * 2) / 2)
+        task['estimated_hours'] = int(hours) if hours == int(hours) else hours
+    for milestone in value.get('milestones', []):
+        if 'estimated_hours' in milestone:
+            try:
+                milestone['estimated_hours'] = max(1, round(float(milestone['estimated_hours']) * scale))
+            except (TypeError, ValueError):
+                pass
+        try:
+            position = (_parse_date(milestone['target_date']) - old_start).days / old_span
+        except (KeyError, TypeError, ValueError):
+            continue
+        target = new_start + timedelta(days=round(min(1.0, max(0.0, position)) * (new_end - new_start).days))
+        milestone['target_date'] = target.strftime('%Y-%m-%d')
+    return value
+
+class DecompositionCache:
+    """
+    Cache of decomposition results keyed on a normalized goal signature.
+
+    Unlike the LLM response cache (keyed on the exact prompt) this matches goals
+    that differ only in wording, casing or stated duration; results are re-dated
+    to the caller's timeline on every hit. Entries live in an in-memory LRU of
+    `max_entries` backed by one JSON file each under `directory`, and expire
+    after `ttl_seconds`; `get(..., max_age=...)` applies a tighter bound per call.
+    """
+
+    def __init__(self, directory: Optional[str] = DEFAULT_GOAL_CACHE_DIR, max_entries: int = 256,
+                 ttl_seconds: float = 30 * 24 * 3600):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._memory: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'stale': 0, 'writes': 0}
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def key(kind: str, goal: str, variant: str = '') -> str:
+        payload = json.dumps([kind, goal_signature(goal), variant])
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, kind: str, goal: str, start_date: str, deadline: str, hours_per_week: Any,
+            variant: str = '', max_age: Optional[float] = None) -> Optional[Dict[str, Any]]:
+        """Return the cached value re-dated to the given timeline, or None on a miss."""
+        key = self.key(kind, goal, variant)
+        with self._lock:
+            entry = self._memory.get(key)
+        if entry is None:
+            entry = self._read_disk(key)
+        age = time.time() - entry['created_at'] if entry else None
+        limit = min(self.ttl_seconds, max_age) if max_age is not None else self.ttl_seconds
+        with self._lock:
+            if entry is None:
+                self._counters['misses'] += 1
+                return None
+            if age > limit:
+                self._counters['stale'] += 1
+                self._counters['misses'] += 1
+                return None
+            self._counters['hits'] += 1
+            self._remember(key, entry)
+        return redate(entry, start_date, deadline, hours_per_week)
+
+    def put(self, kind: str, goal: str, start_date: str, deadline: str, hours_per_week: Any,
+            value: Dict[str, Any], variant: str = '') -> None:
+        """Store a decomposition result along with the timeline it was produced for."""
+        key = self.key(kind, goal, variant)
+        entry = {
+            'signature': goal_signature(goal),
+            'goal': goal,
+            'start_date': start_date,
+            'deadline': deadline,
+            'hours_per_week': hours_per_week,
+            'value': value,
+            'created_at': time.time()
+        }
+        with self._lock:
+            self._remember(key, entry)
+            self._counters['writes'] += 1
+        if self.directory:
+            path = self._path(key)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(entry, f, ensure_ascii=False, default=str)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                print(f"Error writing goal cache entry: {e}")
+
+    def _remember(self, key: str, entry: Dict[str, Any]) -> None:
+        # Caller holds the lock.
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _read_disk(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.directory:
+            return None
+        try:
+            with open(self._path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def clear(self) -> None:
+        """Drop every entry."""
+        with self._lock:
+            self._memory.clear()
+        if self.directory:
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith('.json'):
+                    try:
+                        os.remove(entry.path)
+                    except OSError:
+                        pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._counters)
+            stats['memory_entries'] = len(self._memory)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        return stats
+
+def milestone_variant(milestones: List[Dict[str, Any]]) -> str:
+    """Variant key tying per-milestone task lists to the milestone outline they were built from."""
+    return '|'.join(str(m.get('name', '')) for m in milestones)
@@ -0,0 +1,283 @@
+import json
+import os
+import queue
+import threading
+import time
+import uuid
+from collections import deque
+from concurrent.futures import Future
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+DEFAULT_JOBS_DIR = os.path.join('storage', 'jobs')
+
+def _percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+class JobQueue:
+    """
+    Persistent job queue served by a bounded pool of worker threads.
+
+    `runner(payload, progress_callback)` does the work and returns a JSON-serializable
+    result; `progress_callback(message, percent, partial=None)` updates the job's
+    progress and, optionally, a partial result shown while it runs. Each job
+    is written to `<directory>/<job_id>.json` on every state change, and jobs that were
+    queued or running when the process stopped are queued again on start-up.
+    """
+
+    def __init__(self, runner: Callable[[Dict[str, Any], Callable], Any], directory: Optional[str] = DEFAULT_JOBS_DIR,
+                 workers: int = 2, retention_seconds: float = 24 * 3600, on_error: Optional[Callable[[str, Exception], None]] = None):
+        self.runner = runner
+        self.directory = directory
+        self.workers = max(1, workers)
+        self.retention_seconds = retention_seconds
+        self.on_error = on_error
+        self._jobs: Dict[str, Dict[str, Any]] = {}
+        self._queue: 'queue.Queue[str]' = queue.Queue()
+        self._lock = threading.Lock()
+        self._wait_times: deque = deque(maxlen=1000)
+        self._run_times: deque = deque(maxlen=1000)
+        self._threads: List[threading.Thread] = []
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._recover()
+
+    def start(self) -> None:
+        """Start the worker threads (idempotent)."""
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"plan-job-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def submit(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Enqueue a job and return its public status."""
+        self._purge_expired()
+        job = {
+            'id': uuid.uuid4().hex,
+            'status': 'queued',
+            'progress': 0,
+            'message': 'Queued',
+            'payload': payload,
+            'result': None,
+            'error': None,
+            'created_at': time.time(),
+            'started_at': None,
+            'finished_at': None
+        }
+        with self._lock:
+            self._jobs[job['id']] = job
+        self._persist(job)
+        self._queue.put(job['id'])
+        return self.status(job['id'])
+
+    def status(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Public view of a job: status, progress percentage and, once done, the result."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            view = {
+                'job_id': job['id'],
+                'status': job['status'],
+                'progress': job['progress'],
+                'message': job['message'],
+                'created_at': datetime.fromtimestamp(job['created_at']).isoformat(),
+                'started_at': datetime.fromtimestamp(job['started_at']).isoformat() if job['started_at'] else None,
+                'finished_at': datetime.fromtimestamp(job['finished_at']).isoformat() if job['finished_at'] else None
+            }
+            if job['status'] == 'queued':
+                view['queue_position'] = sum(
+                    1 for other in self._jobs.values()
+                    if other['status'] == 'queued' and other['created_at'] <= job['created_at']
+                )
+            if job['status'] == 'running' and job.get('partial') is not None:
+                view['partial_result'] = job['partial']
+            if job['status'] == 'completed':
+                view['result'] = job['result']
+            if job['status'] == 'failed':
+                view['error'] = job['error']
+            return view
+
+    def metrics(self) -> Dict[str, Any]:
+        """Queue depth, worker utilisation and wait/run time statistics."""
+        now = time.time()
+        with self._lock:
+            counts: Dict[str, int] = {}
+            oldest_queued = None
+            for job in self._jobs.values():
+                counts[job['status']] = counts.get(job['status'], 0) + 1
+                if job['status'] == 'queued' and (oldest_queued is None or job['created_at'] < oldest_queued):
+                    oldest_queued = job['created_at']
+            wait_times = list(self._wait_times)
+            run_times = list(self._run_times)
+
+        return {
+            'queue_depth': counts.get('queued', 0),
+            'running': counts.get('running', 0),
+            'completed': counts.get('completed', 0),
+            'failed': counts.get('failed', 0),
+            'workers': self.workers,
+            'oldest_queued_age': round(now - oldest_queued, 2) if oldest_queued else 0.0,
+            'wait_time': {
+                'avg': round(sum(wait_times) / len(wait_times), 2) if wait_times else 0.0,
+                'p95': round(_percentile(wait_times, 95), 2),
+                'max': round(max(wait_times), 2) if wait_times else 0.0
+            },
+            'run_time': {
+                'avg': round(sum(run_times) / len(run_times), 2) if run_times else 0.0,
+                'p95': round(_percentile(run_times, 95), 2)
+            }
+        }
+
+    def _work(self) -> None:
+        while True:
+            job_id = self._queue.get()
+            with self._lock:
+                job = self._jobs.get(job_id)
+                if job is None or job['status'] != 'queued':
+                    continue
+                job['status'] = 'running'
+                job['started_at'] = time.time()
+                job['message'] = 'Running'
+                self._wait_times.append(job['started_at'] - job['created_at'])
+            self._persist(job)
+
+            def progress(message: str, percent: int, partial: Any = None, job=job) -> None:
+                with self._lock:
+                    job['message'] = message
+                    job['progress'] = percent
+                    if partial is not None:
+                        job['partial'] = partial
+                self._persist(job)
+
+            try:
+                result = self.runner(job['payload'], progress)
+                with self._lock:
+                    job['status'] = 'completed'
+                    job['progress'] = 100
+                    job['message'] = 'Completed'
+                    job['result'] = result
+                    job.pop('partial', None)
+            except Exception as e:
+                if self.on_error:
+                    self.on_error(job_id, e)
+                with self._lock:
+                    job['status'] = 'failed'
+                    job['message'] = 'Failed'
+                    job['error'] = str(e)
+            with self._lock:
+                job['finished_at'] = time.time()
+                self._run_times.append(job['finished_at'] - job['started_at'])
+            self._persist(job)
+
+    def _persist(self, job: Dict[str, Any]) -> None:
+        if not self.directory:
+            return
+        with self._lock:
+            snapshot = json.dumps(job, ensure_ascii=False, default=str)
+        path = os.path.join(self.directory, f"{job['id']}.json")
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(snapshot)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error persisting job {job['id']}: {e}")
+
+    def _recover(self) -> None:
+        """Reload persisted jobs and requeue any that never finished."""
+        unfinished = []
+        for entry in os.scandir(self.directory):
+            if not entry.name.endswith('.json'):
+                continue
+            try:
+                with open(entry.path, 'r', encoding='utf-8') as f:
+                    job = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if job.get('status') in ('queued', 'running'):
+                job['status'] = 'queued'
+                job['started_at'] = None
+                job['message'] = 'Requeued after restart'
+                unfinished.append(job)
+            self._jobs[job['id']] = job
+        for job in sorted(unfinished, key=lambda job: job['created_at']):
+            self._persist(job)
+            self._queue.put(job['id'])
+        self._purge_expired()
+
+    def _purge_expired(self) -> None:
+        """Forget finished jobs older than the retention period."""
+        cutoff = time.time() - self.retention_seconds
+        with self._lock:
+            expired = [
+                job_id for job_id, job in self._jobs.items()
+                if job['status'] in ('completed', 'failed') and (job['finished_at'] or 0) < cutoff
+            ]
+            for job_id in expired:
+                del self._jobs[job_id]
+        if self.directory:
+            for job_id in expired:
+                try:
+                    os.remove(os.path.join(self.directory, f"{job_id}.json"))
+                except OSError:
+                    pass
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key into a single execution.
+
+    The first caller for a key runs the function; callers arriving while it is in
+    flight wait for and receive the same result (or exception).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Dict[str, Any]] = {}
+        self.total_coalesced = 0
+
+    def do(self, key: str, fn: Callable[[], Any], on_join: Optional[Callable[[], None]] = None):
+        """
+        Run or join the call for `key`. Returns (result, {'leader': bool, 'coalesced': n}).
+
+        `on_join` is called before a follower starts waiting, e.g. to tell a
+        streaming client that its result will come from another request.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = {'future': Future(), 'followers': 0}
+                self._calls[key] = call
+            else:
+                call['followers'] += 1
+                self.total_coalesced += 1
+
+        if not leader:
+            if on_join:
+                on_join()
+            result = call['future'].result()
+            return result, {'leader': False, 'coalesced': call['followers']}
+
+        try:
+            result = fn()
+        except Exception as e:
+            with self._lock:
+                del self._calls[key]
+            call['future'].set_exception(e)
+            raise
+        with self._lock:
+            del self._calls[key]
+        call['future'].set_result(result)
+        return result, {'leader': True, 'coalesced': call['followers']}
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
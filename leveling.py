@@ -0,0 +1,270 @@
+import heapq
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from cpm import CriticalPathAnalysis
+
+EXACT_MAX_TASKS = 10
+EXACT_NODE_LIMIT = 50000
+
+def _hours(task: Dict[str, Any]) -> float:
+    try:
+        return max(0.0, float(task.get('estimated_hours', 0) or 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+def _round(value: float):
+    rounded = round(value, 2)
+    return int(rounded) if rounded == int(rounded) else rounded
+
+def _skills(value: Any) -> set:
+    if not value:
+        return set()
+    if isinstance(value, str):
+        value = [value]
+    return {str(skill).strip().lower() for skill in value}
+
+def team_skills(resources: List[Dict[str, Any]]) -> List[str]:
+    """Every skill anyone on the team has, normalized and sorted."""
+    return sorted(set().union(*(_skills(resource.get('skills')) for resource in resources)))
+
+def validate_resources(resources: Any) -> Optional[str]:
+    """Return an error message for an invalid resource list, or None."""
+    if not isinstance(resources, list) or not resources:
+        return 'resources must be a non-empty list'
+    seen = set()
+    for index, resource in enumerate(resources):
+        if not isinstance(resource, dict) or not resource.get('id'):
+            return f'resources[{index}]: missing id'
+        if resource['id'] in seen:
+            return f'resources[{index}]: duplicate id {resource["id"]}'
+        seen.add(resource['id'])
+        try:
+            if float(resource.get('hours_per_week', 0)) <= 0:
+                return f'resources[{index}]: hours_per_week must be positive'
+        except (TypeError, ValueError):
+            return f'resources[{index}]: hours_per_week must be a number'
+    return None
+
+class _Problem:
+    """Tasks, resources and precedence prepared for the schedulers below."""
+
+    def __init__(self, tasks: List[Dict[str, Any]], resources: List[Dict[str, Any]]):
+        analysis = CriticalPathAnalysis(tasks)
+        by_id = {task.get('id'): task for task in tasks}
+        # Topological order with cycle members appended; keeping only dependencies
+        # on earlier tasks breaks cycles the same way for every scheduler.
+        self.order = list(analysis.order) + list(analysis.cyclic)
+        rank = {task_id: i for i, task_id in enumerate(self.order)}
+        self.tasks = [by_id[task_id] for task_id in self.order]
+        self.hours = [analysis.hours[task_id] for task_id in self.order]
+        self.deps = [[rank[dep] for dep in analysis.deps[task_id] if rank[dep] < rank[task_id]] for task_id in self.order]
+        self.dependents: List[List[int]] = [[] for _ in self.order]
+        for i, deps in enumerate(self.deps):
+            for dep in deps:
+                self.dependents[dep].append(i)
+
+        self.resources = resources
+        self.rates = [float(resource['hours_per_week']) for resource in resources]
+        resource_skills = [_skills(resource.get('skills')) for resource in resources]
+        self.skill_gaps: List[str] = []
+        self.qualified: List[List[int]] = []
+        for task in self.tasks:
+            needed = _skills(task.get('skills'))
+            qualified = [r for r, skills in enumerate(resource_skills) if needed <= skills]
+            if not qualified:
+                # Nobody has every skill: fall back to whoever covers the most of them
+                best = max(len(needed & skills) for skills in resource_skills)
+                qualified = [r for r, skills in enumerate(resource_skills) if len(needed & skills) == best]
+                self.skill_gaps.append(task.get('id'))
+            self.qualified.append(qualified)
+
+        # Priority: least slack first (latest start from the CPM pass), then priority score
+        def priority(i: int):
+            times = analysis.task_times(self.order[i]) or {}
+            try:
+                score = float(self.tasks[i].get('priority_score', 0) or 0)
+            except (TypeError, ValueError):
+                score = 0.0
+            return (times.get('latest_start', float('inf')), -score, i)
+        self.priority = [priority(i) for i in range(len(self.order))]
+
+        # Shortest possible remaining chain from each task, for the exact solver's bound
+        self.tail = [0.0] * len(self.order)
+        for i in reversed(range(len(self.order))):
+            fastest = self.hours[i] / max(self.rates[r] for r in self.qualified[i])
+            self.tail[i] = fastest + max((self.tail[child] for child in self.dependents[i]), default=0.0)
+
+    def place(self, i: int, resource: int, free: List[float], finish: List[float]) -> Tuple[float, float]:
+        start = max([free[resource]] + [finish[dep] for dep in self.deps[i]])
+        return start, start + self.hours[i] / self.rates[resource]
+
+def _heuristic(problem: _Problem) -> Tuple[List[Tuple[int, float, float]], float]:
+    """Serial list scheduling: take ready tasks by priority, each on the resource that finishes it first."""
+    count = len(problem.order)
+    waiting = [len(deps) for deps in problem.deps]
+    ready = [problem.priority[i] for i in range(count) if waiting[i] == 0]
+    heapq.heapify(ready)
+    free = [0.0] * len(problem.rates)
+    finish = [0.0] * count
+    assignment: List[Tuple[int, float, float]] = [(0, 0.0, 0.0)] * count
+    while ready:
+        i = heapq.heappop(ready)[2]
+        resource, start, end = min(((r, *problem.place(i, r, free, finish)) for r in problem.qualified[i]),
+                                   key=lambda option: (option[2], option[0]))
+        free[resource] = end
+        finish[i] = end
+        assignment[i] = (resource, start, end)
+        for child in problem.dependents[i]:
+            waiting[child] -= 1
+            if waiting[child] == 0:
+                heapq.heappush(ready, problem.priority[child])
+    return assignment, max(finish, default=0.0)
+
+def _exact(problem: _Problem, incumbent: List[Tuple[int, float, float]], bound: float,
+           node_limit: int) -> Tuple[List[Tuple[int, float, float]], float, bool]:
+    """
+    Depth-first branch and bound over (ready task, resource) choices.
+
+    Placing any schedule's tasks in order of their start times reproduces it or
+    finishes earlier, so the search is exact when it completes within
+    `node_limit` nodes; otherwise the best schedule found is returned.
+    """
+    count = len(problem.order)
+    best = {'assignment': list(incumbent), 'makespan': bound}
+    waiting = [len(deps) for deps in problem.deps]
+    free = [0.0] * len(problem.rates)
+    finish = [0.0] * count
+    assignment: List[Tuple[int, float, float]] = [(0, 0.0, 0.0)] * count
+    done = [False] * count
+    nodes = 0
+
+    def lower_bound(makespan: float) -> float:
+        bound = makespan
+        for i in range(count):
+            if not done[i] and waiting[i] == 0:
+                earliest = max([min(free[r] for r in problem.qualified[i])] + [finish[dep] for dep in problem.deps[i]])
+                bound = max(bound, earliest + problem.tail[i])
+        return bound
+
+    def search(scheduled: int, makespan: float) -> bool:
+        nonlocal nodes
+        nodes += 1
+        if nodes > node_limit:
+            return False
+        if scheduled == count:
+            if makespan < best['makespan'] - 1e-9:
+                best['assignment'], best['makespan'] = list(assignment), makespan
+            return True
+        if lower_bound(makespan) >= best['makespan'] - 1e-9:
+            return True
+        options = []
+        for i in range(count):
+            if not done[i] and waiting[i] == 0:
+                for r in problem.qualified[i]:
+                    start, end = problem.place(i, r, free, finish)
+                    options.append((end, problem.priority[i], i, r, start))
+        for end, _, i, r, start in sorted(options):
+            previous_free = free[r]
+            done[i], free[r], finish[i], assignment[i] = True, end, end, (r, start, end)
+            for child in problem.dependents[i]:
+                waiting[child] -= 1
+            complete = search(scheduled + 1, max(makespan, end))
+            for child in problem.dependents[i]:
+                waiting[child] += 1
+            done[i], free[r], finish[i] = False, previous_free, 0.0
+            if not complete:
+                return False
+        return True
+
+    optimal = search(0, 0.0)
+    return best['assignment'], best['makespan'], optimal
+
+def level_resources(tasks: List[Dict[str, Any]], resources: List[Dict[str, Any]], start_date: str,
+                    method: str = 'auto', exact_max_tasks: int = EXACT_MAX_TASKS,
+                    node_limit: int = EXACT_NODE_LIMIT) -> Dict[str, Any]:
+    """
+    Schedule tasks across several people with their own weekly hours and skills.
+
+    Each task goes to one resource whose `skills` cover the task's `skills` (if
+    any) and runs after its dependencies; a resource works on one task at a time
+    at its `hours_per_week`. The heuristic is serial list scheduling by least
+    slack in O(N log N + N·R); `method='exact'` (or 'auto' for plans of at most
+    `exact_max_tasks` tasks) improves on it with a branch-and-bound search
+    capped at `node_limit` nodes.
+
+    Returns the usual week-by-week `schedule` (each entry also names its
+    `resource`, and each week has a per-resource `resources` breakdown),
+    per-resource totals, the makespan in weeks and tasks nobody was fully
+    skilled for.
+    """
+    if method not in ('auto', 'heuristic', 'exact'):
+        raise ValueError(f"Unknown leveling method '{method}'")
+    error = validate_resources(resources)
+    if error:
+        raise ValueError(error)
+    try:
+        week_zero = datetime.fromisoformat(start_date)
+    except (TypeError, ValueError):
+        week_zero = datetime.now()
+
+    problem = _Problem(tasks, resources)
+    assignment, makespan = _heuristic(problem)
+    used, optimal = 'heuristic', False
+    if method == 'exact' or (method == 'auto' and len(problem.order) <= exact_max_tasks):
+        assignment, makespan, optimal = _exact(problem, assignment, makespan, node_limit)
+        used = 'exact'
+
+    weeks: Dict[int, Dict[str, Any]] = {}
+    for i, (r, start, end) in enumerate(assignment):
+        task, rate = problem.tasks[i], problem.rates[r]
+        resource_id = resources[r]['id']
+        week = int(start)
+        while end - week > 1e-9 and problem.hours[i] > 0:
+            overlap = min(end, week + 1) - max(start, week)
+            if overlap > 1e-9:
+                entry = weeks.setdefault(week, {
+                    'week_start': (week_zero + timedelta(weeks=week)).date().isoformat(),
+                    'week_number': week + 1,
+                    'hours_planned': 0.0,
+                    'tasks': [],
+                    'resources': {}
+                })
+                hours = overlap * rate
+                entry['tasks'].append({
+                    'task_id': task.get('id'),
+                    'task_title': task.get('title', ''),
+                    'hours_assigned': _round(hours),
+                    'milestone': task.get('milestone', ''),
+                    'resource': resource_id
+                })
+                entry['hours_planned'] += hours
+                entry['resources'][resource_id] = entry['resources'].get(resource_id, 0.0) + hours
+            week += 1
+
+    schedule = [weeks[week] for week in sorted(weeks)]
+    for entry in schedule:
+        entry['hours_planned'] = _round(entry['hours_planned'])
+        entry['resources'] = {rid: _round(hours) for rid, hours in entry['resources'].items()}
+
+    span = max(1, len(schedule) and schedule[-1]['week_number'])
+    summary = []
+    for r, resource in enumerate(resources):
+        mine = [i for i, (assigned, _, _) in enumerate(assignment) if assigned == r]
+        hours = sum(problem.hours[i] for i in mine)
+        summary.append({
+            'id': resource['id'],
+            'name': resource.get('name', resource['id']),
+            'hours_per_week': problem.rates[r],
+            'assigned_hours': _round(hours),
+            'task_ids': [problem.order[i] for i in mine],
+            'utilization': round(hours / (problem.rates[r] * span), 3)
+        })
+    return {
+        'schedule': schedule,
+        'resources': summary,
+        'makespan_weeks': _round(makespan),
+        'method': used,
+        'optimal': optimal,
+        'skill_gaps': problem.skill_gaps
+    }
@@ -0,0 +1,811 @@
+import hashlib
+import json
+import os
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, List, Optional
+
+DEFAULT_CACHE_DIR = os.path.join('storage', 'llm_cache')
+
+class CachedResponse:
+    """Minimal stand-in for a GenAI response; agents only read `.text`."""
+
+    def __init__(self, text: str):
+        self.text = text
+
+def cache_key(model: str, contents: Any, config: Any = None) -> str:
+    """Content address for an LLM call: a SHA-256 of (model, prompt, config)."""
+    payload = json.dumps([model, contents, config], sort_keys=True, default=str, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class ResponseCache:
+    """
+    Two-tier cache of LLM response texts keyed by `cache_key`.
+
+    The memory tier is an LRU of at most `max_entries` items. The disk tier keeps
+    one JSON file per key under `directory` and is trimmed oldest-first once it
+    grows past `max_disk_bytes`. Entries older than `ttl_seconds` are treated as
+    misses in both tiers.
+    """
+
+    def __init__(self, directory: Optional[str] = DEFAULT_CACHE_DIR, max_entries: int = 512,
+                 max_disk_bytes: int = 50 * 1024 * 1024, ttl_seconds: float = 7 * 24 * 3600):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.ttl_seconds = ttl_seconds
+        self._memory: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'writes': 0, 'evictions': 0}
+        self._disk_bytes = 0
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+            self._disk_bytes = sum(entry.stat().st_size for entry in os.scandir(directory) if entry.name.endswith('.json'))
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _expired(self, created_at: float) -> bool:
+        return self.ttl_seconds is not None and time.time() - created_at > self.ttl_seconds
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return {'text': ..., 'tier': 'memory'|'disk'} or None on a miss."""
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if not self._expired(entry['created_at']):
+                    self._memory.move_to_end(key)
+                    self._counters['memory_hits'] += 1
+                    return {'text': entry['text'], 'tier': 'memory'}
+                del self._memory[key]
+
+        entry = self._read_disk(key)
+        with self._lock:
+            if entry is None:
+                self._counters['misses'] += 1
+                return None
+            self._counters['disk_hits'] += 1
+            self._remember(key, entry)
+        return {'text': entry['text'], 'tier': 'disk'}
+
+    def put(self, key: str, text: str, model: str = '') -> None:
+        """Store a response text in both tiers."""
+        entry = {'text': text, 'model': model, 'created_at': time.time()}
+        with self._lock:
+            self._remember(key, entry)
+            self._counters['writes'] += 1
+        self._write_disk(key, entry)
+
+    def _remember(self, key: str, entry: Dict[str, Any]) -> None:
+        # Caller holds the lock.
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+            self._counters['evictions'] += 1
+
+    def _read_disk(self, key: str) -> Optional[Dict[str, Any]]:
+        if not self.directory:
+            return None
+        path = self._path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if self._expired(entry.get('created_at', 0)):
+            self._remove_file(path)
+            return None
+        return entry
+
+    def _write_disk(self, key: str, entry: Dict[str, Any]) -> None:
+        if not self.directory:
+            return
+        path = self._path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            previous = os.path.getsize(path) if os.path.exists(path) else 0
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+            with self._lock:
+                self._disk_bytes += os.path.getsize(path) - previous
+                over_budget = self._disk_bytes > self.max_disk_bytes
+            if over_budget:
+                self._trim_disk()
+        except OSError as e:
+            print(f"Error writing LLM cache entry: {e}")
+
+    def _remove_file(self, path: str) -> None:
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+        except OSError:
+            return
+        with self._lock:
+            self._disk_bytes -= size
+            self._counters['evictions'] += 1
+
+    def _trim_disk(self) -> None:
+        """Delete the oldest disk entries until the tier is back under 90% of its budget."""
+        entries = sorted(
+            (entry for entry in os.scandir(self.directory) if entry.name.endswith('.json')),
+            key=lambda entry: entry.stat().st_mtime
+        )
+        target = self.max_disk_bytes * 0.9
+        for entry in entries:
+            if self._disk_bytes <= target:
+                break
+            self._remove_file(entry.path)
+
+    def delete(self, key: str) -> None:
+        """Remove one entry from both tiers."""
+        with self._lock:
+            self._memory.pop(key, None)
+        if self.directory:
+            path = self._path(key)
+            if os.path.exists(path):
+                self._remove_file(path)
+
+    def clear(self) -> None:
+        """Drop every entry from both tiers."""
+        with self._lock:
+            self._memory.clear()
+        if self.directory:
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith('.json'):
+                    self._remove_file(entry.path)
+
+    def stats(self) -> Dict[str, Any]:
+        """Process-wide counters for this cache."""
+        with self._lock:
+            stats = dict(self._counters)
+            stats['memory_entries'] = len(self._memory)
+            stats['disk_bytes'] = self._disk_bytes
+        lookups = stats['memory_hits'] + stats['disk_hits'] + stats['misses']
+        stats['hit_rate'] = round((stats['memory_hits'] + stats['disk_hits']) / lookups, 3) if lookups else 0.0
+        return stats
+
+class _CachedModels:
+    def __init__(self, owner: 'CachedClient'):
+        self._owner = owner
+
+    def generate_content(self, model: str, contents: Any, config: Any = None, **kwargs):
+        return self._owner.generate_content(model=model, contents=contents, config=config, **kwargs)
+
+class CachedClient:
+    """
+    Wraps a GenAI client so `client.models.generate_content` goes through a ResponseCache.
+
+    One wrapper is created per request; its `stats` count that request's hits and
+    misses. With `bypass=True` the cache is not read, but fresh responses are
+    still written so later requests benefit. `should_cache` can veto storing a
+    response (e.g. one that is not valid JSON).
+    """
+
+    def __init__(self, client, cache: ResponseCache, bypass: bool = False,
+                 should_cache: Optional[Callable[[str], bool]] = None):
+        self.client = client
+        self.cache = cache
+        self.bypass = bypass
+        self.should_cache = should_cache
+        self.models = _CachedModels(self)
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'bypassed': 0}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self.stats[name] += 1
+
+    def generate_content(self, model: str, contents: Any, config: Any = None, **kwargs):
+        key = cache_key(model, contents, config)
+        if self.bypass:
+            self._count('bypassed')
+        else:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self._count('hits')
+                return CachedResponse(cached['text'])
+            self._count('misses')
+
+        if config is not None:
+            kwargs['config'] = config
+        response = self.client.models.generate_content(model=model, contents=contents, **kwargs)
+        text = getattr(response, 'text', None)
+        if text and (self.should_cache is None or self.should_cache(text)):
+            self.cache.put(key, text, model)
+        return response
+
+    def invalidate(self, model: str, contents: Any, config: Any = None) -> None:
+        """Drop a cached response that turned out to be unusable."""
+        self.cache.delete(cache_key(model, contents, config))
+
+    def record_event(self, name: str) -> None:
+        record = getattr(self.client, 'record_event', None)
+        if record:
+            record(name)
+
+_call_labels = threading.local()
+
+def set_call_label(label: Optional[str]) -> None:
+    """Tag LLM calls made from the current thread (e.g. with the pipeline stage name)."""
+    _call_labels.value = label
+
+def current_call_label() -> Optional[str]:
+    return getattr(_call_labels, 'value', None)
+
+def _empty_usage() -> Dict[str, int]:
+    return {'calls': 0, 'prompt_bytes': 0, 'prompt_tokens_est': 0, 'response_bytes': 0, 'prompt_tokens': 0, 'output_tokens': 0}
+
+class _MeteredModels:
+    def __init__(self, owner: 'MeteredClient'):
+        self._owner = owner
+
+    def generate_content(self, model: str, contents: Any, **kwargs):
+        return self._owner.generate_content(model=model, contents=contents, **kwargs)
+
+class MeteredClient:
+    """
+    Wraps a GenAI client and counts the calls that actually reach it.
+
+    Prompt and response sizes are always recorded (with a ~4 bytes/token estimate);
+    exact token counts are taken from the response's `usage_metadata` when the SDK
+    provides it. Usage is also broken down by the caller's `set_call_label`.
+    """
+
+    def __init__(self, client):
+        self.client = client
+        self.models = _MeteredModels(self)
+        self._lock = threading.Lock()
+        self._usage = _empty_usage()
+        self._by_label: Dict[str, Dict[str, int]] = {}
+        self._events: Dict[str, Dict[str, int]] = {}
+
+    def generate_content(self, model: str, contents: Any, **kwargs):
+        response = self.client.models.generate_content(model=model, contents=contents, **kwargs)
+        usage = getattr(response, 'usage_metadata', None)
+        prompt = contents if isinstance(contents, str) else json.dumps(contents, default=str)
+        prompt_bytes = len(prompt.encode('utf-8'))
+        sample = {
+            'calls': 1,
+            'prompt_bytes': prompt_bytes,
+            'prompt_tokens_est': (prompt_bytes + 3) // 4,
+            'response_bytes': len((getattr(response, 'text', None) or '').encode('utf-8')),
+            'prompt_tokens': getattr(usage, 'prompt_token_count', None) or 0,
+            'output_tokens': getattr(usage, 'candidates_token_count', None) or 0
+        }
+        label = current_call_label() or 'unlabelled'
+        with self._lock:
+            per_label = self._by_label.setdefault(label, _empty_usage())
+            for key, value in sample.items():
+                self._usage[key] += value
+                per_label[key] += value
+        return response
+
+    def calls(self, label: str) -> int:
+        """Calls made under `label` that reached the wrapped client."""
+        with self._lock:
+            return self._by_label.get(label, {}).get('calls', 0)
+
+    def record_event(self, name: str) -> None:
+        """Count a named event (e.g. a response validation failure) against the current label."""
+        label = current_call_label() or 'unlabelled'
+        with self._lock:
+            events = self._events.setdefault(label, {})
+            events[name] = events.get(name, 0) + 1
+
+    def usage(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._usage)
+
+    def events_by_label(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {label: dict(events) for label, events in self._events.items()}
+
+    def usage_by_label(self) -> Dict[str, Dict[str, int]]:
+        with self._lock:
+            return {label: dict(usage) for label, usage in self._by_label.items()}
+
+class CircuitBreaker:
+    """
+    Stops sending work to the LLM after repeated timeouts.
+
+    When `failure_threshold` failures fall within the last `window_seconds` the
+    breaker opens and `admit()` refuses calls for `cooldown_seconds`; then a
+    single trial call is let through (half-open) and only its outcome, reported
+    with `trial=True`, closes or re-opens the breaker. A trial that never
+    reached the LLM (e.g. it was answered from a cache) is handed back with
+    `release_trial()`. Successes in between do not clear the window, so
+    intermittent failures still open it.
+    """
+
+    def __init__(self, failure_threshold: int = 3, cooldown_seconds: float = 60.0, window_seconds: float = 300.0):
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.window_seconds = window_seconds
+        self._lock = threading.Lock()
+        self._failures: deque = deque()
+        self._opened_at: Optional[float] = None
+        self._trial_in_flight = False
+        self.times_opened = 0
+
+    def admit(self) -> Optional[str]:
+        """'closed' when calls may go ahead, 'trial' for the one half-open trial call, None while open."""
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if time.time() - self._opened_at < self.cooldown_seconds or self._trial_in_flight:
+                return None
+            self._trial_in_flight = True
+            return 'trial'
+
+    def allow(self) -> bool:
+        return self.admit() is not None
+
+    def record_success(self, trial: bool = False) -> None:
+        with self._lock:
+            if trial and self._trial_in_flight:
+                # The half-open trial went through: close and start a fresh window
+                self._failures.clear()
+                self._opened_at = None
+                self._trial_in_flight = False
+
+    def record_failure(self, trial: bool = False) -> None:
+        with self._lock:
+            now = time.time()
+            self._failures.append(now)
+            while self._failures and now - self._failures[0] > self.window_seconds:
+                self._failures.popleft()
+            if trial and self._trial_in_flight:
+                self._opened_at = now
+                self.times_opened += 1
+                self._trial_in_flight = False
+            elif self._opened_at is None and len(self._failures) >= self.failure_threshold:
+                self._opened_at = now
+                self.times_opened += 1
+
+    def release_trial(self) -> None:
+        """Give back a trial whose outcome says nothing about the LLM, so the next call becomes the trial."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def state(self) -> str:
+        with self._lock:
+            if self._opened_at is None:
+                return 'closed'
+            if time.time() - self._opened_at < self.cooldown_seconds:
+                return 'open'
+            return 'half_open'
+
+class AdmissionTimeout(TimeoutError):
+    """A RateGovernor queue wait that ran out; the call was never sent."""
+
+def is_retryable_error(error: Exception) -> bool:
+    """
+    Rate limits, server errors and network failures are retried; other client errors are not.
+
+    Neither is an AdmissionTimeout: the local queue has already been waited out,
+    and retrying would only queue again.
+    """
+    if isinstance(error, AdmissionTimeout):
+        return False
+    code = getattr(error, 'code', None) or getattr(error, 'status_code', None)
+    if isinstance(code, int):
+        return code in (408, 429) or code >= 500
+    return not isinstance(error, (ValueError, TypeError, KeyError, AttributeError))
+
+def _percentile(values, pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+class _ResilientModels:
+    def __init__(self, owner: 'ResilientClient'):
+        self._owner = owner
+
+    def generate_content(self, model: str, contents: Any, **kwargs):
+        return self._owner.generate_content(model=model, contents=contents, **kwargs)
+
+class ResilientClient:
+    """
+    Wraps a GenAI client with retries and hedged requests.
+
+    Failed calls are retried up to `retries` times with full-jitter exponential
+    backoff (`base_delay` doubling up to `max_delay`) while `retryable(error)` holds.
+    With `hedge_percentile` set, a duplicate request is sent when the first has not
+    answered within that percentile of recent call latencies (learned from the last
+    `latency_window` calls, after `hedge_min_samples` of them); whichever answers
+    first wins. Hedges are capped at `hedge_budget` of all calls so a slow provider
+    does not get double the load. One instance is meant to be shared process-wide.
+
+    When the wrapped client queues calls for admission (a GovernedClient), latency
+    is measured and the hedge delay counted from admission, so time spent waiting
+    on local rate limits neither skews the percentiles nor triggers hedges.
+    """
+
+    def __init__(self, client, retries: int = 2, base_delay: float = 0.5, max_delay: float = 8.0,
+                 hedge_percentile: Optional[float] = 95.0, hedge_budget: float = 0.1,
+                 hedge_min_samples: int = 20, latency_window: int = 200,
+                 retryable: Callable[[Exception], bool] = is_retryable_error):
+        self.client = client
+        self.retries = retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge_percentile = hedge_percentile
+        self.hedge_budget = hedge_budget
+        self.hedge_min_samples = hedge_min_samples
+        self.retryable = retryable
+        self.models = _ResilientModels(self)
+        self._latencies: deque = deque(maxlen=latency_window)
+        self._lock = threading.Lock()
+        self._counters = {'calls': 0, 'attempts': 0, 'retries': 0, 'failures': 0, 'hedges': 0, 'hedge_wins': 0}
+        self._executor = ThreadPoolExecutor(max_workers=32, thread_name_prefix='llm-hedge') if hedge_percentile else None
+
+    def _count(self, name: str, amount: int = 1) -> None:
+        with self._lock:
+            self._counters[name] += amount
+
+    def generate_content(self, model: str, contents: Any, **kwargs):
+        self._count('calls')
+        for attempt in range(self.retries + 1):
+            try:
+                return self._attempt(model, contents, kwargs)
+            except Exception as e:
+                if attempt == self.retries or not self.retryable(e):
+                    self._count('failures')
+                    raise
+                self._count('retries')
+                time.sleep(random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt)))
+
+    def _send(self, model: str, contents: Any, kwargs: Dict[str, Any], admitted: Optional[threading.Event] = None):
+        self._count('attempts')
+        started = [time.time()]
+
+        def on_admitted() -> None:
+            started[0] = time.time()
+            if admitted is not None:
+                admitted.set()
+
+        try:
+            send = getattr(self.client, 'send_when_admitted', None)
+            if send is not None:
+                response = send(model, contents, kwargs, on_admitted)
+            else:
+                on_admitted()
+                response = self.client.models.generate_content(model=model, contents=contents, **kwargs)
+        finally:
+            # Also wakes a hedging caller when admission itself failed
+            if admitted is not None:
+                admitted.set()
+        with self._lock:
+            self._latencies.append(time.time() - started[0])
+        return response
+
+    def hedge_delay(self) -> Optional[float]:
+        """Seconds to wait before hedging, or None while hedging is off or still learning."""
+        if not self.hedge_percentile:
+            return None
+        with self._lock:
+            if len(self._latencies) < self.hedge_min_samples:
+                return None
+            return _percentile(self._latencies, self.hedge_percentile)
+
+    def _may_hedge(self) -> bool:
+        with self._lock:
+            if self._counters['hedges'] >= self.hedge_budget * self._counters['calls']:
+                return False
+            self._counters['hedges'] += 1
+            return True
+
+    def _attempt(self, model: str, contents: Any, kwargs: Dict[str, Any]):
+        delay = self.hedge_delay()
+        if delay is None:
+            return self._send(model, contents, kwargs)
+
+        admitted = threading.Event()
+        primary = self._executor.submit(self._send, model, contents, kwargs, admitted)
+        admitted.wait()
+        done, _ = wait([primary], timeout=delay)
+        if done or not self._may_hedge():
+            return primary.result()
+
+        hedge = self._executor.submit(self._send, model, contents, kwargs)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    response = future.result()
+                except Exception as e:
+                    error = e
+                    continue
+                # The loser is left to finish in the background; its result is ignored
+                if future is hedge:
+                    self._count('hedge_wins')
+                return response
+        raise error
+
+    def record_event(self, name: str) -> None:
+        record = getattr(self.client, 'record_event', None)
+        if record:
+            record(name)
+
+    def stats(self) -> Dict[str, Any]:
+        """Process-wide call, retry and hedge counters plus recent latency percentiles."""
+        with self._lock:
+            stats = dict(self._counters)
+            latencies = list(self._latencies)
+        stats['latency_p50'] = round(_percentile(latencies, 50), 3) if latencies else 0.0
+        stats['latency_p95'] = round(_percentile(latencies, 95), 3) if latencies else 0.0
+        delay = self.hedge_delay()
+        stats['hedge_delay'] = round(delay, 3) if delay is not None else None
+        return stats
+
+class RateGovernor:
+    """
+    Shared admission control for LLM calls: a token bucket for requests and one for
+    tokens per minute, a cap on calls in flight, and a wait queue ordered by
+    priority class then arrival.
+
+    Classes earlier in `priorities` go first, so interactive chat is not stuck
+    behind batch planning; a waiter queued for longer than `max_wait_boost` seconds
+    is treated as top priority so lower classes are never starved outright.
+    """
+
+    def __init__(self, requests_per_minute: float = 60, tokens_per_minute: float = 250000, max_in_flight: int = 8,
+                 priorities=('chat', 'planning'), max_wait_boost: float = 10.0):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_in_flight = max_in_flight
+        self.priorities = list(priorities)
+        self.max_wait_boost = max_wait_boost
+        self._cond = threading.Condition()
+        self._request_tokens = float(requests_per_minute)
+        self._llm_tokens = float(tokens_per_minute)
+        self._refilled_at = time.time()
+        self._in_flight = 0
+        self._waiters: list = []
+        self._seq = 0
+        self._stats = {name: {'granted': 0, 'timeouts': 0, 'waits': deque(maxlen=500)} for name in self.priorities}
+
+    def _refill(self) -> None:
+        # Caller holds the lock.
+        now = time.time()
+        elapsed = now - self._refilled_at
+        self._refilled_at = now
+        self._request_tokens = min(self.requests_per_minute, self._request_tokens + elapsed * self.requests_per_minute / 60)
+        self._llm_tokens = min(self.tokens_per_minute, self._llm_tokens + elapsed * self.tokens_per_minute / 60)
+
+    def _head(self, now: float):
+        return min(self._waiters, key=lambda w: (0 if now - w['queued_at'] > self.max_wait_boost else w['rank'], w['seq']))
+
+    def _wait_needed(self, tokens: float) -> float:
+        """Seconds until both buckets can cover a call of `tokens` (0 if they can now)."""
+        tokens = min(tokens, self.tokens_per_minute)
+        missing_requests = max(0.0, 1 - self._request_tokens)
+        missing_tokens = max(0.0, tokens - self._llm_tokens)
+        return max(missing_requests * 60 / self.requests_per_minute, missing_tokens * 60 / self.tokens_per_minute)
+
+    def acquire(self, priority: str, tokens: float, timeout: Optional[float] = None) -> None:
+        """Block until a call of about `tokens` tokens may be sent; raises AdmissionTimeout after `timeout`."""
+        if priority not in self.priorities:
+            raise ValueError(f"Unknown priority class: {priority}")
+        queued_at = time.time()
+        deadline = queued_at + timeout if timeout is not None else None
+        with self._cond:
+            waiter = {'rank': self.priorities.index(priority), 'seq': self._seq, 'queued_at': queued_at}
+            self._seq += 1
+            self._waiters.append(waiter)
+            try:
+                while True:
+                    now = time.time()
+                    self._refill()
+                    pause = None
+                    if self._head(now) is waiter and self._in_flight < self.max_in_flight:
+                        pause = self._wait_needed(tokens)
+                        if pause == 0:
+                            break
+                    if deadline is not None:
+                        if now >= deadline:
+                            self._stats[priority]['timeouts'] += 1
+                            raise AdmissionTimeout(f"LLM rate limit: no capacity within {timeout:.1f}s")
+                        pause = min(pause, deadline - now) if pause is not None else deadline - now
+                    # Also wake periodically so the wait-time boost can take effect
+                    self._cond.wait(min(pause, 1.0) if pause is not None else 1.0)
+            finally:
+                self._waiters.remove(waiter)
+                self._cond.notify_all()
+            self._request_tokens -= 1
+            self._llm_tokens -= tokens
+            self._in_flight += 1
+            self._stats[priority]['granted'] += 1
+            self._stats[priority]['waits'].append(time.time() - queued_at)
+
+    def release(self, token_correction: float = 0) -> None:
+        """Finish a call, charging the difference between its actual and estimated tokens."""
+        with self._cond:
+            self._in_flight -= 1
+            self._llm_tokens -= token_correction
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            self._refill()
+            waiting: Dict[str, int] = {name: 0 for name in self.priorities}
+            for waiter in self._waiters:
+                waiting[self.priorities[waiter['rank']]] += 1
+            classes = {}
+            for name, stats in self._stats.items():
+                waits = list(stats['waits'])
+                classes[name] = {
+                    'granted': stats['granted'],
+                    'timeouts': stats['timeouts'],
+                    'waiting': waiting[name],
+                    'wait_avg': round(sum(waits) / len(waits), 3) if waits else 0.0,
+                    'wait_p95': round(_percentile(waits, 95), 3) if waits else 0.0
+                }
+            return {
+                'in_flight': self._in_flight,
+                'max_in_flight': self.max_in_flight,
+                'request_tokens_available': round(self._request_tokens, 1),
+                'llm_tokens_available': round(self._llm_tokens),
+                'classes': classes
+            }
+
+class _GovernedModels:
+    def __init__(self, owner: 'GovernedClient'):
+        self._owner = owner
+
+    def generate_content(self, model: str, contents: Any, **kwargs):
+        return self._owner.generate_content(model=model, contents=contents, **kwargs)
+
+class GovernedClient:
+    """
+    Wraps a GenAI client so every call is admitted by a shared RateGovernor under
+    one priority class. Token use is estimated up front (~4 bytes/token for the
+    prompt plus `output_tokens_estimate`) and corrected from `usage_metadata`.
+    """
+
+    def __init__(self, client, governor: RateGovernor, priority: str,
+                 output_tokens_estimate: int = 1024, acquire_timeout: Optional[float] = 60.0):
+        self.client = client
+        self.governor = governor
+        self.priority = priority
+        self.output_tokens_estimate = output_tokens_estimate
+        self.acquire_timeout = acquire_timeout
+        self.models = _GovernedModels(self)
+
+    def generate_content(self, model: str, contents: Any, **kwargs):
+        return self.send_when_admitted(model, contents, kwargs)
+
+    def send_when_admitted(self, model: str, contents: Any, kwargs: Dict[str, Any],
+                           on_admitted: Optional[Callable[[], None]] = None):
+        """Queue for admission, call `on_admitted` once granted, then send the call."""
+        prompt = contents if isinstance(contents, str) else json.dumps(contents, default=str)
+        estimate = len(prompt.encode('utf-8')) // 4 + self.output_tokens_estimate
+        self.governor.acquire(self.priority, estimate, self.acquire_timeout)
+        correction = 0
+        try:
+            if on_admitted is not None:
+                on_admitted()
+            response = self.client.models.generate_content(model=model, contents=contents, **kwargs)
+            total = getattr(getattr(response, 'usage_metadata', None), 'total_token_count', None)
+            if total:
+                correction = total - estimate
+            return response
+        finally:
+            self.governor.release(correction)
+
+class _PooledModels:
+    def __init__(self, owner: 'ClientPool'):
+        self._owner = owner
+
+    def generate_content(self, model: str, contents: Any, **kwargs):
+        return self._owner.generate_content(model=model, contents=contents, **kwargs)
+
+class ClientPool:
+    """
+    Spreads calls over several GenAI clients (e.g. one per API key).
+
+    Each call goes to the healthy client with the fewest calls in flight, ties
+    broken round-robin. A client whose key is rejected or out of quota (HTTP
+    401, 403, 429, or a 400 naming the API key), or that fails with retryable
+    errors `failure_threshold` times in a row, is taken out of rotation for
+    `cooldown_seconds`, doubling on each repeat up to `max_cooldown_seconds`.
+    Other errors (a bad prompt or schema) are the request's fault and leave the
+    client in rotation. When every client is out of rotation the one due back
+    first is used.
+    """
+
+    def __init__(self, clients: Dict[str, Any], failure_threshold: int = 3, cooldown_seconds: float = 30.0,
+                 max_cooldown_seconds: float = 600.0):
+        if not clients:
+            raise ValueError("ClientPool needs at least one client")
+        self.failure_threshold = failure_threshold
+        self.cooldown_seconds = cooldown_seconds
+        self.max_cooldown_seconds = max_cooldown_seconds
+        self.models = _PooledModels(self)
+        self._lock = threading.Lock()
+        self._next = 0
+        self._members = [
+            {'name': name, 'client': client, 'in_flight': 0, 'calls': 0, 'errors': 0, 'throttled': 0,
+             'consecutive_failures': 0, 'ejections': 0, 'ejected_until': 0.0, 'latencies': deque(maxlen=200)}
+            for name, client in clients.items()
+        ]
+
+    def __len__(self) -> int:
+        return len(self._members)
+
+    def _pick(self) -> Dict[str, Any]:
+        with self._lock:
+            now = time.time()
+            count = len(self._members)
+            order = [self._members[(self._next + i) % count] for i in range(count)]
+            healthy = [member for member in order if member['ejected_until'] <= now]
+            if healthy:
+                member = min(healthy, key=lambda member: member['in_flight'])
+            else:
+                member = min(order, key=lambda member: member['ejected_until'])
+            self._next = (self._members.index(member) + 1) % count
+            member['in_flight'] += 1
+            member['calls'] += 1
+            return member
+
+    def generate_content(self, model: str, contents: Any, **kwargs):
+        member = self._pick()
+        started = time.time()
+        try:
+            response = member['client'].models.generate_content(model=model, contents=contents, **kwargs)
+        except Exception as e:
+            self._record_failure(member, e)
+            raise
+        with self._lock:
+            member['in_flight'] -= 1
+            member['consecutive_failures'] = 0
+            member['latencies'].append(time.time() - started)
+        return response
+
+    @staticmethod
+    def _is_key_error(error: Exception) -> bool:
+        """Errors that point at the client's API key rather than the request."""
+        code = getattr(error, 'code', None) or getattr(error, 'status_code', None)
+        return code in (401, 403, 429) or (code == 400 and 'api key' in str(error).lower())
+
+    def _record_failure(self, member: Dict[str, Any], error: Exception) -> None:
+        code = getattr(error, 'code', None) or getattr(error, 'status_code', None)
+        key_error = self._is_key_error(error)
+        with self._lock:
+            member['in_flight'] -= 1
+            member['errors'] += 1
+            if code == 429:
+                member['throttled'] += 1
+            if not key_error and not is_retryable_error(error):
+                return
+            member['consecutive_failures'] += 1
+            if key_error or member['consecutive_failures'] >= self.failure_threshold:
+                cooldown = min(self.max_cooldown_seconds, self.cooldown_seconds * 2 ** member['ejections'])
+                member['ejected_until'] = time.time() + cooldown
+                member['ejections'] += 1
+                member['consecutive_failures'] = 0
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Per-client call counts, errors, health and recent latency percentiles."""
+        now = time.time()
+        with self._lock:
+            return [
+                {
+                    'name': member['name'],
+                    'healthy': member['ejected_until'] <= now,
+                    'in_flight': member['in_flight'],
+                    'calls': member['calls'],
+                    'errors': member['errors'],
+                    'throttled': member['throttled'],
+                    'ejections': member['ejections'],
+                    'latency_p50': round(_percentile(member['latencies'], 50), 3) if member['latencies'] else 0.0,
+                    'latency_p95': round(_percentile(member['latencies'], 95), 3) if member['latencies'] else 0.0
+                }
+                for member in self._members
+            ]
@@ -0,0 +1,135 @@
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from cpm import CriticalPathAnalysis, resource_assignment
+
+DEFAULT_ITERATIONS = 10000
+# Iterations are simulated in chunks of at most CHUNK_ITERATIONS rows and CHUNK_CELLS
+# sampled durations, which bounds memory at a few tens of MB whatever the plan size
+CHUNK_ITERATIONS = 1000
+CHUNK_CELLS = 1_000_000
+# schedule_risk runs inline on plan requests, so it samples at most this many task durations in total
+MAX_SAMPLES = 5_000_000
+
+def _parse_date(value: Any) -> Optional[datetime]:
+    try:
+        return datetime.strptime(str(value)[:10], '%Y-%m-%d')
+    except (TypeError, ValueError):
+        return None
+
+def sample_durations(hours: np.ndarray, iterations: int, optimistic: float = 0.8, pessimistic: float = 1.6,
+                     rng: Optional[np.random.Generator] = None) -> np.ndarray:
+    """
+    Sample task durations as an (iterations, tasks) array.
+
+    Each task follows a triangular distribution with its estimate as the mode,
+    `optimistic` and `pessimistic` times it as the bounds, so overruns are more
+    likely than early finishes.
+    """
+    rng = rng or np.random.default_rng()
+    hours = np.maximum(hours, 0.0)
+    if not hours.size:
+        return np.zeros((iterations, 0))
+    low, high = hours * optimistic, hours * pessimistic
+    # numpy's triangular needs left < right; zero-hour tasks stay at zero
+    degenerate = high <= low
+    samples = rng.triangular(np.where(degenerate, 0.0, low), np.where(degenerate, 0.5, hours),
+                             np.where(degenerate, 1.0, high), size=(iterations, hours.size))
+    samples[:, degenerate] = hours[degenerate]
+    return samples
+
+def simulate_completion(tasks: List[Dict[str, Any]], hours_per_week: Any, iterations: int = DEFAULT_ITERATIONS,
+                        optimistic: float = 0.8, pessimistic: float = 1.6, seed: Optional[int] = 0,
+                        resources: Optional[List[Dict[str, Any]]] = None) -> np.ndarray:
+    """
+    Simulated project length in weeks, one value per iteration.
+
+    Iterations are processed in chunks (see CHUNK_ITERATIONS). Each chunk samples
+    all task durations at once; durations are then pushed through the dependency
+    graph in topological order, one vectorized step per task, to get the critical
+    path length, each task at the weekly hours of whoever does it. The project can finish no sooner than its critical path allows, nor
+    than the busiest person's work fits into their weekly hours. That is all the
+    work at `hours_per_week` for one person, or each resource's assigned tasks
+    for a leveled team (`resources` from resource_plan, see cpm.resource_assignment).
+    """
+    analysis = CriticalPathAnalysis(tasks)
+    ids = list(analysis.order) + list(analysis.cyclic)
+    groups = resource_assignment(ids, hours_per_week, resources)
+    if groups is None:
+        raise ValueError("hours_per_week must be positive")
+    column = {task_id: i for i, task_id in enumerate(ids)}
+    rates = np.ones(len(ids))
+    for rate, task_ids in groups:
+        rates[[column[task_id] for task_id in task_ids]] = rate
+    hours = np.array([analysis.hours[task_id] for task_id in ids], dtype=float)
+    steps = [(column[task_id], [column[dep] for dep in analysis.deps[task_id] if dep in analysis.position])
+             for task_id in analysis.order]
+    members = [[column[task_id] for task_id in task_ids] for _, task_ids in groups if task_ids]
+    rng = np.random.default_rng(seed)
+
+    weeks = np.zeros(iterations)
+    chunk = max(1, min(CHUNK_ITERATIONS, CHUNK_CELLS // max(1, len(ids))))
+    for first in range(0, iterations, chunk):
+        size = min(chunk, iterations - first)
+        durations = sample_durations(hours, size, optimistic, pessimistic, rng) / rates
+        finish = np.zeros_like(durations)
+        for i, deps in steps:
+            start = finish[:, deps].max(axis=1) if deps else 0.0
+            finish[:, i] = start + durations[:, i]
+        result = finish.max(axis=1) if ids else np.zeros(size)
+        for indices in members:
+            result = np.maximum(result, durations[:, indices].sum(axis=1))
+        weeks[first:first + size] = result
+    return weeks
+
+def schedule_risk(plan: Dict[str, Any], iterations: int = DEFAULT_ITERATIONS, seed: Optional[int] = 0,
+                  optimistic: float = 0.8, pessimistic: float = 1.6) -> Optional[Dict[str, Any]]:
+    """
+    Monte Carlo forecast of a plan's finish date.
+
+    Returns the probability of finishing by the deadline, P50/P80/P95 finish dates
+    and the weekly distribution of finish dates, or None when the plan lacks a
+    usable start date or weekly hours. Team plans are simulated against their
+    `resource_plan` assignments. Very large plans get fewer iterations, so at
+    most MAX_SAMPLES durations are sampled. A fixed `seed` keeps repeated loads
+    stable.
+    """
+    start = _parse_date(plan.get('start_date'))
+    resources = (plan.get('resource_plan') or {}).get('resources')
+    tasks = plan.get('tasks') or []
+    if start is None or resource_assignment([task.get('id') for task in tasks], plan.get('hours_per_week'), resources) is None:
+        return None
+
+    iterations = max(1, min(iterations, MAX_SAMPLES // max(1, len(tasks))))
+    weeks = simulate_completion(tasks, plan.get('hours_per_week'), iterations, optimistic, pessimistic, seed, resources)
+
+    def finish_date(week: float) -> str:
+        return (start + timedelta(days=float(week) * 7)).strftime('%Y-%m-%d')
+
+    p50, p80, p95 = np.percentile(weeks, [50, 80, 95])
+    week_bins = np.ceil(weeks).astype(int)
+    counts = np.bincount(week_bins)
+    first = int(week_bins.min()) if weeks.size else 0
+    cumulative = np.cumsum(counts) / max(1, weeks.size)
+    result = {
+        'iterations': int(weeks.size),
+        'mean_weeks': round(float(weeks.mean()), 2),
+        'p50_weeks': round(float(p50), 2),
+        'p80_weeks': round(float(p80), 2),
+        'p95_weeks': round(float(p95), 2),
+        'p50_finish': finish_date(p50),
+        'p80_finish': finish_date(p80),
+        'p95_finish': finish_date(p95),
+        'distribution': [
+            {'week': week, 'week_ending': finish_date(week), 'probability': round(float(counts[week]) / weeks.size, 4),
+             'cumulative': round(float(cumulative[week]), 4)}
+            for week in range(first, len(counts))
+        ]
+    }
+    deadline = _parse_date(plan.get('deadline'))
+    if deadline is not None:
+        deadline_weeks = (deadline - start).days / 7
+        result['deadline_probability'] = round(float((weeks <= deadline_weeks).mean()), 4)
+    return result
@@ -0,0 +1,305 @@
+import argparse
+import json
+import os
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_PROJECT_DIR = 'storage'
+DEFAULT_PROJECT_DB = os.path.join('storage', 'projects.db')
+PROJECT_BACKENDS = ('json', 'sqlite')
+
+# Indexed metadata kept alongside each stored document; see project_metadata
+METADATA_FIELDS = ['name', 'goal', 'start_date', 'deadline', 'hours_per_week', 'saved_at', 'task_count',
+                   'completed_tasks', 'total_hours']
+LIST_ORDERS = {'name': 'name', 'saved_at': 'saved_at DESC', 'deadline': 'deadline'}
+
+def _valid_name(name: Any) -> bool:
+    return isinstance(name, str) and bool(name) and os.path.basename(name) == name and name not in ('.', '..')
+
+def project_metadata(name: str, project: Dict[str, Any]) -> Dict[str, Any]:
+    """The summary fields stored (and indexed) next to a project document."""
+    tasks = project.get('tasks') or []
+    total_hours = 0.0
+    for task in tasks:
+        try:
+            total_hours += float(task.get('estimated_hours', 0) or 0)
+        except (TypeError, ValueError):
+            pass
+    try:
+        hours_per_week = float(project.get('hours_per_week'))
+    except (TypeError, ValueError):
+        hours_per_week = None
+    return {
+        'name': name,
+        'goal': str(project.get('goal', '')),
+        'start_date': str(project.get('start_date', ''))[:10],
+        'deadline': str(project.get('deadline', ''))[:10],
+        'hours_per_week': hours_per_week,
+        'saved_at': str(project.get('saved_at', '')),
+        'task_count': len(tasks),
+        'completed_tasks': sum(1 for task in tasks if task.get('completed')),
+        'total_hours': round(total_hours, 2)
+    }
+
+class ProjectStore:
+    """
+    Interface shared by the project storage backends.
+
+    `save` and `delete` return whether they succeeded, `load` returns the
+    project document or None, `version` returns a token that changes with the
+    stored document, `names` lists stored project names and `list`
+    returns their metadata (see project_metadata), sorted by one of
+    LIST_ORDERS and optionally filtered by a substring of the goal.
+    """
+
+    backend = ''
+
+    def save(self, name: str, project: Dict[str, Any]) -> bool:
+        raise NotImplementedError
+
+    def load(self, name: str) -> Optional[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def delete(self, name: str) -> bool:
+        raise NotImplementedError
+
+    def version(self, name: str) -> Optional[Tuple[Any, ...]]:
+        """A cheap token that changes whenever the stored project does, or None if it does not exist."""
+        raise NotImplementedError
+
+    def names(self) -> List[str]:
+        raise NotImplementedError
+
+    def list(self, order: str = 'name', goal: Optional[str] = None, limit: Optional[int] = None,
+             offset: int = 0) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+class JSONProjectStore(ProjectStore):
+    """
+    One `<directory>/<name>.json` file per project, the original storage layout.
+
+    Writes go through a temporary file and os.replace so readers never see a
+    partial document. Listing metadata reads every file; use SQLiteProjectStore
+    for large numbers of projects.
+    """
+
+    backend = 'json'
+
+    def __init__(self, directory: str = DEFAULT_PROJECT_DIR):
+        self.directory = directory
+
+    def path(self, name: str) -> str:
+        if not _valid_name(name):
+            raise ValueError(f"Invalid project name: {name!r}")
+        return os.path.join(self.directory, f"{name}.json")
+
+    def save(self, name: str, project: Dict[str, Any]) -> bool:
+        try:
+            path = self.path(name)
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(project, f, indent=2, ensure_ascii=False)
+            os.replace(tmp_path, path)
+            return True
+        except Exception as e:
+            print(f"Error saving project: {e}")
+            return False
+
+    def load(self, name: str) -> Optional[Dict[str, Any]]:
+        try:
+            path = self.path(name)
+            if not os.path.exists(path):
+                return None
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except Exception as e:
+            print(f"Error loading project: {e}")
+            return None
+
+    def delete(self, name: str) -> bool:
+        try:
+            os.remove(self.path(name))
+            return True
+        except (OSError, ValueError):
+            return False
+
+    def version(self, name: str) -> Optional[Tuple[Any, ...]]:
+        try:
+            stat = os.stat(self.path(name))
+        except (OSError, ValueError):
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def names(self) -> List[str]:
+        if not os.path.isdir(self.directory):
+            return []
+        return [filename[:-5] for filename in os.listdir(self.directory) if filename.endswith('.json')]
+
+    def list(self, order: str = 'name', goal: Optional[str] = None, limit: Optional[int] = None,
+             offset: int = 0) -> List[Dict[str, Any]]:
+        if order not in LIST_ORDERS:
+            raise ValueError(f"Unknown order '{order}'")
+        projects = []
+        for name in self.names():
+            project = self.load(name)
+            if isinstance(project, dict):
+                projects.append(project_metadata(name, project))
+        if goal:
+            projects = [p for p in projects if goal.lower() in p['goal'].lower()]
+        projects.sort(key=lambda p: p[order] or '', reverse=order == 'saved_at')
+        return projects[offset:offset + limit if limit is not None else None]
+
+class SQLiteProjectStore(ProjectStore):
+    """
+    Projects in one SQLite database: the JSON document plus indexed metadata columns.
+
+    The database runs in WAL mode so readers never block the writer, and each
+    thread gets its own connection; concurrent writers wait up to
+    `busy_timeout` seconds for the write lock instead of failing. Listing and
+    filtering use the metadata columns without parsing any document.
+    """
+
+    backend = 'sqlite'
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS projects (
+            name TEXT PRIMARY KEY,
+            goal TEXT NOT NULL DEFAULT '',
+            start_date TEXT NOT NULL DEFAULT '',
+            deadline TEXT NOT NULL DEFAULT '',
+            hours_per_week REAL,
+            saved_at TEXT NOT NULL DEFAULT '',
+            task_count INTEGER NOT NULL DEFAULT 0,
+            completed_tasks INTEGER NOT NULL DEFAULT 0,
+            total_hours REAL NOT NULL DEFAULT 0,
+            document TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS projects_saved_at ON projects (saved_at);
+        CREATE INDEX IF NOT EXISTS projects_deadline ON projects (deadline);
+        CREATE INDEX IF NOT EXISTS projects_goal ON projects (goal);
+    """
+
+    def __init__(self, path: str = DEFAULT_PROJECT_DB, busy_timeout: float = 10.0):
+        self.path = path
+        self.busy_timeout = busy_timeout
+        self._local = threading.local()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        connection = self._connection()
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.executescript(self.SCHEMA)
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, 'connection', None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=self.busy_timeout, isolation_level=None)
+            connection.row_factory = sqlite3.Row
+            # WAL makes NORMAL durable against application crashes, at a fraction of FULL's fsyncs
+            connection.execute('PRAGMA synchronous=NORMAL')
+            self._local.connection = connection
+        return connection
+
+    def save(self, name: str, project: Dict[str, Any]) -> bool:
+        try:
+            if not _valid_name(name):
+                raise ValueError(f"Invalid project name: {name!r}")
+            row = project_metadata(name, project)
+            row['document'] = json.dumps(project, ensure_ascii=False)
+            row['updated_at'] = datetime.now().isoformat()
+            columns = list(row)
+            self._connection().execute(
+                f"INSERT OR REPLACE INTO projects ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})",
+                [row[column] for column in columns]
+            )
+            return True
+        except Exception as e:
+            print(f"Error saving project: {e}")
+            return False
+
+    def load(self, name: str) -> Optional[Dict[str, Any]]:
+        try:
+            row = self._connection().execute('SELECT document FROM projects WHERE name = ?', (name,)).fetchone()
+            return json.loads(row['document']) if row else None
+        except Exception as e:
+            print(f"Error loading project: {e}")
+            return None
+
+    def delete(self, name: str) -> bool:
+        return self._connection().execute('DELETE FROM projects WHERE name = ?', (name,)).rowcount > 0
+
+    def version(self, name: str) -> Optional[Tuple[Any, ...]]:
+        # Every save stamps updated_at to the microsecond, so it alone identifies a revision
+        row = self._connection().execute('SELECT updated_at FROM projects WHERE name = ?', (name,)).fetchone()
+        return tuple(row) if row else None
+
+    def names(self) -> List[str]:
+        return [row['name'] for row in self._connection().execute('SELECT name FROM projects ORDER BY name')]
+
+    def list(self, order: str = 'name', goal: Optional[str] = None, limit: Optional[int] = None,
+             offset: int = 0) -> List[Dict[str, Any]]:
+        if order not in LIST_ORDERS:
+            raise ValueError(f"Unknown order '{order}'")
+        query = f"SELECT {', '.join(METADATA_FIELDS)} FROM projects"
+        params: List[Any] = []
+        if goal:
+            query += " WHERE goal LIKE ? ESCAPE '\\'"
+            params.append('%' + goal.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_') + '%')
+        query += f" ORDER BY {LIST_ORDERS[order]} LIMIT ? OFFSET ?"
+        params += [-1 if limit is None else int(limit), int(offset)]
+        return [dict(row) for row in self._connection().execute(query, params)]
+
+def create_project_store(backend: str = 'json', path: Optional[str] = None) -> ProjectStore:
+    """Build the store for `backend` ('json' or 'sqlite'), at `path` or the backend's default location."""
+    if backend == 'json':
+        return JSONProjectStore(path or DEFAULT_PROJECT_DIR)
+    if backend == 'sqlite':
+        return SQLiteProjectStore(path or DEFAULT_PROJECT_DB)
+    raise ValueError(f"Unknown project store backend '{backend}'")
+
+def migrate_projects(source: ProjectStore, target: ProjectStore, overwrite: bool = False) -> Dict[str, Any]:
+    """
+    Copy every project from `source` to `target`, e.g. JSON files into SQLite.
+
+    Projects already in `target` are skipped unless `overwrite` is set; the
+    source is left untouched, so a migration can be rerun or rolled back by
+    switching PROJECT_STORE back.
+    """
+    existing = set(target.names())
+    report: Dict[str, Any] = {'migrated': [], 'skipped': [], 'failed': []}
+    for name in sorted(source.names()):
+        if name in existing and not overwrite:
+            report['skipped'].append(name)
+            continue
+        project = source.load(name)
+        if isinstance(project, dict) and target.save(name, project):
+            report['migrated'].append(name)
+        else:
+            report['failed'].append(name)
+    return report
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Migrate saved projects between storage backends.')
+    parser.add_argument('--from', dest='source', choices=PROJECT_BACKENDS, default='json')
+    parser.add_argument('--to', dest='target', choices=PROJECT_BACKENDS, default='sqlite')
+    parser.add_argument('--source-path', help='JSON directory or SQLite file to read (default: backend default)')
+    parser.add_argument('--target-path', help='JSON directory or SQLite file to write (default: backend default)')
+    parser.add_argument('--overwrite', action='store_true', help='replace projects that already exist in the target')
+    args = parser.parse_args(argv)
+    if args.source == args.target and (args.source_path or '') == (args.target_path or ''):
+        parser.error('source and target are the same store')
+
+    report = migrate_projects(create_project_store(args.source, args.source_path),
+                              create_project_store(args.target, args.target_path), overwrite=args.overwrite)
+    print(f"Migrated {len(report['migrated'])}, skipped {len(report['skipped'])} existing, "
+          f"failed {len(report['failed'])}")
+    for name in report['failed']:
+        print(f"  failed: {name}")
+    return 1 if report['failed'] else 0
+
+if __name__ == '__main__':
+    raise SystemExit(main())
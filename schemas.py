@@ -0,0 +1,207 @@
+from typing import Any, Callable, Dict, List
+
+# Response schemas for the planning agents, in the OpenAPI subset accepted by
+# the GenAI `response_schema` option. The same dicts are compiled into local
+# validators below, so a response is checked against exactly what was requested.
+
+_STRING = {'type': 'STRING'}
+_INTEGER = {'type': 'INTEGER'}
+_NUMBER = {'type': 'NUMBER'}
+_LEVEL = {'type': 'STRING', 'enum': ['High', 'Medium', 'Low']}
+
+TASK_SCHEMA = {
+    'type': 'OBJECT',
+    'properties': {
+        'id': _STRING,
+        'title': _STRING,
+        'description': _STRING,
+        'milestone': _STRING,
+        'estimated_hours': _NUMBER,
+        'dependencies': {'type': 'ARRAY', 'items': _STRING},
+        'deliverable': _STRING,
+        'skills': {'type': 'ARRAY', 'items': _STRING}
+    },
+    'required': ['id', 'title', 'milestone', 'estimated_hours', 'dependencies']
+}
+
+# Models only rate tasks; priority_score and priority_label are computed locally.
+SCORE_PROPERTIES = {
+    'impact_score': _INTEGER,
+    'urgency_score': _INTEGER,
+    'effort_score': _INTEGER
+}
+
+PRIORITIZED_TASK_SCHEMA = {
+    'type': 'OBJECT',
+    'properties': {**TASK_SCHEMA['properties'], **SCORE_PROPERTIES},
+    'required': TASK_SCHEMA['required'] + ['impact_score', 'urgency_score', 'effort_score']
+}
+
+MILESTONE_SCHEMA = {
+    'type': 'OBJECT',
+    'properties': {'name': _STRING, 'description': _STRING, 'target_date': _STRING},
+    'required': ['name']
+}
+
+MILESTONE_PLAN_SCHEMA = {
+    'type': 'OBJECT',
+    'properties': {
+        **MILESTONE_SCHEMA['properties'],
+        'estimated_hours': _NUMBER,
+        'depends_on': {'type': 'ARRAY', 'items': _STRING}
+    },
+    'required': ['name', 'estimated_hours', 'depends_on']
+}
+
+RISK_SCHEMA = {
+    'type': 'OBJECT',
+    'properties': {
+        'id': _STRING,
+        'description': _STRING,
+        'probability': _LEVEL,
+        'impact': _LEVEL,
+        'severity': _LEVEL,
+        'mitigation': _STRING
+    },
+    'required': ['description', 'severity', 'mitigation']
+}
+
+OPTIMIZATION_SCHEMA = {
+    'type': 'OBJECT',
+    'properties': {
+        'category': _STRING,
+        'title': _STRING,
+        'description': _STRING,
+        'impact': _STRING,
+        'priority': _STRING
+    },
+    'required': ['category', 'title', 'description']
+}
+
+SCHEDULE_WEEK_SCHEMA = {
+    'type': 'OBJECT',
+    'properties': {
+        'week_start': _STRING,
+        'week_number': _INTEGER,
+        'hours_planned': _NUMBER,
+        'tasks': {
+            'type': 'ARRAY',
+            'items': {
+                'type': 'OBJECT',
+                'properties': {
+                    'task_id': _STRING,
+                    'task_title': _STRING,
+                    'hours_assigned': _NUMBER,
+                    'milestone': _STRING
+                },
+                'required': ['task_id', 'hours_assigned']
+            }
+        }
+    },
+    'required': ['week_start', 'week_number', 'hours_planned', 'tasks']
+}
+
+def _array_of(schema: Dict[str, Any]) -> Dict[str, Any]:
+    return {'type': 'ARRAY', 'items': schema}
+
+def _object_of(required: List[str], **properties: Dict[str, Any]) -> Dict[str, Any]:
+    return {'type': 'OBJECT', 'properties': properties, 'required': required}
+
+RESPONSE_SCHEMAS: Dict[str, Dict[str, Any]] = {
+    'decomposition': _object_of(['tasks'], tasks=_array_of(TASK_SCHEMA), milestones=_array_of(MILESTONE_SCHEMA)),
+    'prioritization': _object_of(['scores'], scores=_array_of(_object_of(
+        ['id', 'impact', 'urgency', 'effort'], id=_STRING, impact=_INTEGER, urgency=_INTEGER, effort=_INTEGER
+    ))),
+    'milestones': _object_of(['milestones'], milestones=_array_of(MILESTONE_PLAN_SCHEMA)),
+    'milestone_tasks': _object_of(['tasks'], tasks=_array_of(TASK_SCHEMA)),
+    'scheduling': _object_of(['schedule'], schedule=_array_of(SCHEDULE_WEEK_SCHEMA)),
+    'risk_analysis': _object_of(['risks'], risks=_array_of(RISK_SCHEMA)),
+    'optimization': _object_of(['optimizations'], optimizations=_array_of(OPTIMIZATION_SCHEMA)),
+    'plan': _object_of(['tasks'], tasks=_array_of(PRIORITIZED_TASK_SCHEMA), milestones=_array_of(MILESTONE_SCHEMA)),
+    'review': _object_of(['risks', 'optimizations'], risks=_array_of(RISK_SCHEMA), optimizations=_array_of(OPTIMIZATION_SCHEMA)),
+    'single_call': _object_of(
+        ['tasks', 'risks', 'optimizations'],
+        tasks=_array_of(PRIORITIZED_TASK_SCHEMA), risks=_array_of(RISK_SCHEMA), optimizations=_array_of(OPTIMIZATION_SCHEMA)
+    ),
+}
+
+Validator = Callable[[Any, str, List[str]], None]
+
+def compile_schema(schema: Dict[str, Any]) -> Callable[[Any], List[str]]:
+    """
+    Compile a response schema into a validator function.
+
+    The schema is walked once; the returned function only runs the resulting
+    closures and returns a list of error messages (empty when the value is valid).
+    """
+    check = _compile(schema)
+
+    def validate(value: Any) -> List[str]:
+        errors: List[str] = []
+        check(value, '$', errors)
+        return errors
+
+    return validate
+
+def _compile(schema: Dict[str, Any]) -> Validator:
+    kind = schema.get('type', '').upper()
+
+    if kind == 'OBJECT':
+        properties = {name: _compile(sub) for name, sub in schema.get('properties', {}).items()}
+        required = list(schema.get('required', []))
+
+        def check_object(value, path, errors):
+            if not isinstance(value, dict):
+                errors.append(f"{path}: expected object")
+                return
+            for name in required:
+                if name not in value:
+                    errors.append(f"{path}.{name}: missing")
+            for name, check in properties.items():
+                if name in value and value[name] is not None:
+                    check(value[name], f"{path}.{name}", errors)
+        return check_object
+
+    if kind == 'ARRAY':
+        check_item = _compile(schema['items']) if 'items' in schema else None
+
+        def check_array(value, path, errors):
+            if not isinstance(value, list):
+                errors.append(f"{path}: expected array")
+                return
+            if check_item:
+                for i, item in enumerate(value):
+                    check_item(item, f"{path}[{i}]", errors)
+        return check_array
+
+    if kind == 'STRING':
+        allowed = set(schema['enum']) if 'enum' in schema else None
+
+        def check_string(value, path, errors):
+            if not isinstance(value, str):
+                errors.append(f"{path}: expected string")
+            elif allowed is not None and value not in allowed:
+                errors.append(f"{path}: expected one of {sorted(allowed)}")
+        return check_string
+
+    if kind in ('INTEGER', 'NUMBER'):
+        integral = kind == 'INTEGER'
+
+        def check_number(value, path, errors):
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                errors.append(f"{path}: expected {kind.lower()}")
+            elif integral and value != int(value):
+                errors.append(f"{path}: expected integer")
+        return check_number
+
+    if kind == 'BOOLEAN':
+        def check_boolean(value, path, errors):
+            if not isinstance(value, bool):
+                errors.append(f"{path}: expected boolean")
+        return check_boolean
+
+    return lambda value, path, errors: None
+
+RESPONSE_VALIDATORS: Dict[str, Callable[[Any], List[str]]] = {
+    name: compile_schema(schema) for name, schema in RESPONSE_SCHEMAS.items()
+}
@@ -392,6 +392,33 @@ const Features = {
         container.scrollTop = container.scrollHeight;
     },
 
+    // Tasks from the plan stream, listed in the overlay while the remaining agents run
+    showPartialTasks: function(tasks) {
+        const overlay = document.getElementById('agent-overlay');
+        if (!overlay) return;
+
+        let panel = document.getElementById('agent-partial-tasks');
+        if (!panel) {
+            panel = document.createElement('div');
+            panel.id = 'agent-partial-tasks';
+            panel.className = 'terminal-log-container';
+            panel.style.marginTop = '15px';
+            overlay.appendChild(panel);
+        }
+        panel.innerHTML = '';
+
+        const header = document.createElement('div');
+        header.className = 'log-entry';
+        header.textContent = `> ${tasks.length} TASKS IDENTIFIED (PLAN STILL RUNNING)`;
+        panel.appendChild(header);
+        tasks.forEach(task => {
+            const div = document.createElement('div');
+            div.className = 'log-entry';
+            div.textContent = `  - ${task.title} (${task.estimated_hours}h)`;
+            panel.appendChild(div);
+        });
+    },
+
     // 2B. Voice Command Module
     initVoiceCommand: function() {
         if (!('webkitSpeechRecognition' in window)) {
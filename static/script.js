@@ -331,17 +331,22 @@ document.getElementById('generate-plan')?.addEventListener('click', async () =>
     // Start Cinematic Sequence
     const animationPromise = Features.startAgentSequence();
 
-    // Start API Call
-    const apiPromise = fetch('/api/plan', {
-        method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({
-            goal,
-            start_date: startDate,
-            deadline,
-            hours_per_week: hoursPerWeek
-        })
-    }).then(response => response.json());
+    // Start API Call (streamed, so tasks can be shown before the plan is complete)
+    const apiPromise = streamPlan({
+        goal,
+        start_date: startDate,
+        deadline,
+        hours_per_week: hoursPerWeek
+    }, (event, payload) => {
+        if (event === 'progress') {
+            Features.addTerminalLog(`> ${payload.message}`);
+        } else if (event === 'stage' && payload.field === 'tasks') {
+            // Show the tasks now: in the overlay while it is up, and in the results section behind it
+            renderTaskList(payload.result);
+            document.getElementById('results-section').style.display = 'block';
+            Features.showPartialTasks(payload.result);
+        }
+    });
 
     try {
         // Wait for both Animation and API
@@ -369,10 +374,51 @@ document.getElementById('generate-plan')?.addEventListener('click', async () =>
     }
 });
 
-function renderPlan(plan) {
+// Call /api/plan/stream and resolve with the final plan. onEvent receives each
+// Server-Sent Event (progress / stage) as it arrives.
+async function streamPlan(body, onEvent) {
+    const response = await fetch('/api/plan/stream', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(body)
+    });
+    if (!response.ok || !response.body) {
+        return response.json();
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = '';
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf('\n\n')) !== -1) {
+            const block = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let event = 'message';
+            let data = '';
+            block.split('\n').forEach(line => {
+                if (line.startsWith('event: ')) event = line.slice(7);
+                else if (line.startsWith('data: ')) data += line.slice(6);
+            });
+            const payload = data ? JSON.parse(data) : {};
+
+            if (event === 'complete' || event === 'error') return payload;
+            if (onEvent) onEvent(event, payload);
+        }
+    }
+    throw new Error('Plan stream ended unexpectedly');
+}
+
+function renderTaskList(tasks) {
     const tasksContainer = document.getElementById('tasks-container');
     if (tasksContainer) {
-        tasksContainer.innerHTML = plan.tasks.map((t, index) => `
+        tasksContainer.innerHTML = tasks.map((t, index) => `
             <div class="task-card glass-card ${t.completed ? 'completed' : ''}" style="margin-bottom: 15px; padding: 15px; border-left: 4px solid ${t.completed ? '#0f0' : '#333'};">
                 <div style="display:flex; justify-content:space-between; align-items: center;">
                     <div style="display: flex; align-items: center; gap: 10px;">
@@ -382,7 +428,7 @@ function renderPlan(plan) {
                                style="accent-color: #0f0; width: 18px; height: 18px; cursor: pointer;">
                         <h4 style="margin: 0; text-decoration: ${t.completed ? 'line-through' : 'none'}; color: ${t.completed ? '#888' : '#fff'};">${t.title}</h4>
                     </div>
-                    <span class="badge">${t.priority_label}</span>
+                    <span class="badge">${t.priority_label || '...'}</span>
                 </div>
                 <p style="margin-left: 28px; color: ${t.completed ? '#666' : '#aaa'};">${t.description}</p>
                 <div class="task-meta" style="margin-top: 10px; margin-left: 28px; font-size: 0.9em; color: #888;">
@@ -392,6 +438,10 @@ function renderPlan(plan) {
             </div>
         `).join('');
     }
+}
+
+function renderPlan(plan) {
+    renderTaskList(plan.tasks);
     
     // Update progress
     updateProgressUI();
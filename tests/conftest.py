@@ -0,0 +1,87 @@
+import json
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Prompt openings of the staged pipeline's agents
+PROMPT_MARKERS = [
+    ('optimization', 'You are a project optimization expert'),
+    ('risk_analysis', 'You are a risk analysis expert'),
+    ('scheduling', 'You are a project scheduling expert'),
+    ('prioritization', 'You are a task prioritization expert'),
+    ('milestones', 'Split the following goal into milestones'),
+    ('milestone_tasks', 'Break down one milestone'),
+    ('decomposition', 'You are a project decomposition expert'),
+]
+
+def fake_tasks(count=8):
+    return [
+        {'id': f'task_{i}', 'title': f'Task {i}', 'description': 'Do it', 'milestone': f'M{(i - 1) // 3 + 1}',
+         'estimated_hours': 8, 'dependencies': [f'task_{i - 1}'] if i > 1 else [], 'deliverable': 'Done'}
+        for i in range(1, count + 1)
+    ]
+
+FAKE_RESPONSES = {
+    'decomposition': lambda prompt: {'tasks': fake_tasks(), 'milestones': []},
+    'milestones': lambda prompt: {'milestones': [
+        {'name': f'M{i}', 'description': 'Part', 'target_date': '2026-03-01', 'estimated_hours': 24, 'depends_on': []}
+        for i in range(1, 4)
+    ]},
+    'milestone_tasks': lambda prompt: {'tasks': fake_tasks(3)},
+    'prioritization': lambda prompt: {'scores': [{'id': task['id'], 'impact': 7, 'urgency': 6, 'effort': 4}
+                                                 for task in fake_tasks()]},
+    'scheduling': lambda prompt: {'schedule': []},
+    'risk_analysis': lambda prompt: {'risks': [{'id': 'risk_1', 'description': 'Slip', 'probability': 'Low',
+                                               'impact': 'Low', 'severity': 'Low', 'mitigation': 'Buffer'}]},
+    'optimization': lambda prompt: {'optimizations': [{'category': 'Scope Reduction', 'title': 'Trim', 'description': 'Cut',
+                                                       'impact': 'Time', 'priority': 'Low'}]},
+}
+
+class FakeResponse:
+    def __init__(self, text):
+        self.text = text
+
+class FakeClient:
+    """
+    Stands in for a GenAI client: answers each agent's prompt with a fixed valid
+    response, counts calls per agent and raises for the agents listed in `fail`.
+    """
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.fail = set()
+        self.calls = {}
+        self._lock = threading.Lock()
+        self.models = self
+
+    def total_calls(self):
+        with self._lock:
+            return sum(self.calls.values())
+
+    def generate_content(self, model, contents, config=None, **kwargs):
+        agent = next((name for name, marker in PROMPT_MARKERS if marker in contents), 'unknown')
+        with self._lock:
+            self.calls[agent] = self.calls.get(agent, 0) + 1
+        time.sleep(self.delay)
+        if agent in self.fail:
+            raise RuntimeError(f'{agent} failed')
+        return FakeResponse(json.dumps(FAKE_RESPONSES[agent](contents)))
+
+@pytest.fixture
+def fake_client():
+    return FakeClient()
+
+@pytest.fixture
+def saved_plan(fake_client):
+    """A finished plan as /api/save_project stores it."""
+    from agents import run_planning_pipeline
+    plan = run_planning_pipeline(goal='Write a book', start_date='2026-01-05', deadline='2026-04-01',
+                                 hours_per_week=10, model='fake', client=fake_client)
+    plan['project_name'] = 'book'
+    fake_client.calls.clear()
+    return plan
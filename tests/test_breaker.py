@@ -0,0 +1,62 @@
+import time
+
+import pytest
+
+from agents import execute_stage_graph
+from llm import CircuitBreaker
+
+def open_breaker():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown_seconds=0.05)
+    breaker.record_failure()
+    assert breaker.state() == 'open'
+    time.sleep(0.06)
+    assert breaker.state() == 'half_open'
+    return breaker
+
+def stage(name, run, fallback=True):
+    definition = {'name': name, 'deps': [], 'run': run, 'message': name, 'progress': 0}
+    if fallback:
+        definition['fallback'] = lambda ctx: 'fallback'
+    return definition
+
+def fail(ctx):
+    raise RuntimeError('model unavailable')
+
+def test_failed_trial_reopens_and_allows_the_next_trial():
+    breaker = open_breaker()
+    with pytest.raises(RuntimeError):
+        execute_stage_graph([stage('risk_analysis', fail)], {}, breaker=breaker)
+    assert breaker.state() == 'open'
+    assert breaker.times_opened == 2
+
+    time.sleep(0.06)
+    timings = execute_stage_graph([stage('risk_analysis', lambda ctx: 'ok')], {}, breaker=breaker, llm_calls=lambda name: 1)
+    assert 'degraded' not in timings['risk_analysis']
+    assert breaker.state() == 'closed'
+
+def test_only_the_trial_stage_closes_the_breaker():
+    breaker = open_breaker()
+    # Decomposition has no fallback, so it never takes the trial
+    execute_stage_graph([stage('decomposition', lambda ctx: 'ok', fallback=False)], {}, breaker=breaker, llm_calls=lambda name: 1)
+    assert breaker.state() == 'half_open'
+
+def test_cached_trial_is_handed_back():
+    breaker = open_breaker()
+    execute_stage_graph([stage('prioritization', lambda ctx: 'ok')], {}, breaker=breaker, llm_calls=lambda name: 0)
+    assert breaker.state() == 'half_open'
+    assert breaker.admit() == 'trial'
+
+def test_open_breaker_uses_fallbacks():
+    breaker = CircuitBreaker(failure_threshold=1, cooldown_seconds=60)
+    breaker.record_failure()
+    context = {}
+    timings = execute_stage_graph([stage('risk_analysis', fail)], context, breaker=breaker)
+    assert timings['risk_analysis']['degraded'] == 'circuit_open'
+    assert context['risk_analysis'] == 'fallback'
+
+def test_intermittent_failures_open_the_breaker():
+    breaker = CircuitBreaker(failure_threshold=3, window_seconds=60)
+    for _ in range(3):
+        breaker.record_failure()
+        breaker.record_success()
+    assert breaker.state() == 'open'
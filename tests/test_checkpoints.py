@@ -0,0 +1,44 @@
+import pytest
+
+from agents import PipelineError, mark_replan, replan_project, run_planning_pipeline
+from checkpoints import CheckpointStore
+
+def resume(store, run_id, client):
+    """Resume a run the way /api/plan/resume does, from its checkpointed inputs."""
+    inputs = store.load(run_id)['inputs']
+    plan = run_planning_pipeline(goal=inputs['goal'], start_date=inputs['start_date'], deadline=inputs['deadline'],
+                                 hours_per_week=inputs['hours_per_week'], model='fake', client=client,
+                                 pipeline_mode=inputs['pipeline_mode'], checkpoints=store, run_id=run_id)
+    return mark_replan(plan, inputs['replan']) if inputs.get('replan') else plan
+
+def test_failed_run_resumes_from_completed_stages(tmp_path, fake_client):
+    store = CheckpointStore(str(tmp_path))
+    fake_client.fail = {'optimization'}
+    with pytest.raises(PipelineError) as failure:
+        run_planning_pipeline(goal='Write a book', start_date='2026-01-05', deadline='2026-04-01', hours_per_week=10,
+                              model='fake', client=fake_client, checkpoints=store)
+    assert store.load(failure.value.run_id)['status'] == 'failed'
+
+    fake_client.fail = set()
+    fake_client.calls.clear()
+    plan = resume(store, failure.value.run_id, fake_client)
+    assert fake_client.calls == {'optimization': 1}
+    assert plan['optimizations']
+    assert store.load(failure.value.run_id)['status'] == 'completed'
+
+def test_failed_replan_resumes_with_its_edits(tmp_path, fake_client, saved_plan):
+    store = CheckpointStore(str(tmp_path))
+    changes = {'tasks': {'task_3': {'estimated_hours': 40}}, 'remove_tasks': ['task_8']}
+    fake_client.fail = {'optimization'}
+    with pytest.raises(PipelineError) as failure:
+        replan_project(saved_plan, changes, 'fake', fake_client, checkpoints=store)
+
+    fake_client.fail = set()
+    fake_client.calls.clear()
+    plan = resume(store, failure.value.run_id, fake_client)
+    tasks = {task['id']: task for task in plan['tasks']}
+    assert 'task_8' not in tasks
+    assert tasks['task_3']['estimated_hours'] == 40
+    assert 'decomposition' not in fake_client.calls
+    assert plan['replan_changes'] == ['tasks']
+    assert plan['replanned_from'] == 'book'
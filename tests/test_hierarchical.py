@@ -0,0 +1,29 @@
+from agents import merge_milestone_tasks, run_planning_pipeline
+
+def milestone_tasks():
+    return [{'id': 'task_1', 'title': 'Start', 'estimated_hours': 4, 'dependencies': []},
+            {'id': 'task_2', 'title': 'Finish', 'estimated_hours': 4, 'dependencies': ['task_1']}]
+
+def test_milestones_without_depends_on_follow_the_previous_one():
+    milestones = [{'name': 'Draft'}, {'name': 'Edit', 'depends_on': []}, {'name': 'Publish'}]
+    tasks = {task['id']: task for task in merge_milestone_tasks(milestones, [milestone_tasks() for _ in milestones])}
+    assert tasks['m1_task_1']['dependencies'] == []
+    assert tasks['m2_task_1']['dependencies'] == ['m1_task_2']
+    assert tasks['m3_task_1']['dependencies'] == ['m2_task_2']
+    assert tasks['m3_task_2']['dependencies'] == ['m3_task_1']
+
+def test_depends_on_links_named_earlier_milestones_only():
+    milestones = [{'name': 'Draft'}, {'name': 'Art'}, {'name': 'Publish', 'depends_on': ['Draft', 'Art', 'Later']},
+                  {'name': 'Later', 'depends_on': ['Publish']}]
+    tasks = {task['id']: task for task in merge_milestone_tasks(milestones, [milestone_tasks() for _ in milestones])}
+    assert sorted(tasks['m3_task_1']['dependencies']) == ['m1_task_2', 'm2_task_2']
+    assert tasks['m4_task_1']['dependencies'] == ['m3_task_2']
+
+def test_hierarchical_mode_returns_the_usual_plan(fake_client):
+    plan = run_planning_pipeline(goal='Write a book', start_date='2026-01-05', deadline='2026-04-01', hours_per_week=10,
+                                 model='fake', client=fake_client, pipeline_mode='hierarchical')
+    assert [milestone['name'] for milestone in plan['milestones']] == ['M1', 'M2', 'M3']
+    tasks = {task['id']: task for task in plan['tasks']}
+    assert len(tasks) == 9
+    assert tasks['m2_task_1']['dependencies'] == ['m1_task_3']
+    assert plan['schedule']
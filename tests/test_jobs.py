@@ -0,0 +1,50 @@
+import time
+
+from jobs import JobQueue
+
+def wait_for(queue, job_id, status, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        job = queue.status(job_id)
+        if job['status'] == status:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} is {queue.status(job_id)['status']}, not {status}")
+
+def test_job_round_trip(tmp_path):
+    def runner(payload, progress):
+        progress('Halfway', 50, {'partial': True})
+        return {'goal': payload['goal'], 'tasks': 3}
+
+    queue = JobQueue(runner, directory=str(tmp_path), workers=1)
+    submitted = queue.submit({'goal': 'Write a book'})
+    assert submitted['status'] == 'queued'
+    assert submitted['queue_position'] == 1
+
+    queue.start()
+    job = wait_for(queue, submitted['job_id'], 'completed')
+    assert job['result'] == {'goal': 'Write a book', 'tasks': 3}
+    assert job['progress'] == 100
+    assert queue.metrics()['completed'] == 1
+
+def test_failed_job_reports_its_error(tmp_path):
+    def runner(payload, progress):
+        raise ValueError('no plan')
+
+    errors = []
+    queue = JobQueue(runner, directory=str(tmp_path), workers=1, on_error=lambda job_id, e: errors.append(job_id))
+    queue.start()
+    job_id = queue.submit({'goal': 'Write a book'})['job_id']
+    job = wait_for(queue, job_id, 'failed')
+    assert job['error'] == 'no plan'
+    assert errors == [job_id]
+
+def test_unfinished_jobs_are_requeued_after_restart(tmp_path):
+    # Never started, as if the process stopped with the job still queued
+    stopped = JobQueue(lambda payload, progress: None, directory=str(tmp_path), workers=1)
+    job_id = stopped.submit({'goal': 'Write a book'})['job_id']
+
+    restarted = JobQueue(lambda payload, progress: {'goal': payload['goal']}, directory=str(tmp_path), workers=1)
+    assert restarted.status(job_id)['status'] == 'queued'
+    restarted.start()
+    assert wait_for(restarted, job_id, 'completed')['result'] == {'goal': 'Write a book'}
@@ -0,0 +1,36 @@
+from agents import replan_project
+
+TEAM = [{'id': 'ana', 'hours_per_week': 10}, {'id': 'ben', 'hours_per_week': 5}]
+
+def test_unchanged_replan_reuses_every_stage(fake_client, saved_plan):
+    plan = replan_project(saved_plan, {}, 'fake', fake_client)
+    assert plan['performance_metrics']['rerun_stages'] == []
+    assert fake_client.total_calls() == 0
+
+def test_new_team_reschedules_across_it(fake_client, saved_plan):
+    plan = replan_project(saved_plan, {}, 'fake', fake_client, resources=TEAM)
+    assert plan['replan_changes'] == ['resources']
+    assert {'scheduling', 'optimization'} <= set(plan['performance_metrics']['rerun_stages'])
+    assigned = [item for week in plan['schedule'] for item in week['tasks']]
+    assert assigned and all(item.get('resource') in ('ana', 'ben') for item in assigned)
+    assert plan['resources'] == TEAM
+    assert 'resource_plan' in plan
+
+    # The same team again changes nothing; dropping it goes back to one person
+    again = replan_project(plan, {}, 'fake', fake_client, resources=TEAM)
+    assert again['performance_metrics']['rerun_stages'] == []
+    alone = replan_project(plan, {}, 'fake', fake_client)
+    assert alone['replan_changes'] == ['resources']
+    assert 'resource_plan' not in alone
+    assert all('resource' not in item for week in alone['schedule'] for item in week['tasks'])
+
+def test_new_scheduler_reschedules(fake_client, saved_plan):
+    plan = replan_project(saved_plan, {}, 'fake', fake_client, scheduler='llm')
+    assert plan['replan_changes'] == ['scheduler']
+    assert fake_client.calls.get('scheduling') == 1
+
+def test_priority_label_change_reruns_risk_analysis(fake_client, saved_plan):
+    edit = {'task_2': {'impact_score': 10, 'urgency_score': 10, 'effort_score': 1}}
+    plan = replan_project(saved_plan, {'tasks': edit}, 'fake', fake_client)
+    assert 'prioritization' not in plan['performance_metrics']['rerun_stages']
+    assert 'risk_analysis' in plan['performance_metrics']['rerun_stages']
@@ -0,0 +1,89 @@
+import json
+import threading
+import time
+
+import pytest
+
+from jobs import SingleFlight
+
+def test_concurrent_calls_share_one_run():
+    flight = SingleFlight()
+    runs, joined = [], []
+    results = [None] * 4
+    started = threading.Event()
+
+    def slow():
+        runs.append(1)
+        started.set()
+        time.sleep(0.2)
+        return {'plan': 1}
+
+    def call(i):
+        results[i] = flight.do('key', slow, on_join=lambda: joined.append(i))
+
+    leader = threading.Thread(target=call, args=(0,))
+    leader.start()
+    started.wait()
+    followers = [threading.Thread(target=call, args=(i,)) for i in range(1, 4)]
+    for thread in followers:
+        thread.start()
+    for thread in [leader] + followers:
+        thread.join()
+
+    assert len(runs) == 1
+    assert sorted(joined) == [1, 2, 3]
+    assert all(result is results[0][0] for result, _ in results)
+    assert results[0][1] == {'leader': True, 'coalesced': 3}
+    assert flight.in_flight() == 0
+
+def test_followers_get_the_leaders_error():
+    flight = SingleFlight()
+    started = threading.Event()
+    errors = []
+
+    def failing():
+        started.set()
+        time.sleep(0.1)
+        raise ValueError('boom')
+
+    def call():
+        try:
+            flight.do('key', failing)
+        except ValueError as e:
+            errors.append(str(e))
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait()
+    follower = threading.Thread(target=call)
+    follower.start()
+    leader.join()
+    follower.join()
+    assert errors == ['boom', 'boom']
+    assert flight.in_flight() == 0
+
+def test_identical_streamed_plans_share_one_run(monkeypatch, fake_client):
+    app = pytest.importorskip('app')
+    fake_client.delay = 0.2
+    monkeypatch.setattr(app, 'client', fake_client)
+    monkeypatch.setattr(app, 'llm_cache', None)
+    monkeypatch.setattr(app, 'plan_checkpoints', None)
+    monkeypatch.setattr(app, 'goal_cache', None)
+    body = {'goal': 'Write a book', 'start_date': '2026-01-05', 'deadline': '2026-04-01', 'hours_per_week': 10}
+    plans = []
+
+    def stream():
+        response = app.app.test_client().post('/api/plan/stream', json=body)
+        lines = response.get_data(as_text=True).splitlines()
+        assert 'event: complete' in lines
+        plans.append(json.loads([line for line in lines if line.startswith('data: ')][-1][6:]))
+
+    threads = [threading.Thread(target=stream) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(plans) == 3
+    assert fake_client.calls['decomposition'] == 1
+    assert sorted(plan['performance_metrics']['coalesced'] for plan in plans) == [False, True, True]
@@ -1,10 +1,12 @@
-import json
-import os
 import csv
 import io
+import sys
+import threading
+from collections import OrderedDict
 from datetime import datetime
-from typing import Dict, List, Any
+from typing import Dict, List, Any, Optional, Tuple
 import pandas as pd
+from project_store import JSONProjectStore, ProjectStore
 
 # WeasyPrint availability flag
 WEASYPRINT_AVAILABLE = False
@@ -22,34 +24,130 @@ def check_weasyprint_available():
         print("Warning: WeasyPrint not available. PDF export will be disabled.")
         return False
 
+def _approx_size(value: Any) -> int:
+    """Rough in-memory size of a parsed JSON value, in bytes."""
+    size = 0
+    stack = [value]
+    while stack:
+        item = stack.pop()
+        size += sys.getsizeof(item)
+        if isinstance(item, dict):
+            stack.extend(item.keys())
+            stack.extend(item.values())
+        elif isinstance(item, list):
+            stack.extend(item)
+    return size
+
+class ProjectCache:
+    """
+    Bounded LRU cache of parsed projects, safe to share between request threads.
+
+    Each entry remembers the store's version token (file mtime and size for
+    JSON, last update time for SQLite) and is reloaded when the token
+    changes, so edits made outside save_project_to_file are picked up too.
+    Entries are evicted least recently used first once the cache holds more
+    than `max_entries` projects or `max_bytes` of parsed data; a project larger
+    than `max_bytes` on its own is not cached.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, max_entries: int = 256):
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries: 'OrderedDict[str, Tuple[Any, Dict[str, Any], int]]' = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0, 'invalidations': 0, 'evictions': 0}
+
+    def get(self, name: str, version: Any) -> Optional[Dict[str, Any]]:
+        """The cached project if it was cached at `version`, else None."""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(name)
+                self._counters['hits'] += 1
+                return entry[1]
+            if entry is not None:
+                self._drop(name)
+                self._counters['invalidations'] += 1
+            self._counters['misses'] += 1
+            return None
+
+    def put(self, name: str, version: Any, project: Dict[str, Any]) -> None:
+        size = _approx_size(project)
+        with self._lock:
+            if name in self._entries:
+                self._drop(name)
+            if size > self.max_bytes:
+                return
+            self._entries[name] = (version, project, size)
+            self._bytes += size
+            while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self._counters['evictions'] += 1
+
+    def invalidate(self, name: str) -> None:
+        with self._lock:
+            if name in self._entries:
+                self._drop(name)
+                self._counters['invalidations'] += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _drop(self, name: str) -> None:
+        # Caller holds the lock.
+        self._bytes -= self._entries.pop(name)[2]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._counters)
+            stats['entries'] = len(self._entries)
+            stats['bytes'] = self._bytes
+            stats['max_bytes'] = self.max_bytes
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 3) if lookups else 0.0
+        return stats
+
+# Backend and cache used by save_project_to_file / load_project_from_file; app.py may swap them
+project_store: ProjectStore = JSONProjectStore()
+project_cache = ProjectCache()
+
+def set_project_store(store: ProjectStore, cache: Optional[ProjectCache] = None) -> None:
+    """Use `store` (and `cache`, if given) for every subsequent project save and load."""
+    global project_store, project_cache
+    project_store = store
+    if cache is not None:
+        project_cache = cache
+    project_cache.clear()
+
 def save_project_to_file(project_name: str, project_data: Dict[str, Any]) -> bool:
-    """Save project data to a JSON file."""
-    try:
-        filename = f"storage/{project_name}.json"
-        os.makedirs('storage', exist_ok=True)
-        
-        with open(filename, 'w', encoding='utf-8') as f:
-            json.dump(project_data, f, indent=2, ensure_ascii=False)
-        
-        return True
-    except Exception as e:
-        print(f"Error saving project: {e}")
-        return False
+    """Save project data to the configured project store (storage/<name>.json by default)."""
+    saved = project_store.save(project_name, project_data)
+    # The version token already changes with the write; dropping the entry frees its memory
+    # right away and covers stores whose timestamps are too coarse to tell two writes apart.
+    project_cache.invalidate(project_name)
+    return saved
 
 def load_project_from_file(project_name: str) -> Dict[str, Any]:
-    """Load project data from a JSON file."""
-    try:
-        filename = f"storage/{project_name}.json"
-        
-        if not os.path.exists(filename):
-            return None
-        
-        with open(filename, 'r', encoding='utf-8') as f:
-            return json.load(f)
-    
-    except Exception as e:
-        print(f"Error loading project: {e}")
+    """
+    Load project data from the configured project store, or None if it does not exist.
+
+    Repeated loads of an unchanged project are served from project_cache. The
+    returned dict is a fresh top-level copy, but nested tasks and schedule
+    entries are shared with the cache and must not be modified in place.
+    """
+    version = project_store.version(project_name)
+    if version is None:
         return None
+    project = project_cache.get(project_name, version)
+    if project is None:
+        project = project_store.load(project_name)
+        if not isinstance(project, dict):
+            return project
+        project_cache.put(project_name, version, project)
+    return dict(project)
 
 def generate_csv(project_data: Dict[str, Any]) -> str:
     """Generate CSV content from project schedule."""
@@ -0,0 +1,186 @@
+import json
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+import numpy as np
+
+from agents import apply_task_changes, local_scheduling_agent
+from cpm import CriticalPathAnalysis
+from leveling import level_resources, validate_resources
+from montecarlo import DEFAULT_ITERATIONS, simulate_completion
+
+MAX_SCENARIOS = 500
+DEFAULT_RISK_ITERATIONS = 1000
+
+# Fields a scenario may override; `label` is also passed through to its result
+SCENARIO_FIELDS = ('hours_per_week', 'start_date', 'deadline', 'remove_tasks', 'tasks', 'resources')
+
+def _parse_date(value: Any) -> Optional[datetime]:
+    try:
+        return datetime.strptime(str(value)[:10], '%Y-%m-%d')
+    except (TypeError, ValueError):
+        return None
+
+def _round(value: float):
+    rounded = round(value, 2)
+    return int(rounded) if rounded == int(rounded) else rounded
+
+def validate_scenario(scenario: Any, task_ids: Optional[Set[Any]] = None) -> Optional[str]:
+    """Return an error message for an invalid what-if scenario, or None; `task_ids` are the ids edits may name."""
+    if not isinstance(scenario, dict):
+        return 'scenario must be an object'
+    unknown = [key for key in scenario if key not in SCENARIO_FIELDS and key != 'label']
+    if unknown:
+        return f'Unknown scenario field: {unknown[0]}'
+    if 'hours_per_week' in scenario:
+        try:
+            if float(scenario['hours_per_week']) <= 0:
+                return 'hours_per_week must be positive'
+        except (TypeError, ValueError):
+            return 'hours_per_week must be a number'
+    for field in ('start_date', 'deadline'):
+        if field in scenario and _parse_date(scenario[field]) is None:
+            return f'{field} must be a YYYY-MM-DD date'
+    if not isinstance(scenario.get('remove_tasks', []), list):
+        return 'remove_tasks must be a list of task ids'
+    edits = scenario.get('tasks', {})
+    if not isinstance(edits, dict) or not all(isinstance(edit, dict) for edit in edits.values()):
+        return 'tasks must map task ids to field changes'
+    if task_ids is not None:
+        unknown = [task_id for task_id in edits if task_id not in task_ids]
+        if unknown:
+            return f'Unknown task id: {unknown[0]}'
+    if scenario.get('resources') is not None:
+        return validate_resources(scenario['resources'])
+    return None
+
+class WhatIfModel:
+    """
+    A saved project prepared for fast what-if evaluation.
+
+    Each scenario overrides some of the project's hours per week, start date,
+    deadline, dropped tasks (`remove_tasks`), task edits (`tasks`) or team
+    (`resources`) and is evaluated without any LLM call: the local scheduler
+    (or resource leveling) rebuilds the week-by-week schedule, the critical
+    path bounds the finish, and an optional Monte Carlo run gives the chance of
+    making the deadline. Task sets, their critical path analyses and (for one
+    person) simulated durations are shared across scenarios that only change
+    hours or dates, so a batch sweeping one parameter costs little more than
+    one schedule per point; scenarios that only change task estimates re-time
+    the saved plan's critical path incrementally instead of rebuilding it.
+    """
+
+    def __init__(self, project: Dict[str, Any]):
+        self.project = project
+        self.tasks = project.get('tasks') or []
+        self._task_sets: Dict[str, Tuple[List[Dict[str, Any]], CriticalPathAnalysis]] = {}
+        self._simulations: Dict[Tuple[str, int], np.ndarray] = {}
+
+    @staticmethod
+    def _task_key(scenario: Dict[str, Any]) -> str:
+        changes = {'remove_tasks': scenario.get('remove_tasks') or [], 'tasks': scenario.get('tasks') or {}}
+        return json.dumps(changes, sort_keys=True, default=str)
+
+    def _task_set(self, scenario: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], CriticalPathAnalysis]:
+        key = self._task_key(scenario)
+        if key not in self._task_sets:
+            changes = json.loads(key)
+            if not changes['remove_tasks'] and not changes['tasks']:
+                self._task_sets[key] = (self.tasks, CriticalPathAnalysis(self.tasks))
+            else:
+                tasks = apply_task_changes(self.tasks, changes)[0]
+                if changes['remove_tasks'] or any(set(edit) != {'estimated_hours'} for edit in changes['tasks'].values()):
+                    analysis = CriticalPathAnalysis(tasks)
+                else:
+                    # Estimate-only edits keep the graph, so re-time the unchanged plan's analysis
+                    analysis = self._task_set({})[1].retimed(tasks)
+                self._task_sets[key] = (tasks, analysis)
+        return self._task_sets[key]
+
+    def _simulated_hours(self, scenario: Dict[str, Any], iterations: int) -> np.ndarray:
+        # Simulated weeks scale with 1 / capacity, so one run at one hour per week
+        # serves every hours-per-week value for the same task set.
+        key = (self._task_key(scenario), iterations)
+        if key not in self._simulations:
+            self._simulations[key] = simulate_completion(self._task_set(scenario)[0], 1.0, iterations)
+        return self._simulations[key]
+
+    def evaluate(self, scenario: Optional[Dict[str, Any]] = None, include_schedule: bool = True,
+                 risk_iterations: int = DEFAULT_RISK_ITERATIONS) -> Dict[str, Any]:
+        """
+        Evaluate one scenario; an empty scenario re-evaluates the saved plan as is.
+
+        Returns the scenario's parameters, finish date and weeks, total and
+        available hours, utilization of the capacity up to the deadline, days of
+        slack (negative when late), the critical path length and, when
+        `risk_iterations` is positive, the simulated deadline probability.
+        """
+        scenario = scenario or {}
+        error = validate_scenario(scenario, {task.get('id') for task in self.tasks})
+        if error:
+            raise ValueError(error)
+        start_date = str(scenario.get('start_date', self.project.get('start_date', '')))[:10]
+        deadline = str(scenario.get('deadline', self.project.get('deadline', '')))[:10]
+        start, end = _parse_date(start_date), _parse_date(deadline)
+        if start is None:
+            raise ValueError('Project has no valid start_date')
+        try:
+            hours_per_week = float(scenario.get('hours_per_week', self.project.get('hours_per_week')))
+        except (TypeError, ValueError):
+            raise ValueError('Project has no valid hours_per_week')
+        if hours_per_week <= 0:
+            raise ValueError('hours_per_week must be positive')
+
+        tasks, analysis = self._task_set(scenario)
+        resources = scenario.get('resources')
+        team = None
+        if resources:
+            leveled = level_resources(tasks, resources, start_date, method='heuristic')
+            schedule = leveled['schedule']
+            team = leveled['resources']
+            capacity = sum(float(resource['hours_per_week']) for resource in resources)
+            finish_weeks = float(leveled['makespan_weeks'])
+        else:
+            schedule = local_scheduling_agent(tasks, start_date, deadline, hours_per_week)['schedule']
+            capacity = hours_per_week
+            finish_weeks = (len(schedule) - 1 + float(schedule[-1]['hours_planned']) / capacity) if schedule else 0.0
+
+        total_hours = sum(analysis.hours.values())
+        finish = start + timedelta(days=finish_weeks * 7)
+        result = {
+            'hours_per_week': _round(capacity),
+            'start_date': start_date,
+            'deadline': deadline,
+            'task_count': len(tasks),
+            'total_hours': _round(total_hours),
+            'finish_weeks': _round(finish_weeks),
+            'finish_date': finish.strftime('%Y-%m-%d'),
+            'critical_path_weeks': analysis.summary(capacity, team)['duration_weeks']
+        }
+        if 'label' in scenario:
+            result['label'] = scenario['label']
+        if end is not None:
+            deadline_weeks = max(0, (end - start).days) / 7
+            available = deadline_weeks * capacity
+            result['available_hours'] = _round(available)
+            result['utilization'] = round(total_hours / available, 3) if available else None
+            result['slack_days'] = (end - finish).days
+            result['on_time'] = finish <= end
+            if risk_iterations > 0:
+                iterations = min(int(risk_iterations), DEFAULT_ITERATIONS)
+                if team:
+                    # Simulated against the leveled assignment, which differs per team
+                    weeks = simulate_completion(tasks, capacity, iterations, resources=team)
+                else:
+                    weeks = self._simulated_hours(scenario, iterations) / capacity
+                result['deadline_probability'] = round(float((weeks <= deadline_weeks).mean()), 4)
+        if include_schedule:
+            result['schedule'] = schedule
+        return result
+
+    def evaluate_many(self, scenarios: List[Dict[str, Any]], include_schedule: bool = False,
+                      risk_iterations: int = DEFAULT_RISK_ITERATIONS) -> List[Dict[str, Any]]:
+        """Evaluate up to MAX_SCENARIOS scenarios in order, e.g. one per point of a chart."""
+        if len(scenarios) > MAX_SCENARIOS:
+            raise ValueError(f'At most {MAX_SCENARIOS} scenarios per request')
+        return [self.evaluate(scenario, include_schedule, risk_iterations) for scenario in scenarios]